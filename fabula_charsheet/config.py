@@ -18,6 +18,9 @@ SAVED_STATES_DIRECTORY.mkdir(parents=True, exist_ok=True)
 LOCALS_DIRECTORY = Path(ASSETS_DIRECTORY, "locals").resolve()
 LOCALS_DIRECTORY.mkdir(parents=True, exist_ok=True)
 
+COMPENDIUM_CACHE_DIRECTORY = Path(PROJECT_ROOT_DIRECTORY, "cache").resolve()
+COMPENDIUM_CACHE_DIRECTORY.mkdir(parents=True, exist_ok=True)
+
 default_avatar_path = Path(ASSETS_DIRECTORY, "images/default_avatar_2.png")
 
 MIN_ATTRIBUTE_VALUE = 6
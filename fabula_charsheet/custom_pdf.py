@@ -1,22 +1,101 @@
+import functools
 import io
+from typing import NamedTuple
+
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, KeepTogether
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
 
+# Bump whenever the sheet layout or content changes, so cached sheets are regenerated
+SHEET_VERSION = 1
+
+# Distinct skill and spell descriptions kept cleaned up
+DESCRIPTION_CACHE_SIZE = 4096
+
+
+class SheetTheme(NamedTuple):
+    title: ParagraphStyle
+    h1: ParagraphStyle
+    h2: ParagraphStyle
+    normal: ParagraphStyle
+    small: ParagraphStyle
+    stats_table: TableStyle
+    derived_table: TableStyle
+    equipment_table: TableStyle
+    spells_table: TableStyle
+
+
+@functools.lru_cache(maxsize=None)
+def sheet_theme() -> SheetTheme:
+    """Paragraph and table styles of the sheet, built once per process and only read afterwards."""
+    styles = getSampleStyleSheet()
+    return SheetTheme(
+        title=styles['Title'],
+        h1=styles['Heading1'],
+        h2=styles['Heading2'],
+        normal=styles['Normal'],
+        small=ParagraphStyle('Small', parent=styles['Normal'], fontSize=8, leading=10),
+        stats_table=TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('GRID', (0,0), (-1,-1), 1, colors.black),
+            ('ALIGN', (1,0), (-1,-1), 'CENTER'),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ]),
+        derived_table=TableStyle([
+            ('BOX', (0,0), (-1,-1), 1, colors.black),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('FONTNAME', (0,0), (-1,-1), 'Helvetica-Bold'),
+            ('BACKGROUND', (0,0), (-1,-1), colors.whitesmoke),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 10),
+            ('TOPPADDING', (0,0), (-1,-1), 10),
+        ]),
+        equipment_table=TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ]),
+        spells_table=TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+        ]),
+    )
+
+
+@functools.lru_cache(maxsize=DESCRIPTION_CACHE_SIZE)
+def clean_description(raw_desc: str) -> str:
+    # The text of a skill or spell is the same for every sheet in a given language
+    return raw_desc.replace("**", "").replace("__", "").replace("&nbsp;", " ").replace("【", "[").replace("】", "]")
+
+
+def get_description(entry, loc) -> str:
+    """Cleaned localized description of a skill or spell, falling back to its own text."""
+    raw_desc = ""
+    if hasattr(entry, "localized_description"):
+        try: raw_desc = entry.localized_description(loc)
+        except: pass
+    if not raw_desc:
+        for attr in ["description", "text", "effect"]:
+            if getattr(entry, attr, None):
+                raw_desc = str(getattr(entry, attr))
+                break
+    return clean_description(raw_desc)
+
+
 def create_custom_sheet(character, loc):
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
-    styles = getSampleStyleSheet()
+    theme = sheet_theme()
     story = []
 
     # Custom Styles
-    title_style = styles['Title']
-    h1_style = styles['Heading1']
-    h2_style = styles['Heading2']
-    normal_style = styles['Normal']
-    small_style = ParagraphStyle('Small', parent=styles['Normal'], fontSize=8, leading=10)
+    title_style = theme.title
+    h1_style = theme.h1
+    h2_style = theme.h2
+    normal_style = theme.normal
+    small_style = theme.small
 
     # --- HEADER ---
     story.append(Paragraph(f"{character.name}", title_style))
@@ -35,12 +114,7 @@ def create_custom_sheet(character, loc):
     ]
     
     t_stats = Table(data_stats, colWidths=[3*cm, 2*cm, 2*cm, 5*cm])
-    t_stats.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ('ALIGN', (1,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-    ]))
+    t_stats.setStyle(theme.stats_table)
     story.append(t_stats)
     story.append(Spacer(1, 0.5*cm))
 
@@ -58,14 +132,7 @@ def create_custom_sheet(character, loc):
         [f"Defense: {getattr(character, 'defense', lambda: 0)()}", f"M.Defense: {getattr(character, 'magic_defense', lambda: 0)()}", f"Initiative: {raw_init}"]
     ]
     t_derived = Table(data_derived, colWidths=[5*cm, 5*cm, 5*cm])
-    t_derived.setStyle(TableStyle([
-        ('BOX', (0,0), (-1,-1), 1, colors.black),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,-1), 'Helvetica-Bold'),
-        ('BACKGROUND', (0,0), (-1,-1), colors.whitesmoke),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 10),
-        ('TOPPADDING', (0,0), (-1,-1), 10),
-    ]))
+    t_derived.setStyle(theme.derived_table)
     story.append(t_derived)
     story.append(Spacer(1, 0.5*cm))
 
@@ -88,11 +155,7 @@ def create_custom_sheet(character, loc):
         ["Accessory", get_name(eq.accessory)]
     ]
     t_eq = Table(eq_data, colWidths=[3*cm, 12*cm])
-    t_eq.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-    ]))
+    t_eq.setStyle(theme.equipment_table)
     story.append(t_eq)
     story.append(Spacer(1, 0.5*cm))
 
@@ -113,18 +176,7 @@ def create_custom_sheet(character, loc):
             if hasattr(skill, "localized_name"): s_name = skill.localized_name(loc)
             
             # Clean Description
-            raw_desc = ""
-            if hasattr(skill, "localized_description"):
-                try: raw_desc = skill.localized_description(loc)
-                except: pass
-            if not raw_desc:
-                for attr in ["description", "text", "effect"]:
-                    if getattr(skill, attr, None):
-                        raw_desc = str(getattr(skill, attr))
-                        break
-            
-            # Clean HTML
-            clean_desc = raw_desc.replace("**", "").replace("__", "").replace("&nbsp;", " ").replace("【", "[").replace("】", "]")
+            clean_desc = get_description(skill, loc)
             
             story.append(KeepTogether([
                 Paragraph(f"<b>• {s_name} (Lv {skill.current_level})</b>", normal_style),
@@ -158,15 +210,7 @@ def create_custom_sheet(character, loc):
             s_duration = str(getattr(spell, "duration", "")).replace("_", " ").title()
             
             # Desc
-            raw_desc = ""
-            if hasattr(spell, "localized_description"):
-                try: raw_desc = spell.localized_description(loc)
-                except: pass
-            if not raw_desc:
-                for attr in ["description", "text", "effect"]:
-                    if getattr(spell, attr, None): raw_desc = str(getattr(spell, attr)); break
-            
-            clean_desc = raw_desc.replace("**", "").replace("__", "").replace("&nbsp;", " ").replace("【", "[").replace("】", "]")
+            clean_desc = get_description(spell, loc)
             
             spell_data.append([
                 Paragraph(f"<b>{s_name}</b>", small_style),
@@ -177,11 +221,7 @@ def create_custom_sheet(character, loc):
             ])
             
         t_spells = Table(spell_data, colWidths=[3*cm, 1.5*cm, 2.5*cm, 2.5*cm, 7.5*cm])
-        t_spells.setStyle(TableStyle([
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ]))
+        t_spells.setStyle(theme.spells_table)
         story.append(t_spells)
         story.append(Spacer(1, 0.5*cm))
 
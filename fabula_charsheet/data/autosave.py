@@ -0,0 +1,142 @@
+# fabula_charsheet/data/autosave.py
+import atexit
+import logging
+import threading
+import time
+from typing import Callable
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Saves of the same character within this many seconds are merged into one write
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+
+Row = tuple[str, str, str, int | None, list[str]]  # (char_id, char_name, JSON payload, level, classes)
+
+
+class AutosaveWriter:
+    """
+    Background writer that debounces character saves.
+
+    submit() only records the latest row of a character and returns. A daemon
+    thread writes it once the debounce window has passed, batching everything
+    due for the same user into one DatabaseManager.save_characters call.
+    Until then the row can be read back with pending(), and flush() writes
+    everything synchronously (used on logout and at interpreter exit).
+
+    Rows are kept per owner (e.g. the browser session that made the change),
+    so saves of the same character from two owners are never merged; the
+    owner is handed back to the save function with its rows.
+    """
+    def __init__(self, save: Callable[..., None], window: float = DEFAULT_DEBOUNCE_SECONDS):
+        self.window = window
+        self._save = save
+        # (owner, char_id) -> (user_id, owner, row, due time)
+        self._pending: dict[tuple[object, str], tuple[int, object, Row, float]] = {}
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+        atexit.register(self.stop)
+
+    def submit(self, user_id: int, row: Row, owner=None):
+        with self._cond:
+            key = (owner, row[0])
+            previous = self._pending.get(key)
+            # Keep the original deadline so a stream of edits still gets written
+            due = previous[3] if previous else time.monotonic() + self.window
+            self._pending[key] = (user_id, owner, row, due)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def pending(self, char_id: str, owner=None) -> Row | None:
+        with self._cond:
+            entry = self._pending.get((owner, char_id))
+            return entry[2] if entry else None
+
+    def pending_for_user(self, user_id: int) -> dict[str, Row]:
+        with self._cond:
+            return {
+                char_id: row
+                for (_, char_id), (row_user, _, row, _) in self._pending.items()
+                if row_user == user_id
+            }
+
+    def discard(self, char_id: str, owner=None):
+        """Drops the pending rows of a character; only the one of owner when given."""
+        with self._cond:
+            for key in [key for key in self._pending if key[1] == char_id]:
+                if owner is None or key[0] is owner:
+                    del self._pending[key]
+
+    def write_now(self, user_id: int, rows: list[Row], owner=None, **options):
+        """
+        Writes rows synchronously, superseding any pending save of the same characters by owner.
+        Keyword options are passed on to the save function.
+        """
+        with self._write_lock:
+            with self._cond:
+                for row in rows:
+                    self._pending.pop((owner, row[0]), None)
+            self._save(user_id, rows, owner=owner, **options)
+
+    def flush(self, user_id: int | None = None):
+        """Writes pending rows now, for one user or for everyone."""
+        self._drain(lambda entry: user_id is None or entry[0] == user_id)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="character-autosave", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    now = time.monotonic()
+                    next_due = min((entry[3] for entry in self._pending.values()), default=None)
+                    if next_due is not None and next_due <= now:
+                        break
+                    self._cond.wait(None if next_due is None else next_due - now)
+                if self._stopped:
+                    return
+            self._drain(lambda entry: entry[3] <= time.monotonic())
+
+    def _drain(self, predicate: Callable[[tuple[int, object, Row, float]], bool]):
+        # Taking rows out and writing them happen under one lock, so an older
+        # row can never be written after a newer one of the same character.
+        with self._write_lock:
+            with self._cond:
+                batch = [entry for entry in self._pending.values() if predicate(entry)]
+                for _, owner, row, _ in batch:
+                    del self._pending[(owner, row[0])]
+            if not batch:
+                return
+
+            by_owner: dict[tuple[int, object], list[Row]] = {}
+            for user_id, owner, row, _ in batch:
+                by_owner.setdefault((user_id, owner), []).append(row)
+
+            for (user_id, owner), rows in by_owner.items():
+                try:
+                    self._save(user_id, rows, owner=owner)
+                except Exception as e:
+                    logger.error(f"Autosave failed for user {user_id}: {e}")
+                    self._requeue(user_id, owner, rows)
+
+    def _requeue(self, user_id: int, owner, rows: list[Row]):
+        with self._cond:
+            retry_at = time.monotonic() + self.window
+            for row in rows:
+                # A newer save of the same character supersedes the failed one
+                self._pending.setdefault((owner, row[0]), (user_id, owner, row, retry_at))
+            if not self._stopped:
+                self._ensure_thread()
+                self._cond.notify()
@@ -1,20 +1,34 @@
+import copy
+import functools
+import hashlib
 import os
+import pickle
+import threading
 import yaml
 import logging
 from pathlib import Path
-from data.models import Weapon, Armor, Shield, Accessory, Item, Spell, Skill, HeroicSkill, Therioform, Dance, Arcanum, Invention
+from data.models import (
+    Weapon, Armor, Shield, Accessory, Item, Spell, HeroicSkill, Therioform, Dance, Arcanum, Invention,
+    CharClass, Quality, WeaponCategory,
+)
+from data.modifiers import ModifierTable
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class Compendium:
+    """
+    Read-only catalog of everything defined under the assets directory.
+
+    A Compendium is fully built before it is published through COMPENDIUM and is
+    shared by every session afterwards, so nothing may mutate it in place.
+    Objects that end up owned by a character must be copied first.
+    """
     def __init__(self):
-        self.weapons = []
-        self.armors = []
-        self.shields = []
-        self.accessories = []
-        self.items = []
+        self.equipment = EquipmentCompendium()
+        self.qualities = {}  # Map quality group ('weapons', 'armors', ...) -> list of qualities
+        self.classes = ClassCompendium()
         self.spells = SpellCompendium()
         self.skills = []
         self.heroic_skills = HeroicSkillCompendium()
@@ -22,24 +36,27 @@ class Compendium:
         self.dances = []
         self.arcana = []
         self.inventions = []
+        self.modifiers = ModifierTable()
+
+    def get_all_items(self):
+        """Returns a consolidated list of all equipment/items."""
+        return self.equipment.get_all_items()
 
-    def clear(self):
-        """Resets all lists to empty."""
+    def get_class_name_from_skill(self, skill):
+        for char_class in self.classes.classes:
+            if char_class.get_skill(skill.name):
+                return char_class.name
+        return None
+
+class EquipmentCompendium:
+    def __init__(self):
         self.weapons = []
         self.armors = []
         self.shields = []
         self.accessories = []
         self.items = []
-        self.spells.clear()
-        self.skills = []
-        self.heroic_skills.clear()
-        self.therioforms = []
-        self.dances = []
-        self.arcana = []
-        self.inventions = []
 
     def get_all_items(self):
-        """Returns a consolidated list of all equipment/items."""
         all_items = []
         for w in self.weapons: all_items.append(("weapon", w))
         for a in self.armors: all_items.append(("armor", a))
@@ -48,18 +65,29 @@ class Compendium:
         for i in self.items: all_items.append(("item", i))
         return all_items
 
-    def get_class_name_from_skill(self, skill):
-        # Placeholder logic: In a real app, you'd map skills to classes
-        # This prevents crashes if the method is called
-        return "Elementalist" # Default fallback
+    def weapons_by_categories(self) -> dict[WeaponCategory, list[Weapon]]:
+        categories = {}
+        for weapon in self.weapons:
+            categories.setdefault(weapon.weapon_category, []).append(weapon)
+        return categories
+
+class ClassCompendium:
+    def __init__(self):
+        self.classes = []
+
+    def get_class(self, name):
+        """Returns a private copy of the class, since callers level up its skills."""
+        if name is None:
+            return None
+        for char_class in self.classes:
+            if char_class.name == name.lower():
+                return copy.deepcopy(char_class)
+        return None
 
 class SpellCompendium:
     def __init__(self):
         self.spells = {} # Map class_name -> list of spells
 
-    def clear(self):
-        self.spells = {}
-
     def get_spells(self, class_name):
         return self.spells.get(str(class_name), [])
 
@@ -67,95 +95,316 @@ class HeroicSkillCompendium:
     def __init__(self):
         self.heroic_skills = []
 
-    def clear(self):
-        self.heroic_skills = []
+    def get_skill(self, name):
+        for heroic_skill in self.heroic_skills:
+            if heroic_skill.name == name:
+                return heroic_skill
+        return None
 
 # --- SINGLETON INSTANTIATION ---
-# Crucial: Instantiate immediately so imports never see 'None'
+# Crucial: Instantiate immediately so imports never see 'None'.
+# Always access it as `compendium.COMPENDIUM`: init() replaces the object
+# when the assets change, so a `from data.compendium import COMPENDIUM`
+# binding would go stale.
 COMPENDIUM = Compendium()
 
-def init(assets_directory: Path | str) -> None:
+# Fingerprint of the assets COMPENDIUM was built from
+_loaded_fingerprint = None
+_build_lock = threading.Lock()
+
+# Bump when the pickled format changes for a reason CACHE_SOURCE_FILES do not show
+CACHE_FORMAT_VERSION = 3
+# Sources (relative to data/) of the classes pickled into the cache; any edit
+# to them gives the cache a new key
+CACHE_SOURCE_FILES = ("compendium.py", "modifiers.py", "models/*.py")
+CACHE_FILE_PREFIX = "compendium-"
+CACHE_FILE_SUFFIX = ".pickle"
+
+
+def _compendium_files(assets_directory: Path) -> list[Path]:
+    """All YAML files the compendium is built from (translations live elsewhere)."""
+    return [
+        yaml_file
+        for yaml_file in sorted(assets_directory.rglob("*.yaml"))
+        if yaml_file.relative_to(assets_directory).parts[0] != "locals"
+    ]
+
+
+def _assets_fingerprint(assets_directory: Path) -> tuple:
+    """Cheap change detector: path, size and mtime of every compendium YAML file."""
+    fingerprint = [str(assets_directory)]
+    for yaml_file in _compendium_files(assets_directory):
+        stat = yaml_file.stat()
+        fingerprint.append((str(yaml_file.relative_to(assets_directory)), stat.st_mtime_ns, stat.st_size))
+    return tuple(fingerprint)
+
+
+@functools.cache
+def _code_digest() -> str:
+    """Hash of the model and compendium code, computed once per process."""
+    data_directory = Path(__file__).resolve().parent
+    digest = hashlib.sha256()
+    for pattern in CACHE_SOURCE_FILES:
+        for source in sorted(data_directory.glob(pattern)):
+            digest.update(source.relative_to(data_directory).as_posix().encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(source.read_bytes())
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def assets_hash(assets_directory: Path | str) -> str:
+    """Content hash of the compendium sources and of the code they are loaded with, used as the cache key."""
+    if isinstance(assets_directory, str):
+        assets_directory = Path(assets_directory)
+    digest = hashlib.sha256(f"v{CACHE_FORMAT_VERSION}\0{_code_digest()}".encode())
+    for yaml_file in _compendium_files(assets_directory):
+        digest.update(yaml_file.relative_to(assets_directory).as_posix().encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(yaml_file.read_bytes())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def cache_path(cache_directory: Path, key: str) -> Path:
+    return Path(cache_directory, f"{CACHE_FILE_PREFIX}{key}{CACHE_FILE_SUFFIX}")
+
+
+def _load_yaml(file_path: Path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=yaml.SafeLoader)
+
+
+def _load_models(file_path: Path, model_class) -> list:
+    """Loads a YAML list from file_path, skipping entries that fail validation."""
+    models = []
+    if not file_path.exists():
+        return models
+    try:
+        data = _load_yaml(file_path)
+    except Exception as e:
+        logger.error(f"Failed to load {file_path}: {e}")
+        return models
+    if data and isinstance(data, list):
+        for item_data in data:
+            try:
+                models.append(model_class(**item_data))
+            except Exception as e:
+                logger.error(f"Error creating {model_class.__name__} from {file_path}: {e}")
+    return models
+
+
+def build(assets_directory: Path | str) -> Compendium:
     """
-    Loads all data from the assets directory into the global COMPENDIUM object.
+    Parses the assets directory into a new Compendium without touching COMPENDIUM.
     """
     if isinstance(assets_directory, str):
         assets_directory = Path(assets_directory)
 
-    # Clear existing data before reloading
-    COMPENDIUM.clear()
-    
+    compendium = Compendium()
+
     logger.info(f"Loading compendium from {assets_directory}")
 
     # 1. Load Equipment
     equipment_dir = assets_directory / 'equipment'
-    if equipment_dir.exists():
-        # Mapping YAML keys/filenames to Compendium lists and Model classes
-        load_map = {
-            "weapons": (COMPENDIUM.weapons, Weapon),
-            "armors": (COMPENDIUM.armors, Armor),
-            "shields": (COMPENDIUM.shields, Shield),
-            "accessories": (COMPENDIUM.accessories, Accessory),
-            "items": (COMPENDIUM.items, Item)
-        }
-
-        for category_name, (target_list, model_class) in load_map.items():
-            file_path = equipment_dir / f"{category_name}.yaml"
-            if file_path.exists():
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = yaml.safe_load(f)
-                        if data and isinstance(data, list):
-                            for item_data in data:
-                                try:
-                                    target_list.append(model_class(**item_data))
-                                except Exception as e:
-                                    logger.error(f"Error creating {model_class.__name__}: {e}")
-                except Exception as e:
-                    logger.error(f"Failed to load {file_path}: {e}")
-
-    # 2. Load Spells
+    for category_name, model_class in (
+        ("weapons", Weapon),
+        ("armors", Armor),
+        ("shields", Shield),
+        ("accessories", Accessory),
+        ("items", Item),
+    ):
+        setattr(
+            compendium.equipment,
+            category_name,
+            _load_models(equipment_dir / f"{category_name}.yaml", model_class)
+        )
+
+    # 2. Load Qualities (filename is the equipment group, e.g. 'weapons.yaml')
+    qualities_dir = assets_directory / 'qualities'
+    if qualities_dir.exists():
+        for yaml_file in sorted(qualities_dir.glob("*.yaml")):
+            compendium.qualities[yaml_file.stem] = _load_models(yaml_file, Quality)
+
+    # 3. Load Classes (one class per file)
+    classes_dir = assets_directory / 'classes'
+    if classes_dir.exists():
+        for yaml_file in sorted(classes_dir.glob("*.yaml")):
+            try:
+                data = _load_yaml(yaml_file)
+                # A class file holds one class, sometimes written as a one-element list
+                for class_data in (data if isinstance(data, list) else [data] if data else []):
+                    try:
+                        compendium.classes.classes.append(CharClass(**class_data))
+                    except Exception as e:
+                        logger.error(f"Failed to load class from {yaml_file}: {e}")
+            except Exception as e:
+                logger.error(f"Failed to load class from {yaml_file}: {e}")
+
+    # 4. Load Spells
     spells_dir = assets_directory / 'spells'
     if spells_dir.exists():
-        for yaml_file in spells_dir.glob("*.yaml"):
+        for yaml_file in sorted(spells_dir.glob("*.yaml")):
             class_name = yaml_file.stem # Filename is class name (e.g. 'elementalist.yaml')
-            try:
-                with open(yaml_file, 'r', encoding='utf-8') as f:
-                    data = yaml.safe_load(f)
-                    if data:
-                        spell_list = [Spell(**s) for s in data]
-                        COMPENDIUM.spells.spells[class_name] = spell_list
-            except Exception as e:
-                logger.error(f"Failed to load spells from {yaml_file}: {e}")
+            compendium.spells.spells[class_name] = _load_models(yaml_file, Spell)
+
+    # 5. Load Heroic Skills
+    compendium.heroic_skills.heroic_skills = _load_models(
+        assets_directory / 'skills' / 'heroic_skills.yaml', HeroicSkill
+    )
 
-    # 3. Load Heroic Skills
-    hs_path = assets_directory / 'heroic_skills.yaml'
-    if hs_path.exists():
+    # 6. Load Special (Therioforms, Dances, etc)
+    special_dir = assets_directory / 'special'
+    compendium.therioforms = _load_models(special_dir / "therioforms.yaml", Therioform)
+    compendium.dances = _load_models(special_dir / "dances.yaml", Dance)
+    compendium.arcana = _load_models(special_dir / "arcana.yaml", Arcanum)
+    compendium.inventions = _load_models(special_dir / "inventions.yaml", Invention)
+
+    # 7. Load Attribute Modifiers (statuses, improved attributes, therioforms)
+    modifiers_file = assets_directory / 'modifiers' / 'attributes.yaml'
+    if modifiers_file.exists():
         try:
-            with open(hs_path, 'r', encoding='utf-8') as f:
-                data = yaml.safe_load(f)
-                if data:
-                    COMPENDIUM.heroic_skills.heroic_skills = [HeroicSkill(**h) for h in data]
+            compendium.modifiers = ModifierTable.compile(_load_yaml(modifiers_file))
         except Exception as e:
-            logger.error(f"Failed to load heroic skills: {e}")
-
-    # 4. Load Special (Therioforms, Dances, etc)
-    special_files = {
-        "therioforms.yaml": (COMPENDIUM.therioforms, Therioform),
-        "dances.yaml": (COMPENDIUM.dances, Dance),
-        "arcana.yaml": (COMPENDIUM.arcana, Arcanum),
-        "inventions.yaml": (COMPENDIUM.inventions, Invention)
-    }
-    
-    for filename, (target_list, model_class) in special_files.items():
-        file_path = assets_directory / filename
-        if file_path.exists():
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = yaml.safe_load(f)
-                    if data:
-                        for item in data:
-                            target_list.append(model_class(**item))
-            except Exception as e:
-                logger.error(f"Failed to load {filename}: {e}")
+            logger.error(f"Failed to load attribute modifiers from {modifiers_file}: {e}")
 
     logger.info("Compendium initialization complete.")
+    return compendium
+
+
+def load_cache(cache_directory: Path, key: str) -> Compendium | None:
+    """Loads a precompiled Compendium, or returns None if there is no usable cache for key."""
+    path = cache_path(cache_directory, key)
+    if not path.exists():
+        return None
+    try:
+        compendium = pickle.loads(path.read_bytes())
+    except Exception as e:
+        logger.error(f"Failed to load compendium cache {path}: {e}")
+        return None
+    if not isinstance(compendium, Compendium):
+        logger.error(f"Compendium cache {path} does not contain a Compendium")
+        return None
+    try:
+        stale = _stale_entry(compendium)
+    except Exception as e:
+        stale = str(e)
+    if stale is not None:
+        logger.error(f"Compendium cache {path} does not match the current models ({stale}); rebuilding")
+        return None
+    return compendium
+
+
+def _cached_models(compendium: Compendium):
+    equipment = compendium.equipment
+    yield from equipment.weapons + equipment.armors + equipment.shields + equipment.accessories + equipment.items
+    yield from compendium.classes.classes
+    for spells in compendium.spells.spells.values():
+        yield from spells
+    yield from compendium.heroic_skills.heroic_skills
+    yield from compendium.therioforms + compendium.dances + compendium.arcana + compendium.inventions
+    for qualities in compendium.qualities.values():
+        yield from qualities
+
+
+def _stale_entry(compendium: Compendium) -> str | None:
+    """Describes the first part of an unpickled Compendium that lacks an attribute of the current code."""
+    for attributes, current in (
+        (Compendium().__dict__, compendium),
+        (EquipmentCompendium().__dict__, compendium.equipment),
+    ):
+        for name in attributes:
+            if name not in current.__dict__:
+                return f"{type(current).__name__}.{name}"
+    for model in _cached_models(compendium):
+        # Unpickled pydantic models keep the fields they were pickled with
+        for name in getattr(type(model), "model_fields", {}):
+            if name not in model.__dict__:
+                return f"{type(model).__name__}.{name}"
+    return None
+
+
+def write_cache(compendium: Compendium, cache_directory: Path, key: str) -> Path:
+    """Atomically writes the cache for key and removes caches of older asset versions."""
+    cache_directory.mkdir(parents=True, exist_ok=True)
+    path = cache_path(cache_directory, key)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(pickle.dumps(compendium, protocol=pickle.HIGHEST_PROTOCOL))
+    os.replace(tmp_path, path)
+
+    for stale in cache_directory.glob(f"{CACHE_FILE_PREFIX}*{CACHE_FILE_SUFFIX}"):
+        if stale != path:
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+    return path
+
+
+def compile_cache(assets_directory: Path | str, cache_directory: Path | str) -> Path:
+    """Build step: parses the assets and writes the binary cache for their current hash."""
+    if isinstance(assets_directory, str):
+        assets_directory = Path(assets_directory)
+    if isinstance(cache_directory, str):
+        cache_directory = Path(cache_directory)
+    key = assets_hash(assets_directory)
+    path = cache_path(cache_directory, key)
+    if load_cache(cache_directory, key) is not None:
+        logger.info(f"Compendium cache {path} is up to date.")
+        return path
+    return write_cache(build(assets_directory), cache_directory, key)
+
+
+def init(assets_directory: Path | str, cache_directory: Path | str | None = None) -> None:
+    """
+    Makes sure COMPENDIUM reflects the assets directory.
+
+    Safe to call on every rerun: the assets are only looked at again when a
+    YAML file was added, removed or modified. With a cache_directory, the
+    Compendium is unpickled from the cache matching the assets content hash
+    and the YAML is only parsed (and the cache rewritten) when that hash is new.
+    The new Compendium is published with a single assignment, so concurrent
+    sessions see either the old or the new catalog, never a partial one.
+    """
+    global COMPENDIUM, _loaded_fingerprint
+
+    if isinstance(assets_directory, str):
+        assets_directory = Path(assets_directory)
+    if isinstance(cache_directory, str):
+        cache_directory = Path(cache_directory)
+
+    fingerprint = _assets_fingerprint(assets_directory)
+    if fingerprint == _loaded_fingerprint and COMPENDIUM is not None:
+        return
+
+    with _build_lock:
+        if fingerprint == _loaded_fingerprint and COMPENDIUM is not None:
+            return
+
+        new_compendium = None
+        if cache_directory is not None:
+            key = assets_hash(assets_directory)
+            new_compendium = load_cache(cache_directory, key)
+            if new_compendium is None:
+                new_compendium = build(assets_directory)
+                try:
+                    write_cache(new_compendium, cache_directory, key)
+                except OSError as e:
+                    logger.error(f"Failed to write compendium cache: {e}")
+            else:
+                logger.info(f"Loaded compendium from cache {cache_path(cache_directory, key)}")
+        else:
+            new_compendium = build(assets_directory)
+
+        COMPENDIUM = new_compendium
+        _loaded_fingerprint = fingerprint
+
+
+if __name__ == "__main__":
+    # Build step, run from the fabula_charsheet directory: python -m data.compendium
+    # Go through the importable module so pickled classes are not bound to __main__.
+    from config import ASSETS_DIRECTORY, COMPENDIUM_CACHE_DIRECTORY
+    from data import compendium
+
+    compiled_path = compendium.compile_cache(ASSETS_DIRECTORY, COMPENDIUM_CACHE_DIRECTORY)
+    print(f"Compendium cache: {compiled_path}")
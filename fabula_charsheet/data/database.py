@@ -3,49 +3,210 @@ import sqlite3
 import os
 import json
 import hashlib
+import lzma
+import queue
 import re
-from typing import Optional, Dict, List, Any
+import shutil
+import zlib
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Any, NamedTuple
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "society.db")
+from data.migrations import migrate, summary_from_data
+from data.payload_codec import PAYLOAD_ENCODINGS, decode_payload, encode_payload
 
-class DatabaseManager:
-    def __init__(self):
-        self._init_db()
+DB_PATH = os.environ.get("FABULA_DB_PATH", os.path.join(os.path.dirname(__file__), "society.db"))
+
+# How new character payloads are stored: json (uncompressed), zlib or lzma
+PAYLOAD_ENCODING = os.environ.get("FABULA_DB_PAYLOAD_ENCODING", "zlib")
+
+# Connection tuning
+POOL_SIZE = 8
+BUSY_TIMEOUT_SECONDS = 5.0
+STATEMENT_CACHE_SIZE = 128
+
+# Characters per page of the roster listing
+PAGE_SIZE = 20
+
+
+class ConnectionPool:
+    """
+    Reusable SQLite connections shared by the Streamlit script threads.
 
-    def _get_conn(self):
-        conn = sqlite3.connect(DB_PATH)
+    A connection is handed to one thread at a time and goes back to the pool
+    afterwards, so calls no longer pay for connect/close. Each connection keeps
+    its own prepared-statement cache (sqlite3 caches statements by SQL text).
+    The database runs in WAL mode so readers are not blocked by a writer.
+    """
+    def __init__(self, db_path: str, max_size: int = POOL_SIZE):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue(maxsize=max_size)
+        # Bumped by reset(); connections opened before it are not reused
+        self._generation = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
         conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable in WAL mode except for the last commits on power loss
+        conn.execute("PRAGMA synchronous=NORMAL")
         return conn
 
+    @contextmanager
+    def connection(self):
+        generation = self._generation
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            # Never hand out a connection with a half-done transaction
+            if conn.in_transaction:
+                conn.rollback()
+            if generation != self._generation:
+                conn.close()
+                return
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def reset(self):
+        """Closes every connection: idle ones now, those in use when they are handed back."""
+        self._generation += 1
+        self.close_all()
+
+
+class CharacterSummary(NamedTuple):
+    """The columns the roster page needs, read without touching the data blob."""
+    id: str
+    name: str
+    level: int | None
+    classes: list[str]
+    updated_at: str | None
+
+
+class PageCursor(NamedTuple):
+    """Position after the last row of a page: its sort value and id."""
+    value: Any
+    id: str
+
+
+class SummaryPage(NamedTuple):
+    items: list[CharacterSummary]
+    next_cursor: PageCursor | None
+
+
+# Sortable roster columns -> the expression they are ordered and indexed by
+SORT_EXPRESSIONS = {
+    "updated_at": "updated_at",
+    "name": "name COLLATE NOCASE",
+    "level": "IFNULL(level, 0)",
+}
+
+# CharState fields with their own column; everything else goes to conditions
+VITALS = ("minus_hp", "minus_mp", "minus_ip")
+
+# Writes a state only for a character the user owns
+UPSERT_STATE_SQL = """
+    INSERT INTO character_states (char_id, minus_hp, minus_mp, minus_ip, conditions)
+    SELECT id, ?, ?, ?, ? FROM characters WHERE id = ? AND user_id = ?
+    ON CONFLICT(char_id) DO UPDATE SET
+        minus_hp = excluded.minus_hp,
+        minus_mp = excluded.minus_mp,
+        minus_ip = excluded.minus_ip,
+        conditions = excluded.conditions,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+UPSERT_VITALS_SQL = """
+    INSERT INTO character_states (char_id, minus_hp, minus_mp, minus_ip)
+    SELECT id, ?, ?, ? FROM characters WHERE id = ? AND user_id = ?
+    ON CONFLICT(char_id) DO UPDATE SET
+        minus_hp = excluded.minus_hp,
+        minus_mp = excluded.minus_mp,
+        minus_ip = excluded.minus_ip,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# The same writes, only while the character row still has the version the writer last saw
+UPSERT_STATE_IF_VERSION_SQL = UPSERT_STATE_SQL.replace("AND user_id = ?", "AND user_id = ? AND version = ?")
+UPSERT_VITALS_IF_VERSION_SQL = UPSERT_VITALS_SQL.replace("AND user_id = ?", "AND user_id = ? AND version = ?")
+
+
+class CharacterRecord(NamedTuple):
+    payload: str  # JSON text
+    version: int
+
+
+class SaveResult(NamedTuple):
+    """
+    Outcome of saving one character. On a conflict, version is the one
+    currently stored (None if the character is gone or owned by someone else).
+    """
+    char_id: str
+    saved: bool
+    version: int | None
+
+
+UPSERT_CHARACTER_SQL = """
+    INSERT INTO characters (id, user_id, name, data, encoding, level, classes, version)
+    VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+    ON CONFLICT(id) DO UPDATE SET
+        name = excluded.name,
+        data = excluded.data,
+        encoding = excluded.encoding,
+        level = excluded.level,
+        classes = excluded.classes,
+        version = characters.version + 1,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE characters.user_id = excluded.user_id
+    RETURNING version
+"""
+
+# Compare-and-swap: only applies if nobody saved since expected version was read
+UPDATE_CHARACTER_IF_VERSION_SQL = """
+    UPDATE characters SET
+        name = ?,
+        data = ?,
+        encoding = ?,
+        level = ?,
+        classes = ?,
+        version = version + 1,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = ? AND user_id = ? AND version = ?
+    RETURNING version
+"""
+
+
+class DatabaseManager:
+    def __init__(self, db_path: str = DB_PATH, payload_encoding: str = PAYLOAD_ENCODING):
+        if payload_encoding not in PAYLOAD_ENCODINGS:
+            raise ValueError(f"Unknown payload encoding: {payload_encoding}")
+        self.payload_encoding = payload_encoding
+        self._pool = ConnectionPool(db_path)
+        self._init_db()
+
     def _init_db(self):
-        """Initialize the SQLite database with users and characters tables."""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        
-        # 1. Users Table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # 2. Characters Table (Linked to Users)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS characters (
-                id TEXT PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                name TEXT,
-                data JSON NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+        """Create or upgrade the schema (users and characters tables) to the latest migration."""
+        with self._pool.connection() as conn:
+            migrate(conn)
+
+    def close(self):
+        self._pool.close_all()
 
     # --- AUTHENTICATION ---
 
@@ -70,10 +231,9 @@ class DatabaseManager:
         storage_string = salt.hex() + ":" + pwd_hash.hex()
 
         try:
-            conn = self._get_conn()
-            conn.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, storage_string))
-            conn.commit()
-            conn.close()
+            with self._pool.connection() as conn:
+                conn.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, storage_string))
+                conn.commit()
             return True, "Account created successfully. Please login."
         except sqlite3.IntegrityError:
             return False, "Username already exists."
@@ -84,9 +244,8 @@ class DatabaseManager:
         """
         Returns (User_ID, Error_Message). If User_ID is present, login succeeded.
         """
-        conn = self._get_conn()
-        user = conn.execute("SELECT id, password_hash FROM users WHERE username = ?", (username,)).fetchone()
-        conn.close()
+        with self._pool.connection() as conn:
+            user = conn.execute("SELECT id, password_hash FROM users WHERE username = ?", (username,)).fetchone()
 
         if not user:
             return None, "Invalid credentials."
@@ -105,43 +264,319 @@ class DatabaseManager:
 
     # --- CHARACTER DATA ---
 
-    def save_character(self, user_id: int, char_id: str, char_name: str, char_data: dict):
-        """Saves or updates a character for a specific user."""
-        conn = self._get_conn()
-        json_str = json.dumps(char_data)
-        
-        # Check if exists to determine Insert or Update (Upsert support varies in SQLite versions)
-        exists = conn.execute("SELECT 1 FROM characters WHERE id = ? AND user_id = ?", (char_id, user_id)).fetchone()
-        
-        if exists:
-            conn.execute("UPDATE characters SET name = ?, data = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?", 
-                         (char_name, json_str, char_id))
+    def save_character(
+        self,
+        user_id: int,
+        char_id: str,
+        char_name: str,
+        char_data: dict | str,
+        level: int | None = None,
+        classes: list[str] | None = None,
+    ):
+        """Saves or updates a character for a specific user. char_data may be pre-encoded JSON."""
+        if level is None and classes is None:
+            self.save_characters(user_id, [(char_id, char_name, char_data)])
         else:
-            conn.execute("INSERT INTO characters (id, user_id, name, data) VALUES (?, ?, ?, ?)", 
-                         (char_id, user_id, char_name, json_str))
-        
-        conn.commit()
-        conn.close()
+            self.save_characters(user_id, [(char_id, char_name, char_data, level, classes or [])])
+
+    def save_characters(
+        self,
+        user_id: int,
+        characters: List[tuple],
+        expected_versions: Dict[str, int] | None = None,
+        states: Dict[str, dict] | None = None,
+    ) -> List[SaveResult]:
+        """
+        Upserts (char_id, char_name, char_data[, level, classes]) rows for a user in a
+        single transaction. Without level and classes, the summary columns are derived
+        from char_data. Rows whose id belongs to another user are left untouched.
+
+        A row whose id is in expected_versions is only written if the stored
+        version still matches; otherwise it is reported as a conflict and the
+        other rows are saved regardless. Each save bumps the row version.
+
+        states maps char_id -> CharState dump; it is written in the same
+        transaction as its character, and only if the character was saved.
+        """
+        expected_versions = expected_versions or {}
+        states = states or {}
+        results = []
+        if not characters:
+            return results
+
+        with self._pool.connection() as conn:
+            for row in characters:
+                char_id, _, char_name, data, encoding, level, classes = self._character_params(user_id, row)
+                expected = expected_versions.get(char_id)
+                if expected is None:
+                    saved = conn.execute(
+                        UPSERT_CHARACTER_SQL,
+                        (char_id, user_id, char_name, data, encoding, level, classes)
+                    ).fetchone()
+                else:
+                    saved = conn.execute(
+                        UPDATE_CHARACTER_IF_VERSION_SQL,
+                        (char_name, data, encoding, level, classes, char_id, user_id, expected)
+                    ).fetchone()
+                if saved is not None:
+                    results.append(SaveResult(char_id, True, saved['version']))
+                    if char_id in states:
+                        conn.execute(UPSERT_STATE_SQL, _state_params(user_id, char_id, states[char_id]))
+                else:
+                    current = conn.execute(
+                        "SELECT version FROM characters WHERE id = ? AND user_id = ?", (char_id, user_id)
+                    ).fetchone()
+                    results.append(SaveResult(char_id, False, current['version'] if current else None))
+            conn.commit()
+        return results
+
+    def _character_params(self, user_id: int, row: tuple) -> tuple:
+        char_id, char_name, char_data, *summary = row
+        if summary:
+            level, classes = summary
+        else:
+            level, classes = summary_from_data(char_data)
+        if not isinstance(char_data, str):
+            char_data = json.dumps(char_data)
+        data = encode_payload(char_data, self.payload_encoding)
+        return char_id, user_id, char_name, data, self.payload_encoding, level, json.dumps(list(classes))
+
+    def get_user_character_summaries(self, user_id: int) -> List[CharacterSummary]:
+        """Returns id, name, level, classes and updated_at of the user's characters, without their data."""
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT id, name, level, classes, updated_at FROM characters WHERE user_id = ?",
+                (user_id,)
+            ).fetchall()
+        return [_summary_from_row(row) for row in rows]
+
+    def get_user_character_ids(self, user_id: int) -> List[str]:
+        """Returns the ids of all the user's characters, most recently updated first."""
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT id FROM characters WHERE user_id = ? ORDER BY updated_at DESC, id DESC",
+                (user_id,)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def list_character_summaries(
+        self,
+        user_id: int,
+        sort: str = "updated_at",
+        descending: bool | None = None,
+        name_contains: str | None = None,
+        min_level: int | None = None,
+        max_level: int | None = None,
+        after: PageCursor | None = None,
+        limit: int = PAGE_SIZE,
+    ) -> SummaryPage:
+        """
+        Returns one page of the user's roster.
+
+        Pages are keyset-paginated: pass the previous page's next_cursor as
+        after to get the following one (next_cursor is None on the last page).
+        sort is one of SORT_EXPRESSIONS and defaults to the most recently
+        updated first; names sort ascending, case-insensitively. name_contains
+        is a case-insensitive substring filter.
+        """
+        expression = SORT_EXPRESSIONS.get(sort)
+        if expression is None:
+            raise ValueError(f"Unknown sort column: {sort}")
+        if descending is None:
+            descending = sort == "updated_at"
+
+        clauses = ["user_id = ?"]
+        params: list[Any] = [user_id]
+        if name_contains:
+            escaped = re.sub(r"([\\%_])", r"\\\1", name_contains)
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        if min_level is not None:
+            clauses.append("level >= ?")
+            params.append(min_level)
+        if max_level is not None:
+            clauses.append("level <= ?")
+            params.append(max_level)
+        if after is not None:
+            clauses.append(f"({expression}, id) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+
+        order = "DESC" if descending else "ASC"
+        sql = f"""
+            SELECT id, name, level, classes, updated_at, {expression} AS sort_value
+            FROM characters
+            WHERE {' AND '.join(clauses)}
+            ORDER BY {expression} {order}, id {order}
+            LIMIT ?
+        """
+        params.append(limit + 1)
+        with self._pool.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        # The extra row only tells whether there is a next page
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = PageCursor(rows[-1]['sort_value'], rows[-1]['id'])
+        return SummaryPage([_summary_from_row(row) for row in rows], next_cursor)
+
+    def get_character_record(self, user_id: int, char_id: str) -> Optional[CharacterRecord]:
+        """Re-reads the stored JSON text of a character and its current version."""
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT data, encoding, version FROM characters WHERE id = ? AND user_id = ?", (char_id, user_id)
+            ).fetchone()
+        if row is None:
+            return None
+        return CharacterRecord(decode_payload(row['data'], row['encoding']), row['version'])
+
+    def get_character_payload(self, user_id: int, char_id: str) -> Optional[str]:
+        """Returns the JSON text of a character without parsing it."""
+        record = self.get_character_record(user_id, char_id)
+        return None if record is None else record.payload
+
+    def get_character(self, user_id: int, char_id: str) -> Optional[dict]:
+        """Returns the full character dictionary, or None if the user owns no such character."""
+        payload = self.get_character_payload(user_id, char_id)
+        if payload is None:
+            return None
+        try:
+            return json.loads(payload)
+        except json.JSONDecodeError:
+            return None
 
     def get_user_characters(self, user_id: int) -> List[dict]:
         """Returns a list of character dictionaries for the specific user."""
-        conn = self._get_conn()
-        rows = conn.execute("SELECT data FROM characters WHERE user_id = ?", (user_id,)).fetchall()
-        conn.close()
+        with self._pool.connection() as conn:
+            rows = conn.execute("SELECT data, encoding FROM characters WHERE user_id = ?", (user_id,)).fetchall()
         
         results = []
         for row in rows:
             try:
-                results.append(json.loads(row['data']))
-            except json.JSONDecodeError:
+                results.append(json.loads(decode_payload(row['data'], row['encoding'])))
+            except (ValueError, zlib.error, lzma.LZMAError):
                 continue
         return results
 
+    def backup(self, target_path: str):
+        """
+        Copies the whole database to target_path with SQLite's online backup.
+
+        Payloads are copied in their stored (compressed) form.
+        """
+        target = sqlite3.connect(target_path)
+        try:
+            with self._pool.connection() as conn:
+                conn.backup(target)
+        finally:
+            target.close()
+
+    def restore(self, source_path: str):
+        """
+        Replaces the database with a copy made by backup() and upgrades it to the current schema.
+
+        Pooled connections are closed and the WAL files of the replaced
+        database removed first, so nothing of the old database is replayed
+        over the restored one.
+        """
+        check = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+        try:
+            if check.execute("PRAGMA integrity_check").fetchone()[0] != "ok":
+                raise ValueError(f"{source_path} is not a valid database")
+        finally:
+            check.close()
+
+        db_path = self._pool.db_path
+        tmp_path = f"{db_path}.restore"
+        shutil.copyfile(source_path, tmp_path)
+        self._pool.reset()
+        for suffix in ("-wal", "-shm"):
+            try:
+                os.remove(f"{db_path}{suffix}")
+            except FileNotFoundError:
+                pass
+        os.replace(tmp_path, db_path)
+        self._init_db()
+
     def delete_character(self, user_id: int, char_id: str):
-        conn = self._get_conn()
-        conn.execute("DELETE FROM characters WHERE id = ? AND user_id = ?", (char_id, user_id))
-        conn.commit()
-        conn.close()
+        with self._pool.connection() as conn:
+            deleted = conn.execute("DELETE FROM characters WHERE id = ? AND user_id = ?", (char_id, user_id))
+            if deleted.rowcount:
+                conn.execute("DELETE FROM character_states WHERE char_id = ?", (char_id,))
+            conn.commit()
+
+    # --- CHARACTER STATE ---
+
+    def get_character_state(self, user_id: int, char_id: str) -> Optional[dict]:
+        """Returns the saved CharState fields of a character, or None if none were saved."""
+        with self._pool.connection() as conn:
+            row = conn.execute("""
+                SELECT s.minus_hp, s.minus_mp, s.minus_ip, s.conditions
+                FROM character_states s JOIN characters c ON c.id = s.char_id
+                WHERE s.char_id = ? AND c.user_id = ?
+            """, (char_id, user_id)).fetchone()
+        if row is None:
+            return None
+        try:
+            state = json.loads(row['conditions'])
+        except json.JSONDecodeError:
+            state = {}
+        state.update({field: row[field] for field in VITALS})
+        return state
+
+    def save_character_state(
+        self, user_id: int, char_id: str, state: dict, expected_version: int | None = None
+    ) -> bool:
+        """
+        Saves a CharState dump; False if the user owns no such character, or
+        if expected_version is given and the character row has another version.
+        """
+        params = _state_params(user_id, char_id, state)
+        with self._pool.connection() as conn:
+            if expected_version is None:
+                saved = conn.execute(UPSERT_STATE_SQL, params).rowcount
+            else:
+                saved = conn.execute(UPSERT_STATE_IF_VERSION_SQL, (*params, expected_version)).rowcount
+            conn.commit()
+        return bool(saved)
+
+    def save_character_vitals(
+        self,
+        user_id: int,
+        char_id: str,
+        minus_hp: int,
+        minus_mp: int,
+        minus_ip: int,
+        expected_version: int | None = None,
+    ) -> bool:
+        """Fast path for HP/MP/IP changes: updates three integers and nothing else (see save_character_state)."""
+        params = (minus_hp, minus_mp, minus_ip, char_id, user_id)
+        with self._pool.connection() as conn:
+            if expected_version is None:
+                saved = conn.execute(UPSERT_VITALS_SQL, params).rowcount
+            else:
+                saved = conn.execute(UPSERT_VITALS_IF_VERSION_SQL, (*params, expected_version)).rowcount
+            conn.commit()
+        return bool(saved)
+
+
+def _state_params(user_id: int, char_id: str, state: dict) -> tuple:
+    conditions = {field: value for field, value in state.items() if field not in VITALS}
+    return (
+        *(state.get(field, 0) for field in VITALS),
+        json.dumps(conditions),
+        char_id,
+        user_id,
+    )
+
+
+def _summary_from_row(row: sqlite3.Row) -> CharacterSummary:
+    try:
+        classes = [name for name in json.loads(row['classes'] or "[]") if name]
+    except json.JSONDecodeError:
+        classes = []
+    return CharacterSummary(row['id'], row['name'], row['level'], classes, row['updated_at'])
+
 
 # Singleton
 DB = DatabaseManager()
@@ -1,4 +1,6 @@
+import threading
 from pathlib import Path
+from types import MappingProxyType
 
 import yaml
 import streamlit as st
@@ -7,19 +9,69 @@ from data.models import LangEnum, LocNamespace
 
 
 class Localizator:
+    """
+    Read-only translation catalog shared by every session of the process.
+    Sessions only keep their selected LangEnum in st.session_state.language.
+    """
     default_language = LangEnum.en
 
     def __init__(self, translations: dict[LangEnum, dict[str, str]]):
-        self.__translations = translations
+        # One namespace per language, built once and handed out as is
+        self.__namespaces = MappingProxyType({
+            lang: LocNamespace(root=lang_translations)
+            for lang, lang_translations in translations.items()
+        })
+        self.__empty = LocNamespace(root={})
 
-    def get(self, lang: LangEnum):
-        return LocNamespace(root=self.__translations.get(lang, {}))
+    def get(self, lang: LangEnum) -> LocNamespace:
+        return self.__namespaces.get(lang, self.__empty)
+
+
+# Process-wide catalog, published by init_localizator().
+# Access it as `localizator.LOCALIZATOR` (or through get_loc()): it is
+# replaced when the translation files change.
+LOCALIZATOR: Localizator | None = None
+
+# Fingerprint of the translation files LOCALIZATOR was built from
+_loaded_fingerprint = None
+_build_lock = threading.Lock()
+
+
+def _locals_fingerprint(locals_directory: Path) -> tuple:
+    fingerprint = [str(locals_directory)]
+    for yaml_file in sorted(locals_directory.rglob("*.yaml")):
+        stat = yaml_file.stat()
+        fingerprint.append((str(yaml_file.relative_to(locals_directory)), stat.st_mtime_ns, stat.st_size))
+    return tuple(fingerprint)
+
+
+def selected_language() -> LangEnum:
+    """The language selected in this session."""
+    return st.session_state.get("language") or Localizator.default_language
+
+
+def get_loc(lang: LangEnum | None = None) -> LocNamespace:
+    """Translations for lang, defaulting to the language selected in this session."""
+    if lang is None:
+        lang = selected_language()
+    return LOCALIZATOR.get(lang)
 
 
 def init_localizator(locals_directory: Path):
-    if st.session_state.get("localizator"):
+    global LOCALIZATOR, _loaded_fingerprint
+
+    fingerprint = _locals_fingerprint(Path(locals_directory))
+    if LOCALIZATOR is not None and fingerprint == _loaded_fingerprint:
         return
 
+    with _build_lock:
+        if LOCALIZATOR is not None and fingerprint == _loaded_fingerprint:
+            return
+        LOCALIZATOR = _build_localizator(Path(locals_directory))
+        _loaded_fingerprint = fingerprint
+
+
+def _build_localizator(locals_directory: Path) -> Localizator:
     translations = {}
 
     def load_translations_from_dir(lang_dir: Path) -> dict:
@@ -63,7 +115,7 @@ def init_localizator(locals_directory: Path):
 
         translations[lang] = merged_with_fallback
 
-    st.session_state.localizator = Localizator(translations)
+    return Localizator(translations)
 
 
 def select_local():
@@ -82,4 +134,4 @@ def select_local():
             )
 
         if "char_controller" in st.session_state:
-            st.session_state.char_controller.loc = st.session_state.localizator.get(st.session_state.language)
+            st.session_state.char_controller.loc = get_loc(st.session_state.language)
@@ -0,0 +1,210 @@
+# fabula_charsheet/data/migrations.py
+import json
+import logging
+import sqlite3
+from typing import Callable, Iterator, NamedTuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows read per round trip when a migration rewrites existing rows
+BACKFILL_CHUNK_SIZE = 500
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+# Ordered by version; PRAGMA user_version holds the last one applied
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, description: str):
+    """Registers a schema step. Versions must be added in increasing order and never change."""
+    def register(apply: Callable[[sqlite3.Connection], None]):
+        if MIGRATIONS and MIGRATIONS[-1].version >= version:
+            raise ValueError(f"Migration {version} is out of order")
+        MIGRATIONS.append(Migration(version, description, apply))
+        return apply
+    return register
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def migrate(conn: sqlite3.Connection, migrations: list[Migration] | None = None) -> int:
+    """
+    Brings the database up to the latest schema and returns its version.
+
+    Every step runs in its own transaction together with the user_version
+    bump, so a failing step leaves the database at the previous version.
+    BEGIN IMMEDIATE makes a second process wait for the first one's step
+    instead of applying it twice.
+    """
+    for step in migrations if migrations is not None else MIGRATIONS:
+        if step.version <= schema_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have applied it while we waited for the lock
+            if step.version > schema_version(conn):
+                logger.info(f"Migrating database to version {step.version}: {step.description}")
+                step.apply(conn)
+                conn.execute(f"PRAGMA user_version = {int(step.version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return schema_version(conn)
+
+
+def column_names(conn: sqlite3.Connection, table: str) -> set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def iter_chunks(
+    conn: sqlite3.Connection,
+    table: str,
+    columns: str,
+    chunk_size: int = BACKFILL_CHUNK_SIZE,
+) -> Iterator[list[sqlite3.Row]]:
+    """Streams a table in rowid order, chunk_size rows at a time, each row starting with its rowid."""
+    last_rowid = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT rowid, {columns} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last_rowid, chunk_size)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_rowid = rows[-1][0]
+
+
+def backfill(
+    conn: sqlite3.Connection,
+    table: str,
+    columns: str,
+    update_sql: str,
+    compute: Callable[[sqlite3.Row], tuple | None],
+    chunk_size: int = BACKFILL_CHUNK_SIZE,
+) -> int:
+    """
+    Rewrites existing rows chunk by chunk, so only one chunk is in memory at a time.
+
+    compute gets each selected row (rowid first) and returns the parameters of
+    update_sql, or None to leave the row alone. Returns the number of rows updated.
+    """
+    updated = 0
+    for rows in iter_chunks(conn, table, columns, chunk_size):
+        params = [p for p in map(compute, rows) if p is not None]
+        if params:
+            conn.executemany(update_sql, params)
+            updated += len(params)
+    return updated
+
+
+def summary_from_data(char_data: dict | str) -> tuple[int | None, list[str]]:
+    """The level and class names of a character payload, for the summary columns."""
+    if isinstance(char_data, str):
+        try:
+            char_data = json.loads(char_data)
+        except json.JSONDecodeError:
+            return None, []
+    if not isinstance(char_data, dict):
+        return None, []
+    classes = [c.get("name") for c in char_data.get("classes") or [] if isinstance(c, dict)]
+    return char_data.get("level"), [name for name in classes if name]
+
+
+# --- MIGRATIONS ---
+# Databases created before versioning report user_version 0 but may already
+# have some of this schema, so the early steps only add what is missing.
+
+@migration(1, "users and characters tables")
+def _create_tables(conn: sqlite3.Connection):
+    # 1. Users Table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 2. Characters Table (Linked to Users)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS characters (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            name TEXT,
+            data JSON NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+
+
+@migration(2, "character summary columns (level, classes)")
+def _add_summary_columns(conn: sqlite3.Connection):
+    existing = column_names(conn, "characters")
+    if "level" not in existing:
+        conn.execute("ALTER TABLE characters ADD COLUMN level INTEGER")
+    if "classes" not in existing:
+        conn.execute("ALTER TABLE characters ADD COLUMN classes TEXT")
+
+    def compute(row):
+        level, classes = summary_from_data(row['data'])
+        return level, json.dumps(classes), row[0]
+
+    backfill(
+        conn, "characters", "data",
+        "UPDATE characters SET level = ?, classes = ? WHERE rowid = ?",
+        compute,
+    )
+
+
+@migration(3, "roster indexes")
+def _add_roster_indexes(conn: sqlite3.Connection):
+    # Listing a user's roster should not scan every user's characters
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_characters_user_updated ON characters (user_id, updated_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_characters_user_name ON characters (user_id, name COLLATE NOCASE)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_characters_user_level ON characters (user_id, IFNULL(level, 0))")
+
+
+@migration(4, "per-row payload encoding")
+def _add_payload_encoding(conn: sqlite3.Connection):
+    # Existing rows stay plain JSON; they are compressed the next time they are saved
+    if "encoding" not in column_names(conn, "characters"):
+        conn.execute("ALTER TABLE characters ADD COLUMN encoding TEXT NOT NULL DEFAULT 'json'")
+
+
+@migration(5, "character row versions")
+def _add_row_versions(conn: sqlite3.Connection):
+    if "version" not in column_names(conn, "characters"):
+        conn.execute("ALTER TABLE characters ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+
+@migration(6, "character states")
+def _create_character_states(conn: sqlite3.Connection):
+    # HP/MP/IP get their own columns so combat updates only touch this small row
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS character_states (
+            char_id TEXT PRIMARY KEY,
+            minus_hp INTEGER NOT NULL DEFAULT 0,
+            minus_mp INTEGER NOT NULL DEFAULT 0,
+            minus_ip INTEGER NOT NULL DEFAULT 0,
+            conditions JSON NOT NULL DEFAULT '{}',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(char_id) REFERENCES characters(id) ON DELETE CASCADE
+        )
+    """)
@@ -70,6 +70,8 @@ class Character(BaseModel):
     special: CharSpecial = Field(default_factory=CharSpecial)
     heroic_skills: list[HeroicSkill] = list()
     bonds: list[Bond] = list()
+    # Compendium references that did not resolve on load, written back as they were (see data.references)
+    unresolved_references: list[dict] = list()
 
     def set_level(self, level: int, loc: LocNamespace):
         if not 1 <= level <= 60:
@@ -27,7 +27,4 @@ class ClassName(StrEnum):
 
     def localized_name(self, loc: LocNamespace) -> str:
         key = f"class_{self.name}"
-        try:
-            return getattr(loc, key)
-        except AttributeError:
-            return self.name.capitalize()
+        return getattr(loc, key, self.name.capitalize())
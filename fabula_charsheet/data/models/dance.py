@@ -14,10 +14,7 @@ class DanceDuration(StrEnum):
 
     def localized_name(self, loc: LocNamespace) -> str:
         key = f"dance_duration_{self.name}"
-        try:
-            return getattr(loc, key)
-        except AttributeError:
-            return self.name.capitalize()
+        return getattr(loc, key, self.name.capitalize())
 
 class Dance(BaseModel):
     name: str = ""
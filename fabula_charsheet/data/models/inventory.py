@@ -3,19 +3,37 @@ from annotated_types import Len
 from pydantic import BaseModel, Field
 from typing import Annotated
 
-from .item import Item
+from .item import Item, new_item_uid
 from .weapon import Weapon
 from .armor import Armor
 from .shield import Shield
 from .accessory import Accessory
 
 
+EQUIPPED_SLOTS = ("main_hand", "off_hand", "armor", "accessory")
+
+
 class Equipped(BaseModel):
     main_hand: Weapon | None = None
     off_hand: Weapon | Shield | None = None
     armor: Armor | None = None
     accessory: Accessory | None = None
 
+    def items(self) -> list[Item]:
+        return [item for item in (self.main_hand, self.off_hand, self.armor, self.accessory) if item is not None]
+
+    def slot_of(self, item: Item) -> str | None:
+        """The slot holding item, matched by id when both have one."""
+        for slot in EQUIPPED_SLOTS:
+            equipped = getattr(self, slot)
+            if equipped is not None and equipped.same_item(item):
+                return slot
+        return None
+
+    def is_equipped(self, item: Item) -> bool:
+        return self.slot_of(item) is not None
+
+
 class Backpack(BaseModel):
     armors: list[Armor] = list()
     weapons: list[Weapon] = list()
@@ -23,6 +41,12 @@ class Backpack(BaseModel):
     accessories: list[Accessory] = list()
     other: list[Item] = list()
 
+    # uid -> item, rebuilt when the lists were changed without add_item/remove_item
+    _index: dict[str, Item] | None = None
+    # (id(item), item.uid) of every listed item when _index was last in sync; the
+    # index holds the items, so their id() cannot be reused while it is compared
+    _indexed_items: tuple[tuple[int, str], ...] | None = None
+
     def all_items(self):
         items = []
         items.extend(self.armors)
@@ -33,31 +57,85 @@ class Backpack(BaseModel):
 
         return items
 
-    def add_item(self, item: Item):
+    def _lists(self) -> tuple[list[Item], ...]:
+        return self.armors, self.weapons, self.shields, self.accessories, self.other
+
+    def _snapshot(self) -> tuple[tuple[int, str], ...]:
+        # Catches items replaced in place (backpack.weapons[i] = other) and changed uids, not only new sizes
+        return tuple((id(item), item.uid) for items in self._lists() for item in items)
+
+    def _list_for(self, item: Item) -> list[Item]:
         if isinstance(item, Weapon):
-            self.weapons.append(item)
+            return self.weapons
         elif isinstance(item, Armor):
-            self.armors.append(item)
+            return self.armors
         elif isinstance(item, Shield):
-            self.shields.append(item)
+            return self.shields
         elif isinstance(item, Accessory):
-            self.accessories.append(item)
+            return self.accessories
         else:
-            self.other.append(item)
+            return self.other
+
+    def index(self) -> dict[str, Item]:
+        """Items by uid. Items without a uid, or sharing one, get a new uid here."""
+        if self._index is None or self._snapshot() != self._indexed_items:
+            index = {}
+            for items in self._lists():
+                for item in items:
+                    if not item.uid or item.uid in index:
+                        item.uid = new_item_uid()
+                    index[item.uid] = item
+            self._index = index
+            self._indexed_items = self._snapshot()
+        return self._index
+
+    def get_item(self, uid: str) -> Item | None:
+        return self.index().get(uid)
+
+    def add_item(self, item: Item):
+        index = self.index()
+        if not item.uid or item.uid in index:
+            item.uid = new_item_uid()
+        self._list_for(item).append(item)
+        index[item.uid] = item
+        self._indexed_items = self._snapshot()
 
     def remove_item(self, item: Item):
-        if isinstance(item, Weapon):
-            self.weapons.remove(item)
-        elif isinstance(item, Armor):
-            self.armors.remove(item)
-        elif isinstance(item, Shield):
-            self.shields.remove(item)
-        elif isinstance(item, Accessory):
-            self.accessories.remove(item)
-        else:
-            self.other.remove(item)
+        items = self._list_for(item)
+        # index() has given item a uid if it is one of ours
+        stored = self.index().get(item.uid)
+        if stored is None:
+            # A copy from elsewhere; fall back to comparing fields
+            items.remove(item)
+            self._indexed_items = None
+            return
+        for position, entry in enumerate(items):
+            if entry is stored:
+                del items[position]
+                break
+        del self._index[stored.uid]
+        self._indexed_items = self._snapshot()
+
 
 class Inventory(BaseModel):
     zenit: int = 0
     equipped: Equipped = Field(default_factory=Equipped)
     backpack: Backpack = Field(default_factory=Backpack)
+
+    def model_post_init(self, __context):
+        self.link_equipped()
+
+    def link_equipped(self):
+        """
+        Gives equipped items without a uid the uid of the backpack item they are a
+        copy of, for inventories saved before items had ids.
+        """
+        unlinked = [item for item in self.equipped.items() if not item.uid]
+        if not unlinked:
+            return
+        self.backpack.index()
+        for equipped in unlinked:
+            for item in self.backpack._list_for(equipped):
+                if item == equipped:
+                    equipped.uid = item.uid
+                    break
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import uuid
 
 from pydantic import BaseModel
 from typing import TYPE_CHECKING
@@ -19,13 +20,29 @@ class Item(BaseModel):
     bonus_defense: int = 0
     bonus_magic_defense: int = 0
     bonus_initiative: int = 0
+    # Identifies this copy inside a character's inventory; empty for compendium entries
+    uid: str = ""
+
+    def __eq__(self, other):
+        if not isinstance(other, Item):
+            return super().__eq__(other)
+        # Two inventory items with different ids are never equal; see same_item for the identity check
+        if self.uid and other.uid and self.uid != other.uid:
+            return False
+        return type(self) is type(other) and _fields(self) == _fields(other)
+
+    def same_item(self, other) -> bool:
+        """True if other is this inventory item, even edited since: matched by id when both have one."""
+        if not isinstance(other, Item):
+            return False
+        if self.uid and other.uid:
+            return self.uid == other.uid
+        # Compendium entries and items saved before they had ids
+        return self == other
 
     def localized_name(self, loc: LocNamespace) -> str:
         key = f"item_{self.name}"
-        try:
-            return getattr(loc, key)
-        except AttributeError:
-            return self.name.capitalize()
+        return getattr(loc, key, self.name.capitalize())
 
     def localized_quality(self, loc: LocNamespace) -> str:
         if self.quality == "no_quality":
@@ -33,10 +50,17 @@ class Item(BaseModel):
         elif self.quality == "improvised":
             return getattr(loc, "improvised_quality", self.quality)
         else:
-            try:
-                loc_quality =  getattr(loc, f"quality_{self.quality}_short")
-                if self.quality_detail:
-                    return loc_quality.format(*[q.localized_name(loc) for q in self.quality_detail])
-                return loc_quality
-            except AttributeError:
+            loc_quality = getattr(loc, f"quality_{self.quality}_short", None)
+            if loc_quality is None:
                 return self.quality
+            if self.quality_detail:
+                return loc_quality.format(*[q.localized_name(loc) for q in self.quality_detail])
+            return loc_quality
+
+
+def _fields(item: Item) -> dict:
+    return {key: value for key, value in item.__dict__.items() if key != "uid"}
+
+
+def new_item_uid() -> str:
+    return uuid.uuid4().hex
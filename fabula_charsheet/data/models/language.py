@@ -1,18 +1,41 @@
+from collections.abc import Mapping
 from enum import StrEnum, auto
-
-from pydantic import RootModel
+from types import MappingProxyType
 
 
 class LangEnum(StrEnum):
     en = auto()
     ru = auto()
 
-class LocNamespace(RootModel[dict[str, str]]):
-    def __getattr__(self, item: str) -> str:
-        try:
-            return self.root[item]
-        except KeyError:
-            raise AttributeError(f"Translation key '{item}' not found")
+class LocNamespace:
+    """
+    Read-only translations of one language.
+
+    Keys are stored as instance attributes, so `loc.key` and
+    `getattr(loc, key, default)` are plain dict lookups and a missing key
+    falls back to the default without raising. Instances are built once per
+    language by the Localizator and shared.
+    """
+    __slots__ = ("__dict__",)
+
+    def __init__(self, root: Mapping[str, str]):
+        object.__setattr__(self, "__dict__", dict(root))
+
+    @property
+    def root(self) -> Mapping[str, str]:
+        return MappingProxyType(self.__dict__)
 
     def __getitem__(self, item: str) -> str:
-        return self.root[item]
+        return self.__dict__[item]
+
+    def __contains__(self, item: str) -> bool:
+        return item in self.__dict__
+
+    def get(self, item: str, default: str | None = None) -> str | None:
+        return self.__dict__.get(item, default)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("LocNamespace is read-only")
+
+    def __delattr__(self, key):
+        raise AttributeError("LocNamespace is read-only")
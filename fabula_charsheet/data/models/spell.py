@@ -20,10 +20,7 @@ class SpellTarget(StrEnum):
 
     def localized_name(self, loc: LocNamespace) -> str:
         key = f"spell_target_{self.name}"
-        try:
-            return getattr(loc, key)
-        except AttributeError:
-            return self.name.replace("_", " ").capitalize()
+        return getattr(loc, key, self.name.replace("_", " ").capitalize())
 
 class SpellDuration(StrEnum):
     instantaneous = auto()
@@ -31,10 +28,7 @@ class SpellDuration(StrEnum):
 
     def localized_name(self, loc: LocNamespace) -> str:
         key = f"spell_duration_{self.name}"
-        try:
-            return getattr(loc, key)
-        except AttributeError:
-            return self.name.capitalize()
+        return getattr(loc, key, self.name.capitalize())
 
 class Spell(BaseModel):
     name: str = ""
@@ -26,10 +26,7 @@ class WeaponCategory(StrEnum):
 
     def localized_name(self, loc: LocNamespace) -> str:
         key = f"weapon_category_{self.name}"
-        try:
-            return getattr(loc, key)
-        except AttributeError:
-            return self.name.capitalize()
+        return getattr(loc, key, self.name.capitalize())
 
 class GripType(StrEnum):
     one_handed = auto()
@@ -37,10 +34,7 @@ class GripType(StrEnum):
 
     def localized_name(self, loc: LocNamespace) -> str:
         key = f"grip_type_{self.name}"
-        try:
-            return getattr(loc, key)
-        except AttributeError:
-            return self.name.replace("_", " ").capitalize()
+        return getattr(loc, key, self.name.replace("_", " ").capitalize())
 
 class WeaponRange(StrEnum):
     melee = auto()
@@ -48,10 +42,7 @@ class WeaponRange(StrEnum):
 
     def localized_name(self, loc: LocNamespace) -> str:
         key = f"weapon_range_{self.name}"
-        try:
-            return getattr(loc, key)
-        except AttributeError:
-            return self.name.capitalize()
+        return getattr(loc, key, self.name.capitalize())
 
 class Weapon(Item):
     martial: bool = False
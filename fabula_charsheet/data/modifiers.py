@@ -0,0 +1,91 @@
+# fabula_charsheet/data/modifiers.py
+"""
+Attribute modifiers compiled from assets/modifiers/attributes.yaml.
+
+Every source (a status, an improved attribute or a therioform) becomes one
+vector of changes to (dexterity, might, insight, willpower). The current
+attributes of a character are its base values plus the sum of the vectors of
+its active sources, clamped to the allowed range.
+"""
+from typing import Iterable, Sequence
+
+# Order of the components of every vector
+ATTRIBUTES = ("dexterity", "might", "insight", "willpower")
+
+Vector = tuple[int, int, int, int]
+ZERO: Vector = (0, 0, 0, 0)
+
+# Section of the assets file -> prefix of its source names ("status.dazed", ...)
+SOURCE_PREFIXES = {
+    "statuses": "status",
+    "improved_attributes": "improved",
+    "therioforms": "therioform",
+}
+
+
+def _name(entry) -> str:
+    # Improved attributes may be AttributeName values or Attribute models
+    return str(getattr(entry, "name", entry))
+
+
+def active_sources(state) -> list[str]:
+    """Source names of the statuses, improved attributes and therioforms active in a CharState."""
+    sources = [f"status.{status}" for status in state.statuses]
+    sources.extend(f"improved.{_name(attribute)}" for attribute in state.improved_attributes)
+    sources.extend(f"therioform.{therioform.name}" for therioform in state.active_therioforms)
+    return sources
+
+
+class ModifierTable:
+    def __init__(self, vectors: dict[str, Vector] | None = None):
+        self.vectors: dict[str, Vector] = vectors or {}
+
+    @classmethod
+    def compile(cls, data: dict | None) -> "ModifierTable":
+        """Builds the vectors from the parsed assets file; unknown sections or attributes raise ValueError."""
+        vectors = {}
+        for section, entries in (data or {}).items():
+            prefix = SOURCE_PREFIXES.get(section)
+            if prefix is None:
+                raise ValueError(f"Unknown modifier section {section}")
+            for name, changes in (entries or {}).items():
+                vector = [0] * len(ATTRIBUTES)
+                for attribute, value in (changes or {}).items():
+                    if attribute not in ATTRIBUTES:
+                        raise ValueError(f"Unknown attribute {attribute} in {section}.{name}")
+                    vector[ATTRIBUTES.index(attribute)] += int(value)
+                vectors[f"{prefix}.{name}"] = tuple(vector)
+        return cls(vectors)
+
+    def sources(self, attribute: str) -> list[str]:
+        """Every source that changes the given attribute."""
+        index = ATTRIBUTES.index(attribute)
+        return [name for name, vector in self.vectors.items() if vector[index]]
+
+    def modifier(self, sources: Iterable[str]) -> Vector:
+        """Sum of the vectors of the given sources; unknown sources change nothing."""
+        dex = mig = ins = wlp = 0
+        vectors = self.vectors
+        for source in sources:
+            d, m, i, w = vectors.get(source, ZERO)
+            dex += d
+            mig += m
+            ins += i
+            wlp += w
+        return dex, mig, ins, wlp
+
+    def apply(self, bases: Sequence[int], sources: Iterable[str], minimum: int, maximum: int) -> Vector:
+        """Current attribute values for the given base values and active sources."""
+        return tuple(
+            min(maximum, max(minimum, base + change))
+            for base, change in zip(bases, self.modifier(sources))
+        )
+
+    def apply_many(
+        self,
+        rows: Iterable[tuple[Sequence[int], Iterable[str]]],
+        minimum: int,
+        maximum: int,
+    ) -> list[Vector]:
+        """apply() over (bases, sources) pairs, e.g. the attributes of a whole party."""
+        return [self.apply(bases, sources, minimum, maximum) for bases, sources in rows]
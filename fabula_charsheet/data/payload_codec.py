@@ -0,0 +1,34 @@
+# fabula_charsheet/data/payload_codec.py
+import lzma
+import zlib
+
+# Value of characters.encoding -> how the data column is stored
+JSON = "json"  # plain JSON text, as written before compression existed
+ZLIB = "zlib"
+LZMA = "lzma"
+PAYLOAD_ENCODINGS = (JSON, ZLIB, LZMA)
+
+ZLIB_LEVEL = 6
+
+
+def encode_payload(payload: str, encoding: str) -> str | bytes:
+    """Encodes a JSON payload for the data column; compressed encodings are stored as BLOBs."""
+    if encoding == JSON:
+        return payload
+    raw = payload.encode("utf-8")
+    if encoding == ZLIB:
+        return zlib.compress(raw, ZLIB_LEVEL)
+    if encoding == LZMA:
+        return lzma.compress(raw)
+    raise ValueError(f"Unknown payload encoding: {encoding}")
+
+
+def decode_payload(data: str | bytes, encoding: str | None) -> str:
+    """Returns the JSON text of a data column value stored with encoding."""
+    if encoding is None or encoding == JSON:
+        return data.decode("utf-8") if isinstance(data, bytes) else data
+    if encoding == ZLIB:
+        return zlib.decompress(data).decode("utf-8")
+    if encoding == LZMA:
+        return lzma.decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown payload encoding: {encoding}")
@@ -0,0 +1,239 @@
+# fabula_charsheet/data/references.py
+"""
+Compact character payloads: compendium entries a character owns unchanged are
+stored as {"$ref": [collection, name]} instead of a full copy.
+
+compact() works on the JSON form of a character (model_dump(mode="json")) and
+only replaces an entry when it is identical to the compendium entry of the
+same name, so customized or upgraded items are always stored in full. The
+inventory id of an item is not part of that comparison; it is kept next to
+the reference as {"$ref": [...], "uid": ...}.
+expand() puts private copies of the compendium models back in place of the
+references; pydantic accepts those instances as they are, so only the
+customized entries are validated again when the Character is built.
+A reference the compendium no longer resolves (a renamed or removed entry) is
+taken out of the character and parked, untouched, under UNRESOLVED_KEY; the
+Character carries it along and compact() puts it back where it was, so saving
+the character again neither loses it nor replaces it with default stats.
+"""
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REF_KEY = "$ref"
+# Inventory id of an item (Item.uid), kept on references to compendium items
+UID_KEY = "uid"
+# Character field holding the references expand() could not resolve
+UNRESOLVED_KEY = "unresolved_references"
+
+# Payload path of a list of entries -> compendium collection they come from
+LIST_SLOTS = (
+    (("inventory", "backpack", "weapons"), "weapons"),
+    (("inventory", "backpack", "armors"), "armors"),
+    (("inventory", "backpack", "shields"), "shields"),
+    (("inventory", "backpack", "accessories"), "accessories"),
+    (("inventory", "backpack", "other"), "items"),
+    (("special", "therioforms"), "therioforms"),
+    (("special", "dances"), "dances"),
+    (("special", "arcana"), "arcana"),
+    (("special", "inventions"), "inventions"),
+)
+
+# Payload path of a single entry -> compendium collections it may come from
+SINGLE_SLOTS = (
+    (("inventory", "equipped", "main_hand"), ("weapons",)),
+    (("inventory", "equipped", "off_hand"), ("weapons", "shields")),
+    (("inventory", "equipped", "armor"), ("armors",)),
+    (("inventory", "equipped", "accessory"), ("accessories",)),
+)
+
+
+class ReferenceIndex:
+    """Name lookup and cached JSON dumps of the entries of one Compendium."""
+    def __init__(self, compendium):
+        equipment = compendium.equipment
+        self.collections: dict[str, dict[str, object]] = {
+            "weapons": _by_name(equipment.weapons),
+            "armors": _by_name(equipment.armors),
+            "shields": _by_name(equipment.shields),
+            "accessories": _by_name(equipment.accessories),
+            "items": _by_name(equipment.items),
+            "therioforms": _by_name(compendium.therioforms),
+            "dances": _by_name(compendium.dances),
+            "arcana": _by_name(compendium.arcana),
+            "inventions": _by_name(compendium.inventions),
+        }
+        for class_name, spells in compendium.spells.spells.items():
+            self.collections[_spells_collection(class_name)] = _by_name(spells)
+        self._dumps: dict[tuple[str, str], dict] = {}
+
+    def get(self, collection: str, name: str):
+        return self.collections.get(collection, {}).get(name)
+
+    def reference(self, entry, collections: tuple[str, ...]) -> dict | None:
+        """Returns a reference for a dumped entry if it is unchanged from the compendium."""
+        if not isinstance(entry, dict):
+            return None
+        name = entry.get("name")
+        uid = entry.get(UID_KEY)
+        if uid is not None:
+            entry = {key: value for key, value in entry.items() if key != UID_KEY}
+        for collection in collections:
+            if self.get(collection, name) is not None and self._dump(collection, name) == entry:
+                reference = {REF_KEY: [collection, name]}
+                if uid:
+                    reference[UID_KEY] = uid
+                return reference
+        return None
+
+    def resolve(self, reference: dict):
+        """Returns a private copy of the referenced compendium model, or None if it is gone."""
+        try:
+            collection, name = reference[REF_KEY]
+        except (TypeError, ValueError):
+            return None
+        model = self.get(collection, name)
+        if model is None:
+            return None
+        model = model.model_copy(deep=True)
+        if reference.get(UID_KEY):
+            model.uid = reference[UID_KEY]
+        return model
+
+    def _dump(self, collection: str, name: str) -> dict:
+        key = (collection, name)
+        dump = self._dumps.get(key)
+        if dump is None:
+            dump = self.get(collection, name).model_dump(mode="json")
+            dump.pop(UID_KEY, None)
+            self._dumps[key] = dump
+        return dump
+
+
+def _by_name(entries) -> dict[str, object]:
+    by_name = {}
+    for entry in entries:
+        # The first entry wins, as in the compendium lookups
+        by_name.setdefault(entry.name, entry)
+    return by_name
+
+
+def _spells_collection(class_name) -> str:
+    return f"spells:{class_name}"
+
+
+# The index of the Compendium currently published; rebuilt when it is replaced
+_index: tuple[object, ReferenceIndex] | None = None
+_index_lock = threading.Lock()
+
+
+def reference_index(compendium) -> ReferenceIndex:
+    global _index
+    current = _index
+    if current is not None and current[0] is compendium:
+        return current[1]
+    with _index_lock:
+        if _index is None or _index[0] is not compendium:
+            _index = (compendium, ReferenceIndex(compendium))
+        return _index[1]
+
+
+def _get_path(payload: dict, path: tuple[str, ...]):
+    node = payload
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node
+
+
+def _set_path(payload: dict, path: tuple[str, ...], value):
+    node = payload
+    for key in path[:-1]:
+        node = node[key]
+    node[path[-1]] = value
+
+
+def _list_slots(payload: dict):
+    """Yields (path, entries, collections) for every list of compendium entries in the payload."""
+    for path, collection in LIST_SLOTS:
+        entries = _get_path(payload, path)
+        if isinstance(entries, list):
+            yield path, entries, (collection,)
+    spells = payload.get("spells")
+    if isinstance(spells, dict):
+        for class_name, entries in spells.items():
+            if isinstance(entries, list):
+                yield ("spells", class_name), entries, (_spells_collection(class_name),)
+
+
+def compact(payload: dict, compendium) -> dict:
+    """Replaces unmodified compendium entries of a dumped character with references, in place."""
+    index = reference_index(compendium)
+    unresolved = payload.pop(UNRESOLVED_KEY, None)
+    for path, entries, collections in _list_slots(payload):
+        _set_path(payload, path, [index.reference(entry, collections) or entry for entry in entries])
+    for path, collections in SINGLE_SLOTS:
+        entry = _get_path(payload, path)
+        reference = index.reference(entry, collections)
+        if reference is not None:
+            _set_path(payload, path, reference)
+    _restore_unresolved(payload, unresolved)
+    return payload
+
+
+def _is_reference(entry) -> bool:
+    return isinstance(entry, dict) and REF_KEY in entry
+
+
+def _restore_unresolved(payload: dict, unresolved: list[dict] | None):
+    """Puts parked references back at their place: their list index, or their slot if it is still empty."""
+    for parked in unresolved or []:
+        try:
+            path, reference = tuple(parked["path"]), parked["ref"]
+            if "index" in parked:
+                entries = _get_path(payload, path)
+                if not isinstance(entries, list):
+                    entries = []
+                    _set_path(payload, path, entries)
+                entries.insert(min(parked["index"], len(entries)), reference)
+            elif _get_path(payload, path) is None:
+                _set_path(payload, path, reference)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Failed to restore unresolved reference {parked}: {e}")
+
+
+def expand(payload: dict, compendium) -> dict:
+    """Replaces references with copies of the compendium models, in place."""
+    index = reference_index(compendium)
+    # Parked by an earlier expand() and saved in full: try them again
+    _restore_unresolved(payload, payload.pop(UNRESOLVED_KEY, None))
+    unresolved = []
+    for path, entries, _ in _list_slots(payload):
+        if not any(map(_is_reference, entries)):
+            continue
+        resolved = []
+        for position, entry in enumerate(entries):
+            if _is_reference(entry):
+                model = index.resolve(entry)
+                if model is None:
+                    logger.error(f"Unknown compendium reference {entry[REF_KEY]}; kept aside until it resolves")
+                    unresolved.append({"path": list(path), "index": position, "ref": entry})
+                    continue
+                entry = model
+            resolved.append(entry)
+        _set_path(payload, path, resolved)
+    for path, _ in SINGLE_SLOTS:
+        entry = _get_path(payload, path)
+        if _is_reference(entry):
+            model = index.resolve(entry)
+            if model is None:
+                logger.error(f"Unknown compendium reference {entry[REF_KEY]}; kept aside until it resolves")
+                unresolved.append({"path": list(path), "ref": entry})
+            _set_path(payload, path, model)
+    if unresolved:
+        payload[UNRESOLVED_KEY] = unresolved
+    return payload
@@ -1,90 +1,539 @@
 # fabula_charsheet/data/saved_characters.py
+import copy
+import hashlib
+import json
 import logging
+import threading
+from collections.abc import Mapping
+from typing import Callable
 import streamlit as st
+from data import compendium as c
 from data.models import Character
-from data.database import DB
+from data.references import compact, expand
+from data.database import DB, VITALS, PageCursor, SaveResult, SummaryPage
+from data.autosave import AutosaveWriter, DEFAULT_DEBOUNCE_SECONDS, Row
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class CharacterMap(Mapping):
+    """
+    char_id -> Character, built lazily from the stored JSON.
+
+    Raw payloads are kept as they came from the DB (or the autosave writer) and
+    only validated into a Character the first time they are looked up; the
+    Character is cached from then on and the raw payload dropped. resolve is
+    applied to the decoded payload first (e.g. to expand compendium references).
+    """
+    def __init__(self, resolve: Callable[[dict], dict] | None = None):
+        self._resolve = resolve
+        self._raw: dict[str, str | dict] = {}
+        self._characters: dict[str, Character] = {}
+
+    def __getitem__(self, char_id) -> Character:
+        char_id = str(char_id)
+        character = self._characters.get(char_id)
+        if character is not None:
+            return character
+
+        raw = self._raw[char_id]
+        try:
+            char_data = json.loads(raw) if isinstance(raw, str) else raw
+            if self._resolve is not None:
+                char_data = self._resolve(char_data)
+            # Re-hydrate the dictionary into a Character object
+            character = Character(**char_data)
+        except Exception:
+            # A payload that does not validate will not validate next time either
+            del self._raw[char_id]
+            raise
+        self._characters[char_id] = character
+        del self._raw[char_id]
+        return character
+
+    def __iter__(self):
+        yield from self._characters
+        yield from (char_id for char_id in self._raw if char_id not in self._characters)
+
+    def __len__(self) -> int:
+        return len(self._characters.keys() | self._raw.keys())
+
+    def __contains__(self, char_id) -> bool:
+        char_id = str(char_id)
+        return char_id in self._characters or char_id in self._raw
+
+    def set_raw(self, char_id, payload: str | dict):
+        char_id = str(char_id)
+        self._characters.pop(char_id, None)
+        self._raw[char_id] = payload
+
+    def put(self, character):
+        char_id = str(getattr(character, 'id', None))
+        self._raw.pop(char_id, None)
+        self._characters[char_id] = character
+
+    def discard(self, char_id):
+        char_id = str(char_id)
+        self._raw.pop(char_id, None)
+        self._characters.pop(char_id, None)
+
+    def is_hydrated(self, char_id) -> bool:
+        return str(char_id) in self._characters
+
+    def hydrated(self) -> list[Character]:
+        return list(self._characters.values())
+
+
+class SaveSession:
+    """
+    What one browser session knows about the characters it opened.
+
+    Every session hydrates its own Character objects and remembers the row
+    versions it read or wrote, so two tabs of the same account are checked
+    against each other like two processes.
+    """
+    def __init__(self, user_id: int, resolve: Callable[[dict], dict] | None = None):
+        self.user_id = user_id
+        # char_id -> Character of this session, validated on first access
+        self.characters = CharacterMap(resolve)
+        # char_id -> digest of the payload last written (or queued) to the DB
+        self.saved_digests: dict[str, str] = {}
+        # char_id -> row version last read or written by this session
+        self.versions: dict[str, int] = {}
+        # char_id -> version found in the DB when a save was rejected
+        self.conflicts: dict[str, int | None] = {}
+        # char_id -> CharState dump last read or written
+        self.saved_states: dict[str, dict] = {}
+        # char_id -> (Character, revision) last found saved, see update_character
+        self.revisions: dict[str, tuple[object, int]] = {}
+
+
+# Key of the SaveSession in st.session_state
+SESSION_KEY = "saved_characters"
+
+
 class SavedCharactersRegistry:
-    def __init__(self):
-        self.char_list = []
+    """
+    Persistence of the logged in user's characters.
+
+    With compact_payloads, unmodified compendium entries (spells, equipment,
+    therioforms, dances, arcana, inventions) are saved as references to the
+    shared compendium; payloads saved either way load fine.
+
+    Saves are compare-and-swap against the row version the current session
+    last read or wrote (see SaveSession), so a save from another tab of the
+    same account, or from another process, is never overwritten silently:
+    the character is flagged as conflicting in this session and its autosave
+    paused until it is reloaded or deliberately overwritten.
+
+    The save bookkeeping of the sessions is also touched by the autosave
+    thread and only accessed under _lock.
+    """
+    def __init__(self, autosave_window: float = DEFAULT_DEBOUNCE_SECONDS, compact_payloads: bool = True):
+        self.compact_payloads = compact_payloads
+        self._lock = threading.RLock()
+        self._writer = AutosaveWriter(self._write, window=autosave_window)
 
     def init(self, storage_dir: str):
         # We no longer need file paths, but we keep the method signature 
-        # to avoid breaking main.py calls.
-        self.load_from_disk()
+        # to avoid breaking main.py calls. The roster is read a page at a time
+        # (list_summaries) and characters when they are opened (load_character).
+        pass
 
-    def load_from_disk(self):
+    def _session(self) -> SaveSession | None:
+        """The SaveSession of the current browser session, None if nobody is logged in."""
+        if "user_id" not in st.session_state or not st.session_state.user_id:
+            return None
+        session = st.session_state.get(SESSION_KEY)
+        if session is None or session.user_id != st.session_state.user_id:
+            session = SaveSession(st.session_state.user_id, self._resolve_references)
+            st.session_state[SESSION_KEY] = session
+        return session
+
+    @property
+    def characters(self) -> CharacterMap:
+        """Characters of the CURRENTLY LOGGED IN user opened or saved in this session."""
+        session = self._session()
+        if session is None:
+            return CharacterMap(self._resolve_references)
+        return session.characters
+
+    @staticmethod
+    def _resolve_references(char_data: dict) -> dict:
+        return expand(char_data, c.COMPENDIUM)
+
+    @property
+    def char_list(self) -> list[Character]:
+        """The characters hydrated so far; the roster itself is read with list_summaries."""
+        return self.characters.hydrated()
+
+    def list_summaries(self, after: PageCursor | None = None, **query) -> SummaryPage:
         """
-        Load characters for the CURRENTLY LOGGED IN user.
+        One page of the logged in user's roster, read from the summary columns only.
+
+        Keyword arguments are passed on to DatabaseManager.list_character_summaries.
         """
-        # Safety check: Is a user logged in?
         if "user_id" not in st.session_state or not st.session_state.user_id:
-            self.char_list = []
-            return
+            return SummaryPage([], None)
 
+        user_id = st.session_state.user_id
         try:
-            raw_data = DB.get_user_characters(st.session_state.user_id)
-            self.char_list = []
-            for char_data in raw_data:
-                try:
-                    # Re-hydrate the dictionary into a Character object
-                    if isinstance(char_data, dict):
-                        self.char_list.append(Character(**char_data))
-                except Exception as e:
-                    logger.error(f"Failed to rehydrate character: {e}")
+            page = DB.list_character_summaries(user_id, after=after, **query)
         except Exception as e:
             logger.error(f"Failed to load characters from DB: {e}")
-            self.char_list = []
+            return SummaryPage([], None)
 
-    def save_to_disk(self):
+        # Saves still waiting in the autosave writer are newer than the DB
+        pending = self._writer.pending_for_user(user_id)
+        if not pending:
+            return page
+        items = []
+        for summary in page.items:
+            row = pending.get(summary.id)
+            if row:
+                _, char_name, _, level, classes = row
+                summary = summary._replace(name=char_name, level=level, classes=list(classes))
+            items.append(summary)
+        return page._replace(items=items)
+
+    def roster_ids(self) -> list[str]:
+        """Ids of every character of the logged in user, including saves not written yet."""
+        if "user_id" not in st.session_state or not st.session_state.user_id:
+            return []
+
+        user_id = st.session_state.user_id
+        try:
+            char_ids = DB.get_user_character_ids(user_id)
+        except Exception as e:
+            logger.error(f"Failed to load character ids from DB: {e}")
+            return []
+        # New characters still waiting in the autosave writer
+        stored = set(char_ids)
+        char_ids.extend(char_id for char_id in self._writer.pending_for_user(user_id) if char_id not in stored)
+        return char_ids
+
+    def load_character(self, char_id) -> Character | None:
+        """Returns this session's Character for a roster entry, hydrating it on first use."""
+        session = self._session()
+        if session is None:
+            return None
+
+        characters = session.characters
+        char_id = str(char_id)
+        if char_id not in characters:
+            # A save still waiting in the writer is written first, so the
+            # payload and the version read below belong together
+            if char_id in self._writer.pending_for_user(session.user_id):
+                self._writer.flush(session.user_id)
+            try:
+                record = DB.get_character_record(session.user_id, char_id)
+            except Exception as e:
+                logger.error(f"Failed to load character {char_id} from DB: {e}")
+                return None
+            if record is None:
+                return None
+            with self._lock:
+                session.versions[char_id] = record.version
+            characters.set_raw(char_id, record.payload)
+
+        try:
+            return characters[char_id]
+        except Exception as e:
+            logger.error(f"Failed to rehydrate character: {e}")
+            return None
+
+    def delete_character(self, char_id):
+        """Removes a character from the DB and from the roster."""
+        session = self._session()
+        if session is None:
+            return
+
+        char_id = str(char_id)
+        self._forget(session, char_id)
+        # Saves of other sessions must not bring it back
+        self._writer.discard(char_id)
+        try:
+            DB.delete_character(session.user_id, char_id)
+        except Exception as e:
+            logger.error(f"Failed to delete character {char_id}: {e}")
+
+    def has_conflict(self, char_id) -> bool:
+        """True if a save of the character from this session was rejected because it changed elsewhere."""
+        session = self._session()
+        if session is None:
+            return False
+        with self._lock:
+            return str(char_id) in session.conflicts
+
+    def reload_character(self, char_id) -> Character | None:
+        """Drops this session's changes and re-reads the character as it is stored now."""
+        session = self._session()
+        if session is None:
+            return None
+        self._forget(session, str(char_id))
+        return self.load_character(char_id)
+
+    def overwrite_character(self, character) -> bool:
+        """Resolves a conflict by saving this session's state over the stored one."""
+        session = self._session()
+        if session is None:
+            return False
+        char_id = str(getattr(character, 'id', None))
+        with self._lock:
+            if char_id in session.conflicts:
+                version = session.conflicts.pop(char_id)
+                if version is None:
+                    # Deleted meanwhile: save it as a new row
+                    session.versions.pop(char_id, None)
+                else:
+                    session.versions[char_id] = version
+            session.saved_digests.pop(char_id, None)
+            session.revisions.pop(char_id, None)
+        return self.update_character(character, immediate=True)
+
+    def load_state(self, char_id) -> dict | None:
+        """Returns the saved CharState dump of a character, or None if it has none."""
+        session = self._session()
+        if session is None:
+            return None
+        char_id = str(char_id)
+        try:
+            state = DB.get_character_state(session.user_id, char_id)
+        except Exception as e:
+            logger.error(f"Failed to load state of character {char_id}: {e}")
+            return None
+        if state is not None:
+            with self._lock:
+                session.saved_states[char_id] = state
+        return state
+
+    def save_state(self, char_id, state: dict) -> bool:
         """
-        Saves ALL characters in the current list to the database.
+        Saves a CharState dump (model_dump(mode="json")) if it changed.
+
+        When only HP/MP/IP changed, just those three columns are updated.
+        Like the character itself, the state is only written while the stored
+        character still has the version this session last read or wrote, and
+        not at all while the character is conflicting. Returns False when
+        nothing was written.
         """
-        if "user_id" not in st.session_state or not st.session_state.user_id:
-            logger.error("Cannot save: No user logged in.")
+        session = self._session()
+        if session is None:
+            return False
+
+        char_id = str(char_id)
+        with self._lock:
+            if char_id in session.conflicts:
+                return False
+            previous = session.saved_states.get(char_id)
+            version = session.versions.get(char_id)
+        if previous == state:
+            return False
+        try:
+            if previous is not None and _without_vitals(previous) == _without_vitals(state):
+                saved = DB.save_character_vitals(
+                    session.user_id, char_id, *(state.get(field, 0) for field in VITALS), expected_version=version
+                )
+            else:
+                saved = DB.save_character_state(session.user_id, char_id, state, expected_version=version)
+        except Exception as e:
+            logger.error(f"Failed to save state of character {char_id}: {e}")
+            return False
+        if saved:
+            with self._lock:
+                session.saved_states[char_id] = copy.deepcopy(state)
+        elif version is not None:
+            self._check_conflict(session, char_id, version)
+        return saved
+
+    def _check_conflict(self, session: SaveSession, char_id: str, version: int):
+        """Flags the character as conflicting if its stored version is no longer the one this session knows."""
+        try:
+            record = DB.get_character_record(session.user_id, char_id)
+        except Exception as e:
+            logger.error(f"Failed to check version of character {char_id}: {e}")
             return
+        current = record.version if record is not None else None
+        if current != version:
+            logger.warning(f"Character {char_id} was changed elsewhere (version {current}); state not saved")
+            with self._lock:
+                session.conflicts[char_id] = current
+
+    def _forget(self, session: SaveSession, char_id: str):
+        self._writer.discard(char_id, session)
+        with self._lock:
+            session.saved_digests.pop(char_id, None)
+            session.saved_states.pop(char_id, None)
+            session.versions.pop(char_id, None)
+            session.conflicts.pop(char_id, None)
+            session.revisions.pop(char_id, None)
+        session.characters.discard(char_id)
 
-        for char in self.char_list:
-            self.update_character(char)
+    def _write(self, user_id: int, rows: list[Row], owner: SaveSession, states: dict[str, dict] | None = None):
+        """Save function of the autosave writer: compare-and-swap on the versions known to the session."""
+        session = owner
+        with self._lock:
+            expected = {row[0]: session.versions[row[0]] for row in rows if row[0] in session.versions}
+        results: list[SaveResult] = DB.save_characters(
+            user_id, rows, expected_versions=expected, states=states
+        ) or []
+        with self._lock:
+            for char_id, saved, version in results:
+                if saved:
+                    session.versions[char_id] = version
+                    session.conflicts.pop(char_id, None)
+                    if states and char_id in states:
+                        session.saved_states[char_id] = copy.deepcopy(states[char_id])
+                else:
+                    logger.warning(f"Character {char_id} was changed elsewhere (version {version}); not saved")
+                    session.conflicts[char_id] = version
+                    session.saved_digests.pop(char_id, None)
+                    session.revisions.pop(char_id, None)
 
-    def update_character(self, character):
+    def save_to_disk(self):
         """
-        Update a single character in the DB.
+        Saves ALL characters in the current list to the database.
         """
-        if "user_id" not in st.session_state or not st.session_state.user_id:
+        session = self._session()
+        if session is None:
+            logger.error("Cannot save: No user logged in.")
             return
 
-        # Prepare data
-        if hasattr(character, "model_dump"):
-            data = character.model_dump(mode='json')
+        # One transaction for the changed part of the roster
+        rows = list(map(self._serialize, session.characters.hydrated()))
+        with self._lock:
+            rows = [row for row in rows if self._is_dirty(session, row) and row[0] not in session.conflicts]
+            if not rows:
+                return
+            self._mark_saved(session, rows)
+        try:
+            self._writer.write_now(session.user_id, rows, owner=session)
+        except Exception:
+            self._unmark_saved(session, rows)
+            raise
+
+    def _serialize(self, character) -> Row:
+        """Returns the (id, name, JSON payload, level, classes) row stored for a character."""
+        if self.compact_payloads and hasattr(character, "model_dump"):
+            payload = json.dumps(compact(character.model_dump(mode="json"), c.COMPENDIUM), separators=(",", ":"))
+        elif hasattr(character, "model_dump_json"):
+            payload = character.model_dump_json()
         elif hasattr(character, "to_dict"):
-            data = character.to_dict()
+            payload = json.dumps(character.to_dict())
         else:
-            data = character.__dict__
+            payload = json.dumps(character.__dict__, default=str)
 
         char_id = str(getattr(character, 'id'))
         char_name = getattr(character, 'name', 'Unnamed')
+        level = getattr(character, 'level', None)
+        classes = [str(getattr(c, 'name', c)) for c in getattr(character, 'classes', None) or []]
+        return char_id, char_name, payload, level, classes
+
+    @staticmethod
+    def _digest(row: Row) -> str:
+        # level and classes are derived from the payload
+        char_id, char_name, payload = row[:3]
+        return hashlib.blake2b(f"{char_name}\0{payload}".encode("utf-8"), digest_size=16).hexdigest()
+
+    def _is_dirty(self, session: SaveSession, row: Row) -> bool:
+        with self._lock:
+            return session.saved_digests.get(row[0]) != self._digest(row)
+
+    def _mark_saved(self, session: SaveSession, rows: list[Row]):
+        with self._lock:
+            for row in rows:
+                session.saved_digests[row[0]] = self._digest(row)
+
+    def _unmark_saved(self, session: SaveSession, rows: list[Row]):
+        with self._lock:
+            for row in rows:
+                session.saved_digests.pop(row[0], None)
+                session.revisions.pop(row[0], None)
+
+    def update_character(
+        self,
+        character,
+        immediate: bool = False,
+        state: dict | None = None,
+        revision: int | None = None,
+    ) -> bool:
+        """
+        Update a single character in the DB.
+
+        The write is handed to the background autosave writer, which merges
+        repeated saves of the same character; pass immediate=True to write
+        synchronously. With immediate=True, a CharState dump passed as state
+        is saved in the same transaction. Returns False when the character did
+        not change since it was last saved, or when it is waiting for a
+        conflict to be resolved.
+
+        Whether the character changed is decided by hashing its serialized
+        payload. A caller that counts its changes (CharacterController.revision)
+        passes the count as revision: when it is the count last seen for the
+        same Character object, the character is taken as unchanged without
+        being serialized.
+        """
+        session = self._session()
+        if session is None:
+            return False
+
+        # Update in-memory map
+        session.characters.put(character)
+
+        char_id = str(getattr(character, 'id', None))
+        if revision is not None:
+            with self._lock:
+                known = session.revisions.get(char_id)
+            if known is not None and known[0] is character and known[1] == revision:
+                if state is not None:
+                    self.save_state(char_id, state)
+                return False
+
+        row = self._serialize(character)
+        with self._lock:
+            if row[0] in session.conflicts:
+                return False
+            dirty = self._is_dirty(session, row)
+            if dirty:
+                # Save to DB; a rejected write takes the mark back (see _write)
+                self._mark_saved(session, [row])
+        if not dirty:
+            self._remember_revision(session, character, revision)
+            if state is not None:
+                self.save_state(row[0], state)
+            return False
+
+        try:
+            if immediate and state is not None:
+                self._writer.write_now(session.user_id, [row], owner=session, states={row[0]: state})
+            elif immediate:
+                self._writer.write_now(session.user_id, [row], owner=session)
+            else:
+                if state is not None:
+                    # The state row is small: write it now instead of with the debounced character
+                    self.save_state(row[0], state)
+                self._writer.submit(session.user_id, row, owner=session)
+        except Exception:
+            self._unmark_saved(session, [row])
+            raise
+        if self.has_conflict(row[0]):
+            return False
+        self._remember_revision(session, character, revision)
+        return True
+
+    def _remember_revision(self, session: SaveSession, character, revision: int | None):
+        if revision is not None:
+            with self._lock:
+                session.revisions[str(getattr(character, 'id', None))] = (character, revision)
+
+    def flush(self, user_id: int | None = None):
+        """Writes pending autosaves now (e.g. on logout), for one user or for everyone."""
+        self._writer.flush(user_id)
+
+def _without_vitals(state: dict) -> dict:
+    return {field: value for field, value in state.items() if field not in VITALS}
 
-        # Save to DB
-        DB.save_character(st.session_state.user_id, char_id, char_name, data)
-
-        # Update in-memory list
-        self._update_list_in_memory(character)
-
-    def _update_list_in_memory(self, character):
-        char_id = getattr(character, 'id', None)
-        found = False
-        for i, c in enumerate(self.char_list):
-            if getattr(c, 'id', None) == char_id:
-                self.char_list[i] = character
-                found = True
-                break
-        if not found:
-            self.char_list.append(character)
 
 # Global Singleton
 SAVED_CHARS = SavedCharactersRegistry()
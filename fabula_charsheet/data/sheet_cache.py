@@ -0,0 +1,139 @@
+# fabula_charsheet/data/sheet_cache.py
+"""
+Generated character sheets, keyed by what they are generated from.
+
+The key is a hash of the serialized character, the language and the version
+of the sheet generator, so an edited character, another language or a new
+generator simply maps to another entry; stale entries are never looked up
+again and age out of the LRU. Sheets live in memory and, when a directory is
+configured, on disk as well so they survive restarts.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Memory budget of the in-process cache
+SHEET_CACHE_MAX_BYTES = int(os.environ.get("FABULA_SHEET_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+# Set to keep sheets on disk too; unset keeps them in memory only
+SHEET_CACHE_DIRECTORY = os.environ.get("FABULA_SHEET_CACHE_DIR")
+# Files kept in the disk cache; the least recently written are removed first
+SHEET_CACHE_MAX_FILES = 500
+SHEET_FILE_SUFFIX = ".pdf"
+
+
+def sheet_key(character_data: str | bytes, lang: str, generator_version: int) -> str:
+    """Content address of a sheet: serialized character, language and generator version."""
+    if isinstance(character_data, str):
+        character_data = character_data.encode("utf-8")
+    digest = hashlib.sha256(f"v{generator_version}\0{lang}\0".encode("utf-8"))
+    digest.update(character_data)
+    return digest.hexdigest()
+
+
+class SheetCache:
+    def __init__(
+        self,
+        max_bytes: int = SHEET_CACHE_MAX_BYTES,
+        directory: Path | str | None = None,
+        max_files: int = SHEET_CACHE_MAX_FILES,
+    ):
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory else None
+        self.max_files = max_files
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data
+        data = self._read_file(key)
+        if data is not None:
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes):
+        self._remember(key, data)
+        self._write_file(key, data)
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _path(self, key: str) -> Path:
+        return Path(self.directory, f"{key}{SHEET_FILE_SUFFIX}")
+
+    def _read_file(self, key: str) -> bytes | None:
+        if self.directory is None:
+            return None
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.error(f"Failed to read cached sheet {key}: {e}")
+            return None
+
+    def _write_file(self, key: str, data: bytes):
+        if self.directory is None:
+            return
+        path = self._path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+            self._prune_files()
+        except OSError as e:
+            logger.error(f"Failed to write cached sheet {key}: {e}")
+
+    def _prune_files(self):
+        files = list(self.directory.glob(f"*{SHEET_FILE_SUFFIX}"))
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=lambda f: f.stat().st_mtime_ns)
+        for stale in files[:len(files) - self.max_files]:
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+
+
+# Shared by every session of the process
+SHEET_CACHE = SheetCache(directory=SHEET_CACHE_DIRECTORY)
@@ -0,0 +1,77 @@
+# fabula_charsheet/data/stat_graph.py
+"""
+Derived values that are recomputed only when something they depend on changes.
+
+Every node of a StatGraph names what it is computed from: plain inputs (such as
+"level" or "equipment") and other nodes. Invalidating an input drops the cached
+value of the nodes that depend on it, directly or through other nodes, and
+leaves the rest alone; dropped nodes are computed again the next time they are
+read.
+"""
+from collections import defaultdict
+from typing import Any, Callable, Iterable, Mapping
+
+_MISSING = object()
+
+
+class StatGraph:
+    def __init__(self):
+        self._compute: dict[str, Callable[[], Any]] = {}
+        # Input or node name -> nodes that read it directly
+        self._dependents: dict[str, set[str]] = defaultdict(set)
+        self._values: dict[str, Any] = {}
+        # Last values seen by sync(), per input
+        self._inputs: dict[str, Any] = {}
+
+    def add_node(self, name: str, compute: Callable[[], Any], depends_on: Iterable[str] = ()):
+        if name in self._compute:
+            raise ValueError(f"Node {name} is already defined")
+        self._compute[name] = compute
+        for dependency in depends_on:
+            self._dependents[dependency].add(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._compute
+
+    def get(self, name: str):
+        value = self._values.get(name, _MISSING)
+        if value is _MISSING:
+            value = self._values[name] = self._compute[name]()
+        return value
+
+    def is_cached(self, name: str) -> bool:
+        return name in self._values
+
+    def dependents(self, *names: str) -> set[str]:
+        """All nodes computed from the given inputs or nodes, directly or not."""
+        found = set()
+        pending = list(names)
+        while pending:
+            for dependent in self._dependents.get(pending.pop(), ()):
+                if dependent not in found:
+                    found.add(dependent)
+                    pending.append(dependent)
+        return found
+
+    def invalidate(self, *names: str) -> set[str]:
+        """Drops the given nodes and everything computed from them; returns the nodes dropped."""
+        stale = self.dependents(*names)
+        stale.update(name for name in names if name in self._compute)
+        dropped = {name for name in stale if self._values.pop(name, _MISSING) is not _MISSING}
+        return dropped
+
+    def invalidate_all(self):
+        self._values.clear()
+        self._inputs.clear()
+
+    def sync(self, inputs: Mapping[str, Any]) -> set[str]:
+        """
+        Compares the inputs with the ones seen by the previous call and invalidates
+        only what depends on those that changed. An input that is missing now but
+        was present before counts as changed. Returns the nodes dropped.
+        """
+        previous = self._inputs
+        changed = [name for name, value in inputs.items() if previous.get(name, _MISSING) != value]
+        changed.extend(name for name in previous if name not in inputs)
+        self._inputs = dict(inputs)
+        return self.invalidate(*changed) if changed else set()
@@ -9,8 +9,8 @@ st.set_page_config(
 
 from data.localizator import init_localizator, select_local
 from data.compendium import init as init_compendium
-from data.saved_characters import init as init_saved_characters
-from config import ASSETS_DIRECTORY, SAVED_CHARS_DIRECTORY, LOCALS_DIRECTORY
+from data.saved_characters import init as init_saved_characters, SAVED_CHARS
+from config import ASSETS_DIRECTORY, SAVED_CHARS_DIRECTORY, LOCALS_DIRECTORY, COMPENDIUM_CACHE_DIRECTORY
 from pages import build_pages
 from pages.login import login_page
 
@@ -25,7 +25,7 @@ def main():
         return
 
     # --- MAIN APP START ---
-    init_compendium(ASSETS_DIRECTORY)
+    init_compendium(ASSETS_DIRECTORY, COMPENDIUM_CACHE_DIRECTORY)
     init_saved_characters(SAVED_CHARS_DIRECTORY)
     init_localizator(LOCALS_DIRECTORY)
 
@@ -36,6 +36,8 @@ def main():
         
         # Logout Button
         if st.button("Logout", icon=":material/logout:", use_container_width=True):
+            # Write any debounced autosave before the session goes away
+            SAVED_CHARS.flush(st.session_state.get("user_id"))
             st.session_state.clear()
             st.rerun()
         
@@ -3,6 +3,7 @@ from functools import partial
 from typing import Callable
 
 import streamlit as st
+from data.localizator import get_loc
 from . import error
 from .character_creation import character_creation
 from .character_view import character_view
@@ -14,7 +15,7 @@ PAGE_MODULES = (
 )
 
 def build_pages():
-    loc = st.session_state.localizator.get(st.session_state.language)
+    loc = get_loc()
     pages = []
 
     for page in PAGE_MODULES:
@@ -1,4 +1,5 @@
 import streamlit as st
+from data.localizator import get_loc
 
 from . import identity, classes, attributes, equipment, preview
 from .creation_state import CreationState
@@ -10,7 +11,7 @@ icon = ":material/add_circle:"
 
 
 def build():
-    loc = st.session_state.localizator.get(st.session_state.language)
+    loc = get_loc()
     st.session_state.creation_step = st.session_state.get("creation_step", CreationState.identity)
     st.session_state.creation_controller = st.session_state.get("creation_controller", CharacterController(loc))
 
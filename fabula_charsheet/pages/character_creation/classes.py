@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import streamlit as st
 
+from data.localizator import get_loc
 from data.models import LocNamespace
 from pages.character_creation.creation_state import CreationState
 from pages.utils import set_creation_state, add_new_class, remove_class
@@ -9,7 +10,7 @@ from pages.controller import CharacterController, ClassController
 
 
 def build(character_controller: CharacterController):
-    loc: LocNamespace = st.session_state.localizator.get(st.session_state.language)
+    loc: LocNamespace = get_loc()
     st.session_state.class_controller = ClassController()
     st.session_state.class_spells = st.session_state.get("class_spells", [])
     not_ready_for_the_next_step = not character_controller.has_enough_skills()
@@ -5,12 +5,13 @@ import streamlit as st
 from .creation_state import CreationState
 from pages.utils import set_creation_state, WeaponTableWriter, ArmorTableWriter, show_martial, ShieldTableWriter
 from pages.controller import CharacterController
+from data.localizator import get_loc
 from data.models import Inventory, LocNamespace
 from data import compendium as c
 
 
 def build(controller: CharacterController):
-    loc: LocNamespace = st.session_state.localizator.get(st.session_state.language)
+    loc: LocNamespace = get_loc()
     st.session_state.start_equipment = st.session_state.get("start_equipment", Inventory(zenit=500))
     st.session_state.additional_zenit = st.session_state.get(
         "additional_zenit",
@@ -4,12 +4,15 @@ import config
 from pages.utils import show_martial, add_new_class, avatar_uploader, edit_identity, edit_attributes, edit_class, \
     unequip_item, equip_item, add_bond, remove_bond, BondTableWriter
 from pages.controller import CharacterController, ClassController
+from data.localizator import get_loc
 from data.models import CharClass, LocNamespace
 from data import saved_characters as s
 
 
 def build(controller: CharacterController):
-    loc: LocNamespace = st.session_state.localizator.get(st.session_state.language)
+    loc: LocNamespace = get_loc()
+    # Actions of the previous run may have changed the character directly
+    controller.refresh_stats()
 
     @st.dialog(loc.page_class_add_dialog_title, width="large")
     @st.fragment
@@ -67,7 +70,7 @@ def build(controller: CharacterController):
             controller.dump_character()
             controller.dump_avatar(st.session_state.avatar)
             # UPDATED: Use update_character to ensure persistence
-            s.SAVED_CHARS.update_character(controller.character)
+            s.SAVED_CHARS.update_character(controller.character, immediate=True)
             st.toast(loc.page_save_character_toast, icon="🧙")
         if not controller.has_enough_skills():
             st.warning(
@@ -143,6 +146,7 @@ def build(controller: CharacterController):
             with c_col3:
                 if st.button(loc.remove_button, key=f"{char_class.name}-remove"):
                     controller.character.classes.remove(char_class)
+                    controller.mark_changed()
                     st.rerun()
             st.write(f"**{loc.page_view_skills}:**")
             added_skills = [skill for skill in char_class.skills if skill.current_level > 0]
@@ -1,4 +1,5 @@
 import streamlit as st
+from data.localizator import get_loc
 
 from . import loader, view
 from .view_state import ViewState
@@ -10,7 +11,7 @@ icon = ":material/file_open:"
 
 
 def build():
-    loc = st.session_state.localizator.get(st.session_state.language)
+    loc = get_loc()
     st.session_state.view_step = st.session_state.get("view_step", ViewState.load)
     st.session_state.char_controller = st.session_state.get("char_controller", CharacterController(loc))
 
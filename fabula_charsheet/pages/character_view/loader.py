@@ -1,26 +1,90 @@
+import tempfile
+
 import streamlit as st
 
 import config
+import party_pdf
+from data.localizator import get_loc
 from data import saved_characters as s
-from data.models import Character, LocNamespace
+from data.database import CharacterSummary
+from data.models import LocNamespace
 from pages.controller import CharacterController
 from pages.utils import set_view_state, get_avatar_path, delete_character
 from pages.character_view.view_state import ViewState
 
 
+def export_all_sheets(loc: LocNamespace):
+    """Renders the custom sheet of every saved character into one ZIP, with a progress bar."""
+    # The whole roster, not only the characters opened in this session
+    char_ids = s.SAVED_CHARS.roster_ids()
+    progress = st.progress(0.0, text=loc.page_load_character_export_progress.format(done=0, total=len(char_ids)))
+    failed = 0
+    with tempfile.TemporaryFile() as archive:
+        for step in party_pdf.export_party(char_ids, s.SAVED_CHARS.load_character, loc, archive):
+            progress.progress(
+                step.done / step.total,
+                text=loc.page_load_character_export_progress.format(done=step.done, total=step.total),
+            )
+            if step.error:
+                failed += 1
+        if failed:
+            st.warning(loc.page_load_character_export_failed.format(count=failed), icon="📜")
+        # Handed over as a file (download_button takes a BufferedReader, not the
+        # read-write temp file) instead of being read into bytes here first
+        with open(archive.fileno(), "rb", closefd=False) as data:
+            st.download_button(
+                loc.page_load_character_export_download,
+                data=data,
+                file_name="party_sheets.zip",
+                mime="application/zip",
+            )
+
+
 def build(controller: CharacterController):
-    loc: LocNamespace = st.session_state.localizator.get(st.session_state.language)
+    loc: LocNamespace = get_loc()
 
     @st.dialog(title=loc.page_delete_character_title)
-    def delete_character_dialog(character: Character, loc: LocNamespace):
+    def delete_character_dialog(character: CharacterSummary, loc: LocNamespace):
         delete_character(character, loc)
 
     st.set_page_config(layout="centered")
     st.title(loc.page_load_character_title)
 
-    if s.SAVED_CHARS.char_list:
+    sort_options = {
+        "updated_at": loc.page_load_character_sort_updated,
+        "name": loc.page_load_character_sort_name,
+        "level": loc.page_load_character_sort_level,
+    }
+    filter_col, sort_col, level_col = st.columns(3)
+    with filter_col:
+        name_contains = st.text_input(loc.page_load_character_filter_name)
+    with sort_col:
+        sort = st.selectbox(
+            loc.page_load_character_sort,
+            options=list(sort_options),
+            format_func=lambda key: sort_options[key],
+        )
+    with level_col:
+        min_level, max_level = st.slider(loc.page_load_character_filter_level, 1, 60, (1, 60))
+
+    # Cursors of the pages before the current one; reset whenever the query changes
+    query = dict(
+        sort=sort,
+        name_contains=name_contains or None,
+        # The full range also keeps characters saved before levels were recorded
+        min_level=min_level if min_level > 1 else None,
+        max_level=max_level if max_level < 60 else None,
+    )
+    if st.session_state.get("loader_query") != query:
+        st.session_state.loader_query = query
+        st.session_state.loader_cursors = [None]
+    cursors = st.session_state.loader_cursors
+    page = s.SAVED_CHARS.list_summaries(after=cursors[-1], **query)
+
+    # Summaries only: a character is hydrated when its load button is clicked
+    if page.items:
         # FIX: Use enumerate to guarantee unique keys even if IDs are duplicated
-        for idx, char in enumerate(s.SAVED_CHARS.char_list):
+        for idx, char in enumerate(page.items):
             col1, col2, col3 = st.columns(3)
             with col1:
                 avatar_path = get_avatar_path(char.id)
@@ -35,7 +99,11 @@ def build(controller: CharacterController):
                 with load_col:
                     # Append index to key to prevent DuplicateElementKey error
                     if st.button(loc.page_load_character_load_button, key=f"{char.id}-loader-{idx}"):
-                        controller.character = char
+                        character = s.SAVED_CHARS.load_character(char.id)
+                        if character is None:
+                            st.error(loc.page_load_character_failed, icon="📜")
+                            st.stop()
+                        controller.character = character
                         try:
                             controller.load_state()
                         except Exception as e:
@@ -47,5 +115,22 @@ def build(controller: CharacterController):
                         delete_character_dialog(char, loc)
 
             st.divider()
+
+        previous_col, next_col = st.columns(2)
+        with previous_col:
+            if st.button(loc.page_load_character_previous_page, disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with next_col:
+            if st.button(loc.page_load_character_next_page, disabled=page.next_cursor is None):
+                cursors.append(page.next_cursor)
+                st.rerun()
+
+        if st.button(loc.page_load_character_export_button):
+            export_all_sheets(loc)
+    elif len(cursors) > 1:
+        # The page emptied out (e.g. its characters were deleted): go back one
+        cursors.pop()
+        st.rerun()
     else:
         st.info(loc.page_load_character_no_saved, icon="👻")
@@ -11,7 +11,9 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'
 import streamlit as st
 import custom_pdf  # NEW IMPORT: Custom PDF Generator
 import config
+from data.localizator import get_loc, selected_language
 from data.saved_characters import SAVED_CHARS # NEW IMPORT: Persistence
+from data.sheet_cache import SHEET_CACHE, sheet_key
 
 from data.models import Status, AttributeName, Weapon, GripType, WeaponCategory, \
     WeaponRange, ClassName, LocNamespace, HeroicSkillName
@@ -49,15 +51,39 @@ CLASS_PROFICIENCIES = {
 
 def build(controller: CharacterController):
     st.set_page_config(layout="wide")
-    loc: LocNamespace = st.session_state.localizator.get(st.session_state.language)
+    loc: LocNamespace = get_loc()
+    # Actions of the previous run may have changed the character directly
+    controller.refresh_stats()
 
     # --- SAVE ON LOAD ---
-    # Automatically save character state to disk whenever this page loads
+    # Automatically save character state whenever this page loads.
+    # Unchanged characters (same controller revision) are skipped without being serialized;
+    # changes are written in the background.
     try:
-        SAVED_CHARS.update_character(controller.character)
+        SAVED_CHARS.update_character(controller.character, state=controller.state_dump(), revision=controller.revision)
     except Exception as e:
         print(f"Auto-save failed: {e}")
 
+    # Another tab or process saved this character after this session read it:
+    # this session's autosave of it is paused until the user picks a version
+    if SAVED_CHARS.has_conflict(controller.character.id):
+        st.warning(loc.page_view_save_conflict, icon="⚠️")
+        reload_col, overwrite_col = st.columns(2)
+        with reload_col:
+            if st.button(loc.page_view_save_conflict_reload):
+                character = SAVED_CHARS.reload_character(controller.character.id)
+                if character is not None:
+                    controller.character = character
+                    try:
+                        controller.load_state()
+                    except Exception as e:
+                        st.toast(e)
+                st.rerun()
+        with overwrite_col:
+            if st.button(loc.page_view_save_conflict_overwrite):
+                SAVED_CHARS.overwrite_character(controller.character)
+                st.rerun()
+
     @st.dialog(loc.page_view_avatar_update_dialog_title)
     def avatar_update_dialog(controller: CharacterController, loc: LocNamespace):
         avatar_update(controller, loc)
@@ -502,11 +528,13 @@ def build(controller: CharacterController):
                 st.write("")
                 if st.button("", icon=":material/add:", key="add_zenit"):
                     controller.character.inventory.zenit += zenit_input
+                    controller.mark_changed()
                     st.rerun()
             with c3:
                 st.write("")
                 if st.button("", icon=":material/remove:", key="subtract_zenit"):
                     controller.character.inventory.zenit -= zenit_input
+                    controller.mark_changed()
                     st.rerun()
 
         backpack = controller.character.inventory.backpack
@@ -582,8 +610,11 @@ def build(controller: CharacterController):
 
         if st.button("📄 Generate Custom PDF"):
             try:
-                # Call the new generator
-                pdf_file = custom_pdf.create_custom_sheet(controller.character, loc)
+                # Same character, language and generator: reuse the sheet generated before
+                key = sheet_key(controller.character.model_dump_json(), selected_language(), custom_pdf.SHEET_VERSION)
+                pdf_file = SHEET_CACHE.get_or_render(
+                    key, lambda: custom_pdf.create_custom_sheet(controller.character, loc).getvalue()
+                )
                 
                 st.download_button(
                     label="📥 Download Character Sheet",
@@ -604,9 +635,8 @@ def build(controller: CharacterController):
     with col1:
         if st.button(loc.save_current_character_button):
             controller.dump_character()
-            controller.dump_state()
-            # Explicit save to disk for persistence
-            SAVED_CHARS.update_character(controller.character)
+            # Explicit save to disk for persistence, character and state in one transaction
+            SAVED_CHARS.update_character(controller.character, immediate=True, state=controller.state_dump())
             st.toast("Character saved to disk!")
             
     with col2:
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import functools
 import math
 from pathlib import Path
 from typing import TYPE_CHECKING
@@ -30,17 +31,132 @@ from data.models import (
     Status,
     AttributeName,
 )
+from data import compendium as c
+from data.modifiers import ATTRIBUTES, active_sources
+from data.saved_characters import SAVED_CHARS
+from data.stat_graph import StatGraph
 
 if TYPE_CHECKING:
     from data.models import LocNamespace
 
 
+class _LegacyStateLoader(yaml.SafeLoader):
+    """Safe loader for old state files, where yaml.dump wrote enums as python/object/apply tags."""
+
+
+_LegacyStateLoader.add_multi_constructor(
+    "tag:yaml.org,2002:python/object/apply:",
+    lambda loader, suffix, node: loader.construct_sequence(node)[0],
+)
+
+
+def derived_stat(*depends_on: str):
+    """
+    Makes a method a node of the controller's stat graph: its value is cached
+    until one of the named inputs or nodes changes.
+    """
+    def decorate(method):
+        name = method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self):
+            return self._stats.get(name)
+        wrapper.compute = method
+        wrapper.depends_on = depends_on
+        return wrapper
+    return decorate
+
+
 class CharacterController:
     def __init__(self, loc: LocNamespace):
+        self._stats = self._build_stat_graph()
+        self._revision = 0
         self.character = Character()
         self.loc = loc
         self.state = CharState()
 
+    @property
+    def character(self) -> Character:
+        return self._character
+
+    @character.setter
+    def character(self, character: Character):
+        self._character = character
+        self.mark_changed()
+        self.invalidate_stats()
+
+    @property
+    def revision(self) -> int:
+        """Number of changes made to the character so far, see mark_changed."""
+        return self._revision
+
+    def mark_changed(self):
+        """
+        Records a change of the character. The mutators below call it; pages
+        that change the character directly must too, since the autosave skips
+        serializing a character whose revision did not move.
+        """
+        self._revision += 1
+
+    @property
+    def state(self) -> CharState:
+        return self._state
+
+    @state.setter
+    def state(self, state: CharState):
+        self._state = state
+        self.invalidate_stats()
+
+    def _build_stat_graph(self) -> StatGraph:
+        graph = StatGraph()
+        # Compiled from assets/modifiers/attributes.yaml
+        self._modifiers = c.COMPENDIUM.modifiers
+        for attribute in AttributeName:
+            graph.add_node(
+                f"{attribute}.current",
+                functools.partial(self._current_attribute, attribute),
+                [f"{attribute}.base", *self._modifiers.sources(attribute)],
+            )
+        for name, member in vars(type(self)).items():
+            if hasattr(member, "depends_on"):
+                graph.add_node(name, functools.partial(member.compute, self), member.depends_on)
+        return graph
+
+    def _stat_inputs(self) -> dict:
+        """Snapshot of everything the derived stats are computed from, for StatGraph.sync."""
+        character = self.character
+        equipped = character.inventory.equipped
+        inputs = {
+            "level": character.level,
+            "classes": [
+                (c.name, repr(c.class_bonus), c.bonus_value, [(s.name, s.current_level) for s in c.skills])
+                for c in character.classes
+            ],
+            "heroic_skills": [skill.name for skill in character.heroic_skills],
+            "equipment": [
+                (item.bonus_defense, item.bonus_magic_defense, item.bonus_initiative, getattr(item, "defense", None))
+                for item in (equipped.main_hand, equipped.off_hand, equipped.armor, equipped.accessory)
+                if item is not None
+            ],
+        }
+        for attribute in AttributeName:
+            inputs[f"{attribute}.base"] = getattr(character, attribute).base
+        for source in active_sources(self.state):
+            inputs[source] = True
+        return inputs
+
+    def invalidate_stats(self):
+        """Drops every cached derived stat."""
+        self._stats.invalidate_all()
+
+    def refresh_stats(self):
+        """
+        Recomputes, on their next read, only the derived stats whose inputs changed
+        since the last refresh. The mutators below call it; code that changes the
+        character or state directly must too (pages do at the start of every render).
+        """
+        self._stats.sync(self._stat_inputs())
+
     def get_character(self):
         return self.character
 
@@ -53,11 +169,15 @@ class CharacterController:
 
     def add_class(self, new_class: CharClass):
         self.character.classes.append(new_class)
+        self.mark_changed()
+        self.refresh_stats()
 
     def update_class(self, updated_class: CharClass):
         for i, existing in enumerate(self.character.classes):
             if existing.name == updated_class.name:
                 self.character.classes[i] = updated_class
+                self.mark_changed()
+                self.refresh_stats()
                 return
         msg = self.loc.error_class_not_found.format(class_name=updated_class.name)
         raise ValueError(msg)
@@ -99,11 +219,14 @@ class CharacterController:
         if spell not in self.character.spells.get(class_name, []):
             self.character.spells[class_name] = self.character.spells.get(class_name, [])
             self.character.spells[class_name].append(spell)
+            self.mark_changed()
 
     def remove_spell(self, spell: Spell, class_name: ClassName):
         if spell in self.character.spells.get(class_name, []):
             self.character.spells[class_name].remove(spell)
+            self.mark_changed()
 
+    @derived_stat("level", "might.base", "classes", "heroic_skills")
     def max_hp(self) -> int:
         base_hp = (
                 self.character.level
@@ -120,6 +243,7 @@ class CharacterController:
 
         return base_hp + bonus
 
+    @derived_stat("level", "willpower.base", "classes", "heroic_skills")
     def max_mp(self) -> int:
         base_mp = (
                 self.character.level
@@ -136,6 +260,7 @@ class CharacterController:
 
         return base_mp + bonus
 
+    @derived_stat("classes", "heroic_skills")
     def max_ip(self) -> int:
         base_ip =  (
                 6
@@ -156,6 +281,7 @@ class CharacterController:
     def current_ip(self) -> int:
         return self.max_ip() - self.state.minus_ip
 
+    @derived_stat("equipment", "dexterity.current", "classes", "therioform.placophora")
     def defense(self):
         item_bonus = 0
         for item in self.equipped_items():
@@ -170,12 +296,12 @@ class CharacterController:
             if isinstance(armor.defense, int):
                 armor_defense = armor.defense
             else:
-                armor_defense = self.character.dexterity.current
+                armor_defense = self._stats.get("dexterity.current")
             defense = (armor_defense
                         + item_bonus
                         + other_bonuses)
         else:
-            defense = (self.character.dexterity.current
+            defense = (self._stats.get("dexterity.current")
                         + item_bonus
                         + other_bonuses)
         if "placophora" in [t.name for t in self.state.active_therioforms]:
@@ -185,18 +311,26 @@ class CharacterController:
 
         return defense
 
+    @derived_stat("equipment", "insight.current")
     def magic_defense(self):
         bonus = 0
         for item in self.equipped_items():
             bonus += item.bonus_magic_defense
 
-        return self.character.insight.current + bonus
+        return self._stats.get("insight.current") + bonus
 
-    def initiative(self) -> str:
-        initiative = f"{self.loc.dice_prefix}{self.character.insight.current} + {self.loc.dice_prefix}{self.character.dexterity.current}"
+    @derived_stat("equipment", "insight.current", "dexterity.current")
+    def initiative_dice(self) -> tuple[int, int, int]:
+        """Insight die, dexterity die and equipment bonus of the initiative roll."""
         bonus = 0
         for item in self.equipped_items():
             bonus += item.bonus_initiative
+        return self._stats.get("insight.current"), self._stats.get("dexterity.current"), bonus
+
+    def initiative(self) -> str:
+        # Formatted on every read: self.loc changes with the selected language
+        insight, dexterity, bonus = self.initiative_dice()
+        initiative = f"{self.loc.dice_prefix}{insight} + {self.loc.dice_prefix}{dexterity}"
 
         if bonus and bonus < 0:
             return f"{initiative} {bonus}"
@@ -265,34 +399,29 @@ class CharacterController:
 
         else:
             raise Exception(self.loc.error_equipping_item)
+        self.mark_changed()
+        self.refresh_stats()
 
     def unequip_item(self, category: str):
         equipped = self.character.inventory.equipped
         if hasattr(equipped, category):
             setattr(equipped, category, None)
+            self.mark_changed()
+            self.refresh_stats()
 
     def equipped_items(self) -> list[Item]:
-        equipped = self.character.inventory.equipped
-        return [
-            item
-            for item in (equipped.main_hand, equipped.off_hand, equipped.armor, equipped.accessory)
-            if item is not None
-        ]
+        return self.character.inventory.equipped.items()
 
     def add_item(self, item: Item):
         self.character.inventory.backpack.add_item(item)
+        self.mark_changed()
 
     def remove_item(self, item: Item):
-        if item in self.equipped_items():
-            if isinstance(item, Weapon):
-                self.unequip_item("weapon")
-            elif isinstance(item, Armor):
-                self.unequip_item("armor")
-            elif isinstance(item, Shield):
-                self.unequip_item("shield")
-            elif isinstance(item, Accessory):
-                self.unequip_item("accessory")
+        slot = self.character.inventory.equipped.slot_of(item)
+        if slot is not None:
+            self.unequip_item(slot)
         self.character.inventory.backpack.remove_item(item)
+        self.mark_changed()
 
     def dump_character(self):
         with Path(
@@ -315,52 +444,22 @@ class CharacterController:
             )
             image_file_path.write_bytes(image.getbuffer())
 
-    def apply_status(self):
-        dex_modifier = 0
-        mig_modifier = 0
-        ins_modifier = 0
-        wlp_modifier = 0
-
-        if Status.dazed in self.state.statuses:
-            ins_modifier -= 2
-        if Status.enraged in self.state.statuses:
-            ins_modifier -= 2
-            dex_modifier -= 2
-        if Status.poisoned in self.state.statuses:
-            mig_modifier -= 2
-            wlp_modifier -= 2
-        if Status.shaken in self.state.statuses:
-            wlp_modifier -= 2
-        if Status.slow in self.state.statuses:
-            dex_modifier -= 2
-        if Status.weak in self.state.statuses:
-            mig_modifier -= 2
-
-        for attribute in self.state.improved_attributes:
-            match attribute:
-                case AttributeName.dexterity:
-                    dex_modifier += 2
-                case AttributeName.might:
-                    mig_modifier += 2
-                case AttributeName.insight:
-                    ins_modifier += 2
-                case AttributeName.willpower:
-                    wlp_modifier += 2
-
-        for t in self.state.active_therioforms:
-            match t.name:
-                case "arpaktida":
-                    ins_modifier += 2
-                case "dynamotheria":
-                    mig_modifier += 2
-                case "tachytheria":
-                    dex_modifier += 2
-
-        self.character.insight.current = min(MAX_ATTRIBUTE_VALUE, max(MIN_ATTRIBUTE_VALUE, self.character.insight.base + ins_modifier))
-        self.character.dexterity.current = min(MAX_ATTRIBUTE_VALUE, max(MIN_ATTRIBUTE_VALUE, self.character.dexterity.base + dex_modifier))
-        self.character.willpower.current = min(MAX_ATTRIBUTE_VALUE, max(MIN_ATTRIBUTE_VALUE, self.character.willpower.base + wlp_modifier))
-        self.character.might.current = min(MAX_ATTRIBUTE_VALUE, max(MIN_ATTRIBUTE_VALUE, self.character.might.base + mig_modifier))
+    def _current_attribute(self, attribute: AttributeName) -> int:
+        bases = [getattr(self.character, name).base for name in ATTRIBUTES]
+        current = self._modifiers.apply(bases, active_sources(self.state), MIN_ATTRIBUTE_VALUE, MAX_ATTRIBUTE_VALUE)
+        return current[ATTRIBUTES.index(attribute)]
 
+    def apply_status(self):
+        """Writes the current attribute values; only attributes whose sources changed are recomputed."""
+        self.refresh_stats()
+        for attribute in AttributeName:
+            value = self._stats.get(f"{attribute}.current")
+            character_attribute = getattr(self.character, attribute)
+            if character_attribute.current != value:
+                character_attribute.current = value
+                self.mark_changed()
+
+    @derived_stat("max_hp")
     def crisis_value(self) -> int:
         return math.floor(self.max_hp() / 2)
 
@@ -395,10 +494,12 @@ class CharacterController:
     def add_status(self, status: Status):
         if status not in self.state.statuses:
             self.state.statuses.append(status)
+            self.refresh_stats()
 
     def remove_status(self, status: Status):
         if status in self.state.statuses:
             self.state.statuses.remove(status)
+            self.refresh_stats()
 
     def use_health_potion(self):
         self.state.minus_hp = max(0, self.state.minus_hp - 50)
@@ -436,25 +537,38 @@ class CharacterController:
         )
         return self.current_ip() >= ip_cost
 
-    def dump_state(self):
-        with Path(SAVED_STATES_DIRECTORY, f"{self.character.id}.yaml").open("w", encoding="utf-8") as yaml_file:
-            yaml.dump(
-                self.state.model_dump(),
-                yaml_file,
-                sort_keys=False,
-                allow_unicode=True,
-                default_flow_style=False
-            )
+    def state_dump(self) -> dict:
+        return self.state.model_dump(mode="json")
+
+    def dump_state(self) -> bool:
+        """Saves the state to the database; only HP/MP/IP are written if nothing else changed."""
+        return SAVED_CHARS.save_state(self.character.id, self.state_dump())
 
     def load_state(self):
         try:
-            with Path(SAVED_STATES_DIRECTORY, f"{self.character.id}.yaml").open('r', encoding="utf-8") as yaml_file:
-                raw_state = yaml.load(yaml_file, Loader=yaml.Loader)
+            raw_state = SAVED_CHARS.load_state(self.character.id)
+            if raw_state is None:
+                raw_state = self._load_legacy_state()
+                if raw_state is None:
+                    self.state = CharState()
+                    return
                 self.state = CharState(**dict(raw_state))
-        except:
+                # Move it into the database; the YAML file is no longer read afterwards
+                self.dump_state()
+                return
+            self.state = CharState(**raw_state)
+        except Exception:
             self.state = CharState()
             raise Exception("Unable to load state. Switching to default.")
 
+    def _load_legacy_state(self) -> dict | None:
+        """Reads a state saved by older versions under characters/states/<id>.yaml."""
+        state_path = Path(SAVED_STATES_DIRECTORY, f"{self.character.id}.yaml")
+        if not state_path.exists():
+            return None
+        with state_path.open('r', encoding="utf-8") as yaml_file:
+            return yaml.load(yaml_file, Loader=_LegacyStateLoader)
+
 
 class ClassController:
     def __init__(self):
@@ -1,11 +1,14 @@
 import streamlit as st
 import os
 import tarfile
-import shutil
+import tempfile
 import time
 from io import BytesIO
 from datetime import datetime
 
+from data.database import DB, DB_PATH
+from data.saved_characters import SAVED_CHARS
+
 # Define what folders/files to backup
 BACKUP_SOURCES = [
     "fabula_charsheet/data",
@@ -14,6 +17,46 @@ BACKUP_SOURCES = [
     "config.py"
 ]
 
+# Name of the database copy inside a snapshot; the live database files are never archived
+DB_SNAPSHOT_NAME = "society.db"
+# Where snapshots made before DB_SNAPSHOT_NAME kept the raw database file
+LEGACY_DB_MEMBER = "fabula_charsheet/data/society.db"
+DB_FILES = {os.path.abspath(f"{DB_PATH}{suffix}") for suffix in ("", "-wal", "-shm", "-journal")}
+
+
+def _skip_db_files(info: tarfile.TarInfo) -> tarfile.TarInfo | None:
+    return None if os.path.abspath(info.name) in DB_FILES else info
+
+
+def create_snapshot(buffer) -> None:
+    """Writes the snapshot archive: BACKUP_SOURCES plus an online backup of the database."""
+    # Debounced autosaves belong in the snapshot
+    SAVED_CHARS.flush()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_copy = os.path.join(tmp_dir, DB_SNAPSHOT_NAME)
+        DB.backup(db_copy)
+        with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+            for source in BACKUP_SOURCES:
+                if os.path.exists(source):
+                    tar.add(source, filter=_skip_db_files)
+            tar.add(db_copy, arcname=DB_SNAPSHOT_NAME)
+
+
+def restore_snapshot(archive_path: str) -> None:
+    """Extracts a snapshot over the app files and restores its database through DatabaseManager.restore."""
+    SAVED_CHARS.flush()
+    with tarfile.open(archive_path, "r:gz") as tar, tempfile.TemporaryDirectory() as tmp_dir:
+        names = tar.getnames()
+        db_member = next((name for name in (DB_SNAPSHOT_NAME, LEGACY_DB_MEMBER) if name in names), None)
+        files = [
+            member for member in tar.getmembers()
+            if member.name != db_member and _skip_db_files(member) is not None
+        ]
+        tar.extractall(path=".", members=files)
+        if db_member is not None:
+            tar.extract(db_member, path=tmp_dir)
+            DB.restore(os.path.join(tmp_dir, db_member))
+
 def render_admin_panel():
     """Renders the Admin Portal sidebar widget."""
     # Strict Access Control
@@ -32,11 +75,7 @@ def render_admin_panel():
             filename = f"abyssalEngine_FileSysDB_Backup_V{timestamp}.tgz"
             
             try:
-                with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
-                    for source in BACKUP_SOURCES:
-                        if os.path.exists(source):
-                            tar.add(source)
-                
+                create_snapshot(buffer)
                 buffer.seek(0)
                 st.download_button(
                     label="⬇️ Download Snapshot",
@@ -62,10 +101,10 @@ def render_admin_panel():
                     with open("restore_temp.tgz", "wb") as f:
                         f.write(uploaded_file.getbuffer())
                     
-                    with tarfile.open("restore_temp.tgz", "r:gz") as tar:
-                        tar.extractall(path=".")
-                    
-                    os.remove("restore_temp.tgz")
+                    try:
+                        restore_snapshot("restore_temp.tgz")
+                    finally:
+                        os.remove("restore_temp.tgz")
                     st.success("Restored. Rebooting...")
                     time.sleep(2)
                     st.rerun()
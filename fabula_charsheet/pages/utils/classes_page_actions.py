@@ -107,6 +107,7 @@ def remove_class(character_controller: CharacterController, loc: LocNamespace):
         with c2:
             if st.button(loc.page_class_remove_button, key=f"{char_class.name}-remove"):
                 character_controller.character.classes.remove(char_class)
+                character_controller.mark_changed()
                 st.rerun()
 
 
@@ -6,6 +6,7 @@ from itertools import chain
 import streamlit as st
 
 import config
+from data.localizator import get_loc
 from data.models import (
     Skill,
     Weapon,
@@ -42,7 +43,7 @@ def if_show_spells(casting_skill: Skill):
 
 
 def list_skills(class_controller: ClassController, can_add_skill_number: int):
-    loc: LocNamespace = st.session_state.localizator.get(st.session_state.language)
+    loc: LocNamespace = get_loc()
     with st.container(border=True):
         st.subheader(loc.msg_skills_points_remaining.format(count=can_add_skill_number))
         st.write(loc.msg_skills_selected)
@@ -52,12 +53,12 @@ def list_skills(class_controller: ClassController, can_add_skill_number: int):
 
 
 def show_skill(skill: Skill):
-    loc: LocNamespace = st.session_state.localizator.get(st.session_state.language)
+    loc: LocNamespace = get_loc()
     st.markdown(f"**{skill.localized_name(loc)}** - level {skill.current_level}")
 
 
 def show_martial(input_: CharClass | Character):
-    loc: LocNamespace = st.session_state.localizator.get(st.session_state.language)
+    loc: LocNamespace = get_loc()
     martial_keys = [
         "melee",
         "ranged",
@@ -82,7 +83,7 @@ def show_martial(input_: CharClass | Character):
 
 
 def add_item_as(item: Item):
-    loc: LocNamespace = st.session_state.localizator.get(st.session_state.language)
+    loc: LocNamespace = get_loc()
     new_name = st.text_input(loc.page_equipment_write_new_name)
     button_label = loc.page_equipment_add_item_as_button.format(name=new_name)
 
@@ -151,6 +152,7 @@ def add_bond(controller: CharacterController, loc: LocNamespace):
             **input_dict
         )
         controller.character.bonds.append(new_bond)
+        controller.mark_changed()
         st.rerun()
 
 def remove_bond(controller: CharacterController, loc: LocNamespace):
@@ -162,6 +164,7 @@ def remove_bond(controller: CharacterController, loc: LocNamespace):
         with c2:
             if st.button(loc.remove_button, key=f"{bond.name}-remove"):
                 controller.character.bonds.remove(bond)
+                controller.mark_changed()
                 st.rerun()
 
 
@@ -190,11 +193,12 @@ def upgrade_item(controller: CharacterController, item: Item, loc: LocNamespace)
             disabled=not selected_quality,
     ):
         for category in ("main_hand", "off_hand", "armor", "accessory"):
-            if item == getattr(controller.character.inventory.equipped, category):
+            if item.same_item(getattr(controller.character.inventory.equipped, category)):
                 controller.unequip_item(category)
         item.quality = selected_quality.name
         item.quality_detail = detail
         apply_quality_effects(item, selected_quality)
+        controller.mark_changed()
         st.rerun()
 
 
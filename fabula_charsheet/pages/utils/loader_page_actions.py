@@ -4,11 +4,12 @@ import streamlit as st
 
 import config
 from data import saved_characters as s
-from data.models import Character, LocNamespace
+from data.database import CharacterSummary
+from data.models import LocNamespace
 from .common import get_avatar_path
 
 
-def delete_character(character: Character, loc: LocNamespace):
+def delete_character(character: CharacterSummary, loc: LocNamespace):
     st.warning(loc.page_delete_character_warning, icon="❓")
     c1, c2 = st.columns([0.2, 0.8])
     with c1:
@@ -19,7 +20,7 @@ def delete_character(character: Character, loc: LocNamespace):
                     loc.page_delete_character_yes_button.format(name=character.name.title()),
                     icon="💀"
                 ):
-            s.SAVED_CHARS.char_list.remove(character)
+            s.SAVED_CHARS.delete_character(character.id)
             char_path = Path(config.SAVED_CHARS_DIRECTORY, f"{character.name}.{character.id}.character.yaml")
             try:
                 char_path.unlink()
@@ -68,6 +68,7 @@ def edit_identity(controller: CharacterController, loc: LocNamespace):
             controller.character.set_identity(identity, loc)
             controller.character.set_origin(origin, loc)
             controller.character.set_theme(theme, loc)
+            controller.mark_changed()
             st.rerun()
         except Exception as e:
             st.warning(e, icon="🤌")
@@ -103,6 +104,7 @@ def edit_attributes(controller: CharacterController, loc: LocNamespace):
             controller.character.might = Might(base=might, current=might)
             controller.character.insight = Insight(base=insight, current=insight)
             controller.character.willpower = Willpower(base=willpower, current=willpower)
+            controller.mark_changed()
             st.rerun()
         except Exception as e:
             st.error(e, icon="🚨")
@@ -71,10 +71,7 @@ class TableWriter:
         ):
             with cell:
                 key = f"column_{column_name}"
-                try:
-                    localized_value = getattr(self.loc, key)
-                except AttributeError:
-                    localized_value = column_name.capitalize()
+                localized_value = getattr(self.loc, key, column_name.capitalize())
                 st.markdown(f"##### {localized_value}")
 
     def _add_description(self, item, idx=None):
@@ -11,7 +11,6 @@ from .table_writer import SkillTableWriter, HeroicSkillTableWriter, SpellTableWr
     DanceTableWriter, ArcanumTableWriter, InventionTableWriter
 from .classes_page_actions import add_new_class
 from data import compendium as c
-from data.compendium import COMPENDIUM  # Explicit import for the item library
 
 def avatar_update(controller: CharacterController, loc: LocNamespace):
     uploaded_avatar = st.file_uploader(
@@ -79,6 +78,7 @@ def level_up(controller: CharacterController, loc: LocNamespace):
             controller.add_class(class_controller.char_class)
         if selected_skill.can_add_spell:
             controller.character.spells[selected_class_name] = st.session_state.class_spells
+        controller.mark_changed()
         st.rerun()
 
 
@@ -108,6 +108,7 @@ def add_spell(controller: CharacterController, class_name: ClassName, loc: LocNa
         spell = selected_spells[0]
         controller.character.spells[class_name] = controller.character.spells.get(class_name, [])
         controller.character.spells[class_name].append(spell)
+        controller.mark_changed()
         st.rerun()
 
 
@@ -206,22 +207,8 @@ def add_item(controller: CharacterController, loc: LocNamespace):
 
         st.divider()
 
-        # --- Filtering Logic (FIXED) ---
-        # We use 'c.COMPENDIUM' to get the live object, resolving the NoneType error
-        raw_items = []
-        
-        # Try to use the optimized getter if it exists
-        if hasattr(c.COMPENDIUM, "get_all_items"):
-            raw_items = c.COMPENDIUM.get_all_items()
-        else:
-            # Fallback: Manually gather from lists using c.COMPENDIUM
-            # This check ensures we don't crash if lists aren't ready
-            if c.COMPENDIUM is not None:
-                for w in c.COMPENDIUM.weapons: raw_items.append(("weapon", w))
-                for a in c.COMPENDIUM.armors: raw_items.append(("armor", a))
-                for s in c.COMPENDIUM.shields: raw_items.append(("shield", s))
-                for acc in c.COMPENDIUM.accessories: raw_items.append(("accessory", acc))
-                for i in c.COMPENDIUM.items: raw_items.append(("item", i))
+        # --- Filtering Logic ---
+        raw_items = c.COMPENDIUM.get_all_items()
 
         filtered_items = []
         search_lower = st.session_state.item_search_term.lower()
@@ -265,7 +252,8 @@ def add_item(controller: CharacterController, loc: LocNamespace):
                     
                     with c2:
                         if st.button("Add", key=f"add_lib_{item_type}_{item_obj.name}", width="stretch"):
-                            controller.add_item(item_obj) 
+                            # The compendium is shared by every session: hand out a copy
+                            controller.add_item(item_obj.model_copy(deep=True))
                             st.toast(f"Added {display_name} to inventory!", icon="🎒")
 
     # --- MODE: CREATE ---
@@ -501,6 +489,7 @@ def add_heroic_skill(controller: CharacterController, loc: LocNamespace):
                     controller.character.spells[selected_class_name] = controller.character.spells.get(
                         selected_class_name, [])
                     controller.character.spells[selected_class_name].append(spell)
+                controller.mark_changed()
                 st.rerun()
 
     else:
@@ -510,6 +499,7 @@ def add_heroic_skill(controller: CharacterController, loc: LocNamespace):
             selected_heroic_skill = st.session_state.selected_hero_skills[0]
             controller.character.heroic_skills.append(selected_heroic_skill)
             apply_heroic_skill_effect(controller, selected_heroic_skill)
+            controller.mark_changed()
             st.rerun()
 
 
@@ -568,6 +558,7 @@ def increase_attribute(controller: CharacterController, loc: LocNamespace):
                             key=attribute.name,
                     ):
                         attribute.base += 2
+                        controller.mark_changed()
                         st.rerun()
 
 
@@ -595,6 +586,7 @@ def add_therioform(controller: CharacterController, loc: LocNamespace):
     if st.button(loc.add_therioform_button, key="add-new-therioform", disabled=(len(selected_therioform) != 1)):
         therioform = selected_therioform[0]
         controller.character.special.therioforms.append(therioform)
+        controller.mark_changed()
         st.rerun()
 
 
@@ -622,6 +614,7 @@ def add_dance(controller: CharacterController, loc: LocNamespace):
     if st.button(loc.add_spell_button, disabled=(len(selected_dance) != 1)):
         dance = selected_dance[0]
         controller.character.special.dances.append(dance)
+        controller.mark_changed()
         st.rerun()
 
 def add_invention(controller: CharacterController, loc: LocNamespace):
@@ -648,6 +641,7 @@ def add_invention(controller: CharacterController, loc: LocNamespace):
     if st.button(loc.add_invention_button, disabled=(len(selected_invention) != 1), key="add_invention"):
         invention = selected_invention[0]
         controller.character.special.inventions.append(invention)
+        controller.mark_changed()
         st.rerun()
 
 
@@ -820,4 +814,5 @@ def add_arcanum(controller: CharacterController, loc: LocNamespace):
                  disabled=(len(selected_arcanum) != 1)):
         arcanum = selected_arcanum[0]
         controller.character.special.arcana.append(arcanum)
+        controller.mark_changed()
         st.rerun()
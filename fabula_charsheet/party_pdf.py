@@ -0,0 +1,166 @@
+"""
+Exports the custom sheets of many characters at once into one ZIP archive.
+
+Sheets are rendered by custom_pdf.create_custom_sheet in worker processes and
+written to the archive as each one finishes, so only the few sheets in flight
+are held in memory. export_party() is a generator yielding an ExportProgress
+per character, for progress bars.
+
+The worker processes are shared by every export of the process and started
+on demand, at most one per CPU; they run sheet_worker as their main module
+rather than the Streamlit script.
+"""
+import contextlib
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Callable, Iterable, Iterator, NamedTuple
+
+import sheet_worker
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sheets submitted ahead of the archive writer, per worker
+IN_FLIGHT_PER_WORKER = 2
+POOL_SIZE = os.cpu_count() or 1
+
+
+class ExportProgress(NamedTuple):
+    done: int
+    total: int
+    char_id: str
+    # Name of the sheet inside the archive; None if the character failed
+    file_name: str | None
+    error: str | None = None
+
+
+# The worker pool of this process, created by the first export
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _shared_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Streamlit runs sessions on threads; forking a threaded process is unsafe
+            _pool = ProcessPoolExecutor(POOL_SIZE, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Drops a pool whose workers died; the next export starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@contextlib.contextmanager
+def _worker_main():
+    """
+    Makes sheet_worker the main module while workers are spawned, which the
+    pool does on submit: a spawned process re-imports the main module of its
+    parent, here the Streamlit script with the whole app behind it.
+    """
+    with _pool_lock:
+        main = sys.modules.get("__main__")
+        sys.modules["__main__"] = sheet_worker
+        try:
+            yield
+        finally:
+            if main is not None:
+                sys.modules["__main__"] = main
+
+
+def _archive_name(character_name: str, used: set[str]) -> str:
+    base = f"{character_name or 'character'}_CustomSheet"
+    file_name = f"{base}.pdf"
+    counter = 2
+    while file_name in used:
+        file_name = f"{base}_{counter}.pdf"
+        counter += 1
+    used.add(file_name)
+    return file_name
+
+
+def export_party(
+    char_ids: Iterable[str],
+    load: Callable[[str], object],
+    loc,
+    target: BinaryIO,
+    max_workers: int | None = None,
+) -> Iterator[ExportProgress]:
+    """
+    Renders the sheet of every character into a ZIP written to target.
+
+    load returns the Character of an id (None if it cannot be loaded). The
+    archive is complete once the generator is exhausted; characters that fail
+    to load or render are reported through ExportProgress.error and left out.
+    max_workers caps the workers this export keeps busy.
+    """
+    char_ids = list(char_ids)
+    total = len(char_ids)
+    # No more workers busy than there are sheets to render
+    workers = max(1, min(total, max_workers or POOL_SIZE, POOL_SIZE))
+    queue = iter(char_ids)
+    pending: dict[Future, tuple[str, str]] = {}
+    used_names: set[str] = set()
+    done = 0
+    pool = _shared_pool()
+
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+
+        def submit_next() -> Iterator[ExportProgress]:
+            """Submits the next loadable character, reporting those that cannot be loaded."""
+            nonlocal done
+            for char_id in queue:
+                try:
+                    character = load(char_id)
+                except Exception as e:
+                    logger.error(f"Failed to load character {char_id} for export: {e}")
+                    character = None
+                if character is None:
+                    done += 1
+                    yield ExportProgress(done, total, char_id, None, "not found")
+                    continue
+                try:
+                    with _worker_main():
+                        future = pool.submit(sheet_worker.render, character, loc)
+                except BrokenProcessPool as e:
+                    _discard_pool(pool)
+                    logger.error(f"Failed to export character {char_id}: {e}")
+                    done += 1
+                    yield ExportProgress(done, total, char_id, None, str(e))
+                    continue
+                pending[future] = (char_id, character.name)
+                return
+
+        for _ in range(workers * IN_FLIGHT_PER_WORKER):
+            yield from submit_next()
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                char_id, character_name = pending.pop(future)
+                done += 1
+                try:
+                    sheet = future.result()
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool):
+                        _discard_pool(pool)
+                    logger.error(f"Failed to export character {char_id}: {e}")
+                    yield ExportProgress(done, total, char_id, None, str(e))
+                else:
+                    file_name = _archive_name(character_name, used_names)
+                    archive.writestr(file_name, sheet)
+                    yield ExportProgress(done, total, char_id, file_name)
+                yield from submit_next()
@@ -1,170 +1,232 @@
+"""
+Fills the official form sheet (template_sheet.pdf) from a flat dict of values.
+
+Nothing in the app calls it yet: the sheet export goes through custom_pdf,
+which does not depend on the form fields of a template. It is kept for a
+form-filled export and covered by tests/test_pdf_export.py.
+"""
 import io
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, NamedTuple
+
 from pypdf import PdfReader, PdfWriter
 from pypdf.generic import NameObject
 
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _text(key, default=""):
+    return lambda data: str(data.get(key, default))
+
+
+def _die(key):
+    return lambda data: f"d{data.get(key, 6)}"
+
+
+def _crisis(data):
+    return str(int(int(data.get("hp_max", 0)) / 2))
+
+
+def _entry(list_key, index, key):
+    """Value of key in the index-th entry of a list in data; None (field left alone) past its end."""
+    def value(data):
+        entries = data.get(list_key, [])
+        if index >= len(entries):
+            return None
+        return entries[index].get(key, "")
+    return value
+
+
+def _checkbox(key):
+    return lambda data: NameObject("/Yes") if data.get(key, False) else None
+
+
+MAX_CLASSES = 7
+MAX_SPELLS = 20
+
+# Field names used by the Italian and English sheets -> value written to them.
+# Only the names a template actually has end up in its FillPlan.
+FIELD_VALUES = [
+    # Identity
+    (("Nome", "Name", "CharacterName", "Character Name"), _text("name")),
+    (("Identita", "Identity"), _text("identity")),
+    (("Tema", "Theme"), _text("theme")),
+    (("Origine", "Origin"), _text("origin")),
+    (("Livello", "Level"), _text("level", "1")),
+    (("Zenit",), _text("zenit", "0")),
+    (("PuntiFabula", "FabulaPoints"), _text("fabula_points", "0")),
+    (("PuntiEsperienza", "ExperiencePoints"), _text("exp", "0")),
+
+    # Attributes
+    (("DestrezzaBase", "DexterityBase"), _die("dex")),
+    (("IntuitoBase", "InsightBase"), _die("ins")),
+    (("VigoreBase", "MightBase"), _die("mig")),
+    (("VolontaBase", "WillpowerBase"), _die("wil")),
+
+    # Status
+    (("PVmax", "HPmax"), _text("hp_max", 0)),
+    (("PVattuali", "HPcurrent"), _text("hp_current", 0)),
+    (("PVcrisi", "HPcrisis"), _crisis),
+    (("PMmax", "MPmax"), _text("mp_max", 0)),
+    (("PMattuali", "MPcurrent"), _text("mp_current", 0)),
+    (("PImax", "IPmax"), _text("ip_max", 6)),
+    (("PIattuali", "IPcurrent"), _text("ip_current", 6)),
+    (("ModIniziativa", "InitiativeMod"), _text("init", 0)),
+    (("Difesa", "Defense"), _text("def", 0)),
+    (("DifesaMagica", "MagicDefense"), _text("mdef", 0)),
+
+    # Equipment
+    (("Mano1Equip", "MainHand"), _text("main_hand")),
+    (("Mano2Equip", "OffHand"), _text("off_hand")),
+    (("ArmaturaEquip", "Armor"), _text("armor")),
+
+    # Proficiency checkboxes
+    (("MartialArmor", "Martial Armor", "Martial_Armor", "ArmorProficiency"), _checkbox("prof_armor")),
+    (("MartialShields", "Martial Shields", "Martial_Shields", "ShieldProficiency"), _checkbox("prof_shield")),
+    (("MartialMelee", "Martial Melee", "Martial_Melee", "Martial Melee Weapons", "MeleeProficiency"),
+     _checkbox("prof_melee")),
+    (("MartialRanged", "Martial Ranged", "Martial_Ranged", "Martial Ranged Weapons", "RangedProficiency"),
+     _checkbox("prof_ranged")),
+]
+
+# Classes & Skills
+for _i in range(MAX_CLASSES):
+    FIELD_VALUES.extend([
+        ((f"Classe{_i + 1}", f"Class{_i + 1}"), _entry("classes_info", _i, "name")),
+        ((f"Info{_i + 1}", f"SkillInfo{_i + 1}"), _entry("classes_info", _i, "skills")),
+    ])
+
+# Spells
+for _i in range(MAX_SPELLS):
+    FIELD_VALUES.extend([
+        ((f"ArcanaNome{_i + 1}", f"SpellName{_i + 1}"), _entry("spells", _i, "name")),
+        ((f"ArcanaPM{_i + 1}", f"SpellMP{_i + 1}"), _entry("spells", _i, "mp")),
+        ((f"ArcanaBersagli{_i + 1}", f"SpellTarget{_i + 1}"), _entry("spells", _i, "target")),
+        ((f"ArcanaDurata{_i + 1}", f"SpellDuration{_i + 1}"), _entry("spells", _i, "duration")),
+        ((f"ArcanaNote{_i + 1}", f"SpellEffect{_i + 1}"), _entry("spells", _i, "effect")),
+    ])
+
+
+class FillPlan(NamedTuple):
+    # Page index -> (field name, value function) of the fields whose widgets are on that page
+    pages: dict[int, list[tuple[str, Callable[[dict], object]]]]
+
+    def values(self, page_index: int, data: dict) -> dict:
+        values = {}
+        for name, value in self.pages[page_index]:
+            field_value = value(data)
+            if field_value is not None:
+                values[name] = field_value
+        return values
+
+
+def _widget_names(page) -> set[str]:
+    """Names of the form fields that have a widget on the page."""
+    names = set()
+    for annotation in page.get("/Annots") or []:
+        widget = annotation.get_object()
+        if widget.get("/Subtype") != "/Widget":
+            continue
+        field = widget if "/T" in widget else widget.get("/Parent")
+        if field is not None:
+            field = field.get_object()
+            if "/T" in field:
+                names.add(str(field["/T"]))
+    return names
+
+
+def build_fill_plan(reader: PdfReader, fields: dict) -> FillPlan:
+    """Keeps the FIELD_VALUES aliases the template has and groups them by the page their widgets are on."""
+    # Widgets carry the last part of a qualified field name
+    names = {name.rsplit(".", 1)[-1] for name in fields}
+    field_values = {}
+    for aliases, value in FIELD_VALUES:
+        for alias in aliases:
+            if alias in names:
+                field_values[alias] = value
+
+    pages = {}
+    for page_index, page in enumerate(reader.pages):
+        on_page = _widget_names(page)
+        entries = [(name, value) for name, value in field_values.items() if name in on_page]
+        if entries:
+            pages[page_index] = entries
+    return FillPlan(pages)
+
+
+class PdfTemplate(NamedTuple):
+    reader: PdfReader
+    # Form fields of the template by name, as returned by PdfReader.get_fields()
+    fields: dict
+    plan: FillPlan
+    # PdfReader resolves objects lazily and is not safe to clone from two threads at once
+    lock: threading.Lock
+
+
+# Resolved template path -> (file fingerprint, parsed template)
+_templates: dict[str, tuple[tuple, PdfTemplate]] = {}
+_templates_lock = threading.Lock()
+
+
+def _file_fingerprint(path: Path) -> tuple:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_template(template_path) -> PdfTemplate:
+    """
+    Parses a form template once per process; it is parsed again only when the
+    file changes on disk.
+    """
+    path = Path(template_path).resolve()
+    key = str(path)
+    fingerprint = _file_fingerprint(path)
+    cached = _templates.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    with _templates_lock:
+        cached = _templates.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        reader = PdfReader(path)
+        try:
+            fields = reader.get_fields() or {}
+        except Exception as e:
+            logger.error(f"Failed to read the form fields of {path}: {e}")
+            fields = {}
+        # The internal field names, for adjusting FIELD_VALUES
+        logger.debug(f"PDF template {path.name} fields: {sorted(fields)}")
+        template = PdfTemplate(reader, fields, build_fill_plan(reader, fields), threading.Lock())
+        _templates[key] = (fingerprint, template)
+        return template
+
+
+def new_writer(template: PdfTemplate) -> PdfWriter:
+    """A writer holding its own copy of the template pages and /AcroForm."""
+    with template.lock:
+        return PdfWriter(clone_from=template.reader)
+
+
 def generate_character_pdf(template_path, data):
     if not isinstance(data, dict):
         raise TypeError(f"Expected dictionary for 'data', got {type(data).__name__}: {data}")
 
-    reader = PdfReader(template_path)
-    writer = PdfWriter()
-
-    writer.append_pages_from_reader(reader)
-
-    # Force Copy AcroForm
-    if "/AcroForm" in reader.root_object:
-        writer.root_object[NameObject("/AcroForm")] = reader.root_object["/AcroForm"]
-
-    # --- DEBUG: PRINT FIELD NAMES TO LOGS ---
-    # Look at your Streamlit logs to see the ACTUAL internal names of your PDF
-    try:
-        if reader.get_fields():
-            print("\n=== PDF FIELDS FOUND ===")
-            for key in list(reader.get_fields().keys()):
-                print(f"Field: {key}")
-            print("========================\n")
-    except:
-        pass
-    # ----------------------------------------
-
-    # 1. Base Stats Mapping
-    field_mapping = {
-        # Identity
-        "Nome": str(data.get("name", "")),
-        "Name": str(data.get("name", "")),
-        "CharacterName": str(data.get("name", "")),
-        "Character Name": str(data.get("name", "")),
-        
-        "Identita": str(data.get("identity", "")),
-        "Identity": str(data.get("identity", "")),
-        
-        "Tema": str(data.get("theme", "")),
-        "Theme": str(data.get("theme", "")),
-        
-        "Origine": str(data.get("origin", "")),
-        "Origin": str(data.get("origin", "")),
-        
-        "Livello": str(data.get("level", "1")),
-        "Level": str(data.get("level", "1")),
-        
-        "Zenit": str(data.get("zenit", "0")),
-        "PuntiFabula": str(data.get("fabula_points", "0")),
-        "FabulaPoints": str(data.get("fabula_points", "0")),
-        
-        "PuntiEsperienza": str(data.get("exp", "0")),
-        "ExperiencePoints": str(data.get("exp", "0")),
-
-        # Attributes
-        "DestrezzaBase": f"d{data.get('dex', 6)}",
-        "DexterityBase": f"d{data.get('dex', 6)}",
-        
-        "IntuitoBase": f"d{data.get('ins', 6)}",
-        "InsightBase": f"d{data.get('ins', 6)}",
-        
-        "VigoreBase": f"d{data.get('mig', 6)}",
-        "MightBase": f"d{data.get('mig', 6)}",
-        
-        "VolontaBase": f"d{data.get('wil', 6)}",
-        "WillpowerBase": f"d{data.get('wil', 6)}",
-
-        # Status
-        "PVmax": str(data.get("hp_max", 0)),
-        "HPmax": str(data.get("hp_max", 0)),
-        
-        "PVattuali": str(data.get("hp_current", 0)),
-        "HPcurrent": str(data.get("hp_current", 0)),
-        
-        "PVcrisi": str(int(int(data.get("hp_max", 0)) / 2)),
-        "HPcrisis": str(int(int(data.get("hp_max", 0)) / 2)),
-        
-        "PMmax": str(data.get("mp_max", 0)),
-        "MPmax": str(data.get("mp_max", 0)),
-        
-        "PMattuali": str(data.get("mp_current", 0)),
-        "MPcurrent": str(data.get("mp_current", 0)),
-        
-        "PImax": str(data.get("ip_max", 6)),
-        "IPmax": str(data.get("ip_max", 6)),
-        
-        "PIattuali": str(data.get("ip_current", 6)),
-        "IPcurrent": str(data.get("ip_current", 6)),
-        
-        "ModIniziativa": str(data.get("init", 0)),
-        "InitiativeMod": str(data.get("init", 0)),
-        
-        "Difesa": str(data.get("def", 0)),
-        "Defense": str(data.get("def", 0)),
-        
-        "DifesaMagica": str(data.get("mdef", 0)),
-        "MagicDefense": str(data.get("mdef", 0)),
-        
-        # Equipment
-        "Mano1Equip": str(data.get("main_hand", "")),
-        "MainHand": str(data.get("main_hand", "")),
-        
-        "Mano2Equip": str(data.get("off_hand", "")),
-        "OffHand": str(data.get("off_hand", "")),
-        
-        "ArmaturaEquip": str(data.get("armor", "")),
-        "Armor": str(data.get("armor", "")),
-    }
-
-    # 2. Handle Classes & Skills
-    classes = data.get("classes_info", [])
-    for i, cls_info in enumerate(classes):
-        idx = i + 1 
-        if idx > 7: break 
-        
-        field_mapping[f"Classe{idx}"] = cls_info.get("name", "")
-        field_mapping[f"Class{idx}"] = cls_info.get("name", "")
-        
-        field_mapping[f"Info{idx}"] = cls_info.get("skills", "")
-        field_mapping[f"SkillInfo{idx}"] = cls_info.get("skills", "")
-
-    # 3. Handle Spells
-    spells = data.get("spells", [])
-    for i, spell in enumerate(spells):
-        idx = i + 1
-        if idx > 20: break 
-        
-        field_mapping[f"ArcanaNome{idx}"] = spell.get("name", "")
-        field_mapping[f"SpellName{idx}"] = spell.get("name", "")
-        
-        field_mapping[f"ArcanaPM{idx}"] = spell.get("mp", "")
-        field_mapping[f"SpellMP{idx}"] = spell.get("mp", "")
-        
-        field_mapping[f"ArcanaBersagli{idx}"] = spell.get("target", "")
-        field_mapping[f"SpellTarget{idx}"] = spell.get("target", "")
-        
-        field_mapping[f"ArcanaDurata{idx}"] = spell.get("duration", "")
-        field_mapping[f"SpellDuration{idx}"] = spell.get("duration", "")
-        
-        field_mapping[f"ArcanaNote{idx}"] = spell.get("effect", "")
-        field_mapping[f"SpellEffect{idx}"] = spell.get("effect", "")
-
-    # 4. Handle Checkboxes (Proficiencies)
-    # We create a list of potential names for each box
-    prof_map = {
-        "prof_armor": ["MartialArmor", "Martial Armor", "Martial_Armor", "ArmorProficiency"],
-        "prof_shield": ["MartialShields", "Martial Shields", "Martial_Shields", "ShieldProficiency"],
-        "prof_melee": ["MartialMelee", "Martial Melee", "Martial_Melee", "Martial Melee Weapons", "MeleeProficiency"],
-        "prof_ranged": ["MartialRanged", "Martial Ranged", "Martial_Ranged", "Martial Ranged Weapons", "RangedProficiency"]
-    }
-
-    # Apply fields to ALL pages
-    for page in writer.pages:
-        writer.update_page_form_field_values(
-            page, field_mapping, auto_regenerate=False
-        )
-        
-        # Apply Checkboxes (Try all variations)
-        for data_key, pdf_key_list in prof_map.items():
-            if data.get(data_key, False):
-                for pdf_key in pdf_key_list:
-                    writer.update_page_form_field_values(page, {pdf_key: NameObject("/Yes")})
+    template = load_template(template_path)
+    writer = new_writer(template)
+
+    # One pass over the widgets of each page that has fields to fill
+    for page_index in template.plan.pages:
+        values = template.plan.values(page_index, data)
+        if values:
+            writer.update_page_form_field_values(writer.pages[page_index], values, auto_regenerate=False)
 
     output_stream = io.BytesIO()
     writer.write(output_stream)
     output_stream.seek(0)
-    
+
     return output_stream
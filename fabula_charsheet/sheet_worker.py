@@ -0,0 +1,12 @@
+"""
+Entry module of the party export worker processes (see party_pdf).
+
+Spawned workers import the main module of the process that started them;
+party_pdf points them at this one instead of the Streamlit script, so a
+worker only loads what rendering a sheet needs.
+"""
+import custom_pdf
+
+
+def render(character, loc) -> bytes:
+    return custom_pdf.create_custom_sheet(character, loc).getvalue()
@@ -1,4 +1,6 @@
+import os
 import sys
+import tempfile
 import types
 import json
 from pathlib import Path
@@ -12,6 +14,9 @@ PKG = ROOT / 'fabula_charsheet'
 if str(PKG) not in sys.path:
     sys.path.insert(0, str(PKG))
 
+# Keep tests away from the bundled society.db
+os.environ.setdefault('FABULA_DB_PATH', str(Path(tempfile.mkdtemp()) / 'society.db'))
+
 # Stub streamlit module
 class SessionState(dict):
     __getattr__ = dict.get
@@ -19,6 +24,10 @@ class SessionState(dict):
 
 st_stub = types.SimpleNamespace(session_state=SessionState())
 sys.modules.setdefault('streamlit', st_stub)
+# Imported by pages.controller for a type annotation
+uploaded_file_stub = types.SimpleNamespace(UploadedFile=type('UploadedFile', (), {}))
+sys.modules.setdefault('streamlit.runtime', types.SimpleNamespace(uploaded_file_manager=uploaded_file_stub))
+sys.modules.setdefault('streamlit.runtime.uploaded_file_manager', uploaded_file_stub)
 
 # Stub yaml module using json
 yaml_stub = types.SimpleNamespace()
@@ -26,8 +35,13 @@ yaml_stub = types.SimpleNamespace()
 def _yaml_load(stream, Loader=None):
     return json.load(stream)
 
+class _Loader:
+    @classmethod
+    def add_multi_constructor(cls, tag_prefix, constructor):
+        pass
+
 yaml_stub.load = _yaml_load
-yaml_stub.SafeLoader = yaml_stub.UnsafeLoader = yaml_stub.Loader = object
+yaml_stub.SafeLoader = yaml_stub.UnsafeLoader = yaml_stub.Loader = _Loader
 sys.modules.setdefault('yaml', yaml_stub)
 
 # Stub pydantic module
@@ -120,7 +134,8 @@ def assets_dir(tmp_path: Path) -> Path:
     }
     (classes / 'elementalist.yaml').write_text(json.dumps(elementalist))
     (classes / 'sharpshooter.yaml').write_text(json.dumps(sharpshooter))
-    (classes / 'arcanist.yaml').write_text(json.dumps(arcanist))
+    # Some class files are written as a one-element list
+    (classes / 'arcanist.yaml').write_text(json.dumps([arcanist]))
 
     spells = tmp_path / 'spells'
     spells.mkdir()
@@ -4,7 +4,7 @@ import json
 from fabula_charsheet.data.models import Character, HeroicSkill, HeroicSkillName
 from fabula_charsheet.data.models.character import InvalidCharacterField
 from fabula_charsheet.data import compendium
-from fabula_charsheet.data.localizator import init_localizator
+from fabula_charsheet.data.localizator import init_localizator, get_loc
 from fabula_charsheet.data.models import LangEnum
 
 
@@ -23,7 +23,7 @@ def _setup_loc(streamlit_stub, tmp_path):
     ru_dir.mkdir()
     (ru_dir / 'base.yaml').write_text('{}')
     init_localizator(tmp_path)
-    return streamlit_stub.session_state['localizator'].get(LangEnum.en)
+    return get_loc(LangEnum.en)
 
 
 def test_character_field_validations(streamlit_stub, tmp_path):
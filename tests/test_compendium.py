@@ -29,3 +29,42 @@ def test_compendium_retrieval_methods(assets_dir):
     assert c.heroic_skills.get_skill('unknown') is None
     skill = arcanist.skills[0]
     assert c.get_class_name_from_skill(skill) == 'arcanist'
+
+
+def test_compendium_binary_cache(assets_dir, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    compendium.COMPENDIUM = None
+    compendium.init(assets_dir, cache_dir)
+    key = compendium.assets_hash(assets_dir)
+    assert compendium.cache_path(cache_dir, key).exists()
+    cached = compendium.load_cache(cache_dir, key)
+    assert [w.name for w in cached.equipment.weapons] == ['staff']
+    (assets_dir / 'equipment' / 'shields.yaml').write_text('[{"name": "buckler"}]')
+    assert compendium.assets_hash(assets_dir) != key
+    assert compendium.load_cache(cache_dir, compendium.assets_hash(assets_dir)) is None
+
+
+def test_compendium_cache_key_follows_code(assets_dir, monkeypatch):
+    key = compendium.assets_hash(assets_dir)
+    monkeypatch.setattr(compendium, '_code_digest', lambda: 'edited models')
+    assert compendium.assets_hash(assets_dir) != key
+
+
+def test_compendium_stale_cache_is_rebuilt(assets_dir, tmp_path):
+    import pickle
+    cache_dir = tmp_path / 'cache'
+    key = compendium.assets_hash(assets_dir)
+    built = compendium.build(assets_dir)
+    # Pickled by an older version that had no modifiers yet
+    del built.modifiers
+    cache_dir.mkdir()
+    compendium.cache_path(cache_dir, key).write_bytes(pickle.dumps(built))
+    assert compendium.load_cache(cache_dir, key) is None
+
+    compendium.cache_path(cache_dir, key).write_bytes(b'not a pickle')
+    assert compendium.load_cache(cache_dir, key) is None
+    compendium.COMPENDIUM = None
+    compendium._loaded_fingerprint = None
+    compendium.init(assets_dir, cache_dir)
+    assert compendium.COMPENDIUM.modifiers is not None
+    assert compendium.load_cache(cache_dir, key) is not None
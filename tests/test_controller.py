@@ -0,0 +1,109 @@
+import importlib.util
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from fabula_charsheet.data.modifiers import ModifierTable
+
+CONTROLLER_PATH = "fabula_charsheet/pages/controller.py"
+
+
+@pytest.fixture
+def controller_module(monkeypatch, tmp_path):
+    # The pages package imports every page (and the PDF libraries), so the
+    # controller is loaded on its own, with the same data.* modules as the app
+    monkeypatch.setitem(sys.modules, 'config', SimpleNamespace(
+        SAVED_CHARS_DIRECTORY=tmp_path,
+        SAVED_CHARS_IMG_DIRECTORY=tmp_path,
+        SAVED_STATES_DIRECTORY=tmp_path,
+        MIN_ATTRIBUTE_VALUE=6,
+        MAX_ATTRIBUTE_VALUE=12,
+    ))
+    from pathlib import Path
+    path = Path(__file__).resolve().parents[1] / CONTROLLER_PATH
+    spec = importlib.util.spec_from_file_location("controller_under_test", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    modifiers = ModifierTable.compile({"statuses": {"slow": {"dexterity": -2}, "weak": {"might": -2}}})
+    monkeypatch.setattr(module.c, 'COMPENDIUM', SimpleNamespace(modifiers=modifiers))
+    return module
+
+
+def _controller(module):
+    from data.models import Backpack, CharState, Dexterity, Equipped, Insight, Inventory, Might, Willpower
+    controller = module.CharacterController(SimpleNamespace(dice_prefix="d"))
+    controller.character = module.Character(
+        level=5, classes=[], heroic_skills=[],
+        dexterity=Dexterity(base=8, current=8), might=Might(base=8, current=8),
+        insight=Insight(base=8, current=8), willpower=Willpower(base=8, current=8),
+        inventory=Inventory(
+            equipped=Equipped(main_hand=None, off_hand=None, armor=None, accessory=None),
+            backpack=Backpack(armors=[], weapons=[], shields=[], accessories=[], other=[]),
+        ),
+    )
+    controller.state = CharState(statuses=[], improved_attributes=[], active_therioforms=[])
+    controller.refresh_stats()
+    return controller
+
+
+STATS = ("max_hp", "max_mp", "defense", "magic_defense", "crisis_value")
+
+
+def _read_all(controller) -> dict:
+    return {name: getattr(controller, name)() for name in STATS}
+
+
+def _cached(controller) -> set:
+    return {name for name in STATS if controller._stats.is_cached(name)}
+
+
+def test_controller_refreshes_only_changed_stats(controller_module):
+    controller = _controller(controller_module)
+    assert _read_all(controller) == {"max_hp": 45, "max_mp": 45, "defense": 8, "magic_defense": 8, "crisis_value": 22}
+
+    # Slow lowers dexterity: only defense depends on it
+    controller.add_status(controller_module.Status.slow)
+    assert _cached(controller) == {"max_hp", "max_mp", "magic_defense", "crisis_value"}
+    assert controller.defense() == 6
+
+    controller.equip_item(controller_module.Armor(name="plate", defense=11))
+    assert _cached(controller) == {"max_hp", "max_mp", "crisis_value"}
+    assert controller.defense() == 11 and controller.magic_defense() == 8
+
+    # Changed directly on the character, picked up by refresh_stats
+    controller.character.level = 6
+    controller.refresh_stats()
+    assert _cached(controller) == {"defense", "magic_defense"}
+    assert (controller.max_hp(), controller.max_mp(), controller.crisis_value()) == (46, 46, 23)
+
+    controller.character.might.base = 10
+    controller.refresh_stats()
+    assert _cached(controller) == {"max_mp", "defense", "magic_defense"}
+    assert (controller.max_hp(), controller.crisis_value()) == (56, 28)
+
+    # Nothing changed: everything stays cached
+    controller.refresh_stats()
+    assert _cached(controller) == set(STATS)
+
+
+def test_controller_revision_counts_character_changes(controller_module):
+    controller = _controller(controller_module)
+    revision = controller.revision
+    controller.refresh_stats()
+    controller.add_status(controller_module.Status.weak)
+    # Reading stats and changing the state leave the character's revision alone
+    assert controller.revision == revision
+    controller.equip_item(controller_module.Armor(name="plate", defense=11))
+    controller.unequip_item("armor")
+    assert controller.revision == revision + 2
+
+
+def test_controller_initiative_follows_language(controller_module):
+    controller = _controller(controller_module)
+    assert controller.initiative() == "d8 + d8"
+    # The sidebar language switch replaces loc without touching the character
+    controller.loc = SimpleNamespace(dice_prefix="w")
+    assert controller.initiative() == "w8 + w8"
+    controller.equip_item(controller_module.Accessory(name="ring", bonus_initiative=2))
+    assert controller.initiative() == "w8 + w8 +2"
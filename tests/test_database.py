@@ -0,0 +1,216 @@
+import sqlite3
+import threading
+
+import pytest
+
+from fabula_charsheet.data.database import DatabaseManager
+
+
+def _db(tmp_path):
+    return DatabaseManager(str(tmp_path / 'society.db'))
+
+
+def test_database_user_and_character_roundtrip(tmp_path):
+    db = _db(tmp_path)
+    ok, _ = db.register_user('alice', 'Secret1!', 'Secret1!')
+    assert ok
+    user_id, error = db.login_user('alice', 'Secret1!')
+    assert user_id and not error
+    assert db.login_user('alice', 'wrong')[0] is None
+
+    db.save_character(user_id, 'c1', 'Hero', {"id": "c1", "name": "Hero"})
+    db.save_character(user_id, 'c1', 'Hero', {"id": "c1", "name": "Hero", "level": 6})
+    assert db.get_user_characters(user_id) == [{"id": "c1", "name": "Hero", "level": 6}]
+    db.delete_character(user_id, 'c1')
+    assert db.get_user_characters(user_id) == []
+
+
+def test_database_reuses_connections_in_wal_mode(tmp_path):
+    db = _db(tmp_path)
+    with db._pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    with db._pool.connection() as again:
+        assert again is conn
+
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(20):
+                db.save_character(1, f'c{n}-{i}', 'Hero', {"n": n, "i": i})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert len(db.get_user_characters(1)) == 80
+
+
+def test_database_batch_upsert(tmp_path):
+    db = _db(tmp_path)
+    db.save_characters(1, [(f'c{i}', f'Hero {i}', {"i": i}) for i in range(5)])
+    db.save_characters(1, [('c0', 'Renamed', {"i": 0, "renamed": True}), ('c5', 'Hero 5', {"i": 5})])
+    # Another user cannot overwrite an id they do not own
+    db.save_characters(2, [('c1', 'Stolen', {"stolen": True})])
+    characters = {c["i"]: c for c in db.get_user_characters(1)}
+    assert len(characters) == 6
+    assert characters[0].get("renamed")
+    assert not characters[1].get("stolen")
+    assert db.get_user_characters(2) == []
+
+
+def test_database_character_summaries(tmp_path):
+    db = _db(tmp_path)
+    db.save_character(1, 'c1', 'Hero', {"id": "c1", "level": 7, "classes": [{"name": "fury"}, {"name": "rogue"}]})
+    db.save_characters(1, [('c2', 'Mage', '{"id": "c2"}', 12, ['elementalist'])])
+
+    summaries = {s.id: s for s in db.get_user_character_summaries(1)}
+    assert (summaries['c1'].name, summaries['c1'].level, summaries['c1'].classes) == ('Hero', 7, ['fury', 'rogue'])
+    assert (summaries['c2'].level, summaries['c2'].classes) == (12, ['elementalist'])
+    assert summaries['c1'].updated_at
+    assert db.get_character(1, 'c2') == {"id": "c2"}
+    assert db.get_character(2, 'c2') is None
+    assert sorted(db.get_user_character_ids(1)) == ['c1', 'c2']
+    assert db.get_user_character_ids(2) == []
+
+
+def test_database_backfills_summary_columns(tmp_path):
+    import sqlite3
+    path = tmp_path / 'society.db'
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE characters (
+            id TEXT PRIMARY KEY, user_id INTEGER NOT NULL, name TEXT, data JSON NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute(
+        "INSERT INTO characters (id, user_id, name, data) VALUES (?, ?, ?, ?)",
+        ('c1', 1, 'Hero', '{"level": 9, "classes": [{"name": "guardian"}]}')
+    )
+    conn.commit()
+    conn.close()
+
+    [summary] = DatabaseManager(str(path)).get_user_character_summaries(1)
+    assert (summary.level, summary.classes) == (9, ['guardian'])
+
+
+def test_database_keyset_pagination(tmp_path):
+    db = _db(tmp_path)
+    names = ['Zed', 'amy', 'Bob', 'bea', 'Cid']
+    db.save_characters(1, [(f'c{i}', name, {"level": 5 + i}) for i, name in enumerate(names)])
+    db.save_characters(2, [('other', 'Abe', {"level": 1})])
+
+    seen, cursor = [], None
+    while True:
+        page = db.list_character_summaries(1, sort="name", after=cursor, limit=2)
+        seen.extend(s.name for s in page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == ['amy', 'bea', 'Bob', 'Cid', 'Zed']
+
+    by_level = db.list_character_summaries(1, sort="level", descending=True, min_level=6, max_level=8)
+    assert [s.level for s in by_level.items] == [8, 7, 6] and by_level.next_cursor is None
+    assert sorted(s.name for s in db.list_character_summaries(1, name_contains="B").items) == ['Bob', 'bea']
+    assert db.list_character_summaries(1, name_contains="%").items == []
+
+    with db._pool.connection() as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM characters WHERE user_id = ? ORDER BY updated_at DESC", (1,)
+        ).fetchall()
+    assert any('idx_characters_user_updated' in row[-1] for row in plan)
+
+
+def test_database_compressed_payloads(tmp_path):
+    import json
+    data = {"id": "c1", "name": "Hero", "level": 5, "spells": [{"name": "fire", "mp_cost": 10}] * 50}
+    sizes = {}
+    for encoding in ('json', 'zlib', 'lzma'):
+        db = DatabaseManager(str(tmp_path / f'{encoding}.db'), payload_encoding=encoding)
+        db.save_character(1, 'c1', 'Hero', data)
+        assert db.get_user_characters(1) == [data]
+        assert json.loads(db.get_character_payload(1, 'c1')) == data
+        with db._pool.connection() as conn:
+            row = conn.execute("SELECT encoding, length(data) FROM characters").fetchone()
+        assert row[0] == encoding
+        sizes[encoding] = row[1]
+    assert sizes['zlib'] < sizes['json'] / 4 and sizes['lzma'] < sizes['json'] / 4
+
+    # Rows keep decoding after the configured encoding changes
+    db = DatabaseManager(str(tmp_path / 'json.db'), payload_encoding='zlib')
+    db.save_character(1, 'c2', 'Mage', {"id": "c2"})
+    assert sorted(c["id"] for c in db.get_user_characters(1)) == ['c1', 'c2']
+
+    db.backup(str(tmp_path / 'backup.db'))
+    assert len(DatabaseManager(str(tmp_path / 'backup.db')).get_user_characters(1)) == 2
+
+
+def test_database_compare_and_swap(tmp_path):
+    db = _db(tmp_path)
+    [created] = db.save_characters(1, [('c1', 'Hero', {"level": 5})])
+    assert created.saved and created.version == 1
+    record = db.get_character_record(1, 'c1')
+    assert record.version == 1
+
+    # Two sessions read version 1; the second save is rejected
+    [first] = db.save_characters(1, [('c1', 'Hero', {"level": 6})], expected_versions={'c1': 1})
+    [second] = db.save_characters(1, [('c1', 'Hero', {"level": 7})], expected_versions={'c1': 1})
+    assert first == ('c1', True, 2)
+    assert second == ('c1', False, 2)
+    assert db.get_character(1, 'c1') == {"level": 6}
+
+    # Unconditional saves still bump the version; other users never get one
+    assert db.save_characters(1, [('c1', 'Hero', {"level": 8})])[0].version == 3
+    assert db.save_characters(2, [('c1', 'Stolen', {})]) == [('c1', False, None)]
+
+
+def test_database_character_state(tmp_path):
+    db = _db(tmp_path)
+    state = {"minus_hp": 5, "minus_mp": 0, "minus_ip": 2, "statuses": ["dazed"], "active_therioforms": []}
+    # Saved with its character, in one transaction
+    db.save_characters(1, [('c1', 'Hero', {"level": 5})], states={'c1': state})
+    assert db.get_character_state(1, 'c1') == state
+
+    assert db.save_character_vitals(1, 'c1', 10, 3, 0)
+    assert db.get_character_state(1, 'c1') == {**state, "minus_hp": 10, "minus_mp": 3, "minus_ip": 0}
+
+    # Only the owner can read or write the state
+    assert not db.save_character_vitals(2, 'c1', 0, 0, 0)
+    assert not db.save_character_state(1, 'missing', state)
+    assert db.get_character_state(2, 'c1') is None
+
+    # A rejected save does not write its state either
+    db.save_characters(1, [('c1', 'Hero', {})], expected_versions={'c1': 99}, states={'c1': {"minus_hp": 0}})
+    assert db.get_character_state(1, 'c1')["minus_hp"] == 10
+
+    db.delete_character(1, 'c1')
+    with db._pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM character_states").fetchone()[0] == 0
+
+
+def test_database_restore_replaces_wal_database(tmp_path):
+    import os
+    db = _db(tmp_path)
+    db.save_character(1, 'c1', 'Hero', {"id": "c1"})
+    snapshot = str(tmp_path / 'snapshot.db')
+    db.backup(snapshot)
+
+    # Committed after the snapshot; still in the WAL file while connections are open
+    db.save_character(1, 'c2', 'Mage', {"id": "c2"})
+    assert os.path.exists(str(tmp_path / 'society.db-wal'))
+    with db._pool.connection() as in_use:
+        db.restore(snapshot)
+    # The connection in use during the restore is not reused afterwards
+    with db._pool.connection() as conn:
+        assert conn is not in_use
+    assert [c["id"] for c in db.get_user_characters(1)] == ['c1']
+
+    (tmp_path / 'broken.db').write_bytes(b'not a database')
+    with pytest.raises((sqlite3.DatabaseError, ValueError)):
+        db.restore(str(tmp_path / 'broken.db'))
+    assert [c["id"] for c in db.get_user_characters(1)] == ['c1']
@@ -0,0 +1,81 @@
+from fabula_charsheet.data.models import Backpack, Equipped, Inventory, Item, Weapon, Armor
+
+
+def _backpack(**lists):
+    return Backpack(**{name: lists.get(name, []) for name in ("armors", "weapons", "shields", "accessories", "other")})
+
+
+def test_backpack_assigns_unique_uids():
+    sword = Weapon(name="sword")
+    twin = Weapon(name="sword", uid="x")
+    backpack = _backpack(weapons=[twin])
+
+    backpack.add_item(sword)
+    # The same uid again gets a new one
+    backpack.add_item(Weapon(name="sword", uid="x"))
+
+    uids = [item.uid for item in backpack.weapons]
+    assert all(uids) and len(set(uids)) == 3
+    assert backpack.get_item(sword.uid) is sword
+
+
+def test_backpack_remove_by_uid():
+    sword, axe = Weapon(name="sword"), Weapon(name="axe")
+    backpack = _backpack()
+    backpack.add_item(sword)
+    backpack.add_item(axe)
+    backpack.add_item(Item(name="tent"))
+
+    # A copy with the same uid is the same item
+    backpack.remove_item(Weapon(name="renamed", uid=sword.uid))
+    assert backpack.weapons == [axe]
+    assert backpack.get_item(sword.uid) is None
+
+    # Lists changed directly are picked up by the index
+    backpack.weapons.append(sword)
+    assert backpack.get_item(sword.uid) is sword
+
+
+def test_equipped_slot_of():
+    armor = Armor(name="plate", uid="a")
+    equipped = Equipped(main_hand=None, off_hand=None, armor=armor, accessory=None)
+    assert equipped.slot_of(Armor(name="plate", uid="a")) == "armor"
+    assert equipped.slot_of(Armor(name="plate", uid="b")) is None
+    assert equipped.items() == [armor]
+
+
+def test_inventory_links_equipped_copies():
+    backpack = _backpack(armors=[Armor(name="plate")])
+    # Saved before items had ids: the equipped armor is a separate copy
+    inventory = Inventory(equipped=Equipped(main_hand=None, off_hand=None, armor=Armor(name="plate"), accessory=None),
+                          backpack=backpack)
+    inventory.link_equipped()
+
+    assert inventory.equipped.armor.uid
+    assert inventory.equipped.armor.uid == backpack.armors[0].uid
+
+
+def test_item_equality_compares_fields():
+    sword = Weapon(name="sword", uid="w")
+    edited = Weapon(name="sword", uid="w")
+    assert sword == edited
+    # Edited in place: still the same item, but no longer equal
+    edited.bonus_initiative = 2
+    assert sword != edited
+    assert sword.same_item(edited)
+    assert not sword.same_item(Weapon(name="sword", uid="v"))
+    assert not sword.same_item(None)
+
+
+def test_backpack_index_follows_replaced_items():
+    sword, axe = Weapon(name="sword", uid="s"), Weapon(name="axe", uid="a")
+    backpack = _backpack(weapons=[sword])
+    assert backpack.get_item("s") is sword
+
+    # Replaced in place: same sizes, other item
+    backpack.weapons[0] = axe
+    assert backpack.get_item("s") is None
+    assert backpack.get_item("a") is axe
+
+    axe.uid = "b"
+    assert backpack.get_item("b") is axe
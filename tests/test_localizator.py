@@ -1,7 +1,8 @@
 from pathlib import Path
 import pytest
 
-from fabula_charsheet.data.localizator import init_localizator
+from fabula_charsheet.data import localizator as localizator_module
+from fabula_charsheet.data.localizator import init_localizator, get_loc
 from fabula_charsheet.data.models import LangEnum
 
 
@@ -13,12 +14,18 @@ def test_init_localizator_loads_translations(streamlit_stub, tmp_path):
     (en_dir / 'base.yaml').write_text('{"error_name_empty": "Name should not be empty.", "bond_explanation": "About Bonds"}')
     (ru_dir / 'base.yaml').write_text('{"error_name_empty": "Имя не должно быть пустым."}')
     init_localizator(tmp_path)
-    localizator = streamlit_stub.session_state['localizator']
+    localizator = localizator_module.LOCALIZATOR
     en = localizator.get(LangEnum.en)
     ru = localizator.get(LangEnum.ru)
     assert en.error_name_empty == "Name should not be empty."
     assert ru.error_name_empty == "Имя не должно быть пустым."
     assert ru.bond_explanation == en.bond_explanation
+    # Translations are shared by the process, sessions only keep their language
+    assert 'localizator' not in streamlit_stub.session_state
+    init_localizator(tmp_path)
+    assert localizator_module.LOCALIZATOR is localizator
+    streamlit_stub.session_state['language'] = LangEnum.ru
+    assert get_loc().error_name_empty == ru.error_name_empty
 
 
 def test_init_localizator_duplicate_keys(tmp_path, streamlit_stub):
@@ -31,3 +38,20 @@ def test_init_localizator_duplicate_keys(tmp_path, streamlit_stub):
     (ru_dir / 'a.yaml').write_text('{"key1": "value1"}')
     with pytest.raises(ValueError):
         init_localizator(tmp_path)
+
+
+def test_localizator_namespace_is_cached(streamlit_stub, tmp_path):
+    en_dir = tmp_path / 'en'
+    ru_dir = tmp_path / 'ru'
+    en_dir.mkdir()
+    ru_dir.mkdir()
+    (en_dir / 'base.yaml').write_text('{"hp": "HP"}')
+    (ru_dir / 'base.yaml').write_text('{}')
+    init_localizator(tmp_path)
+    localizator = localizator_module.LOCALIZATOR
+    en = localizator.get(LangEnum.en)
+    assert localizator.get(LangEnum.en) is en
+    assert en['hp'] == "HP"
+    assert getattr(en, 'missing_key', "fallback") == "fallback"
+    with pytest.raises(AttributeError):
+        en.hp = "changed"
@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+
+from fabula_charsheet.data import migrations
+from fabula_charsheet.data.database import DatabaseManager
+
+
+def _connect(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def test_migrations_bring_new_database_to_latest(tmp_path):
+    DatabaseManager(str(tmp_path / 'society.db')).close()
+    conn = _connect(tmp_path / 'society.db')
+    assert migrations.schema_version(conn) == migrations.latest_version()
+    assert {'level', 'classes'} <= migrations.column_names(conn, 'characters')
+    # Running again is a no-op
+    assert migrations.migrate(conn) == migrations.latest_version()
+
+
+def test_failed_migration_rolls_back(tmp_path):
+    conn = _connect(tmp_path / 'society.db')
+    base = [m for m in migrations.MIGRATIONS if m.version == 1]
+
+    def broken(conn):
+        conn.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        migrations.migrate(conn, base + [migrations.Migration(2, "broken", broken)])
+    assert migrations.schema_version(conn) == 1
+    assert not conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchall()
+
+
+def test_backfill_streams_in_chunks(tmp_path):
+    conn = _connect(tmp_path / 'society.db')
+    conn.execute("CREATE TABLE t (value INTEGER, doubled INTEGER)")
+    conn.executemany("INSERT INTO t (value) VALUES (?)", [(i,) for i in range(7)])
+    chunk_sizes = [len(rows) for rows in migrations.iter_chunks(conn, 't', 'value', chunk_size=3)]
+    assert chunk_sizes == [3, 3, 1]
+
+    updated = migrations.backfill(
+        conn, 't', 'value', "UPDATE t SET doubled = ? WHERE rowid = ?",
+        lambda row: (row['value'] * 2, row[0]) if row['value'] % 2 else None,
+        chunk_size=3,
+    )
+    assert updated == 3
+    assert [r[0] for r in conn.execute("SELECT doubled FROM t WHERE doubled IS NOT NULL")] == [2, 6, 10]
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+
+from fabula_charsheet.data.modifiers import ModifierTable, active_sources
+
+TABLE = {
+    "statuses": {
+        "dazed": {"insight": -2},
+        "enraged": {"insight": -2, "dexterity": -2},
+        "weak": {"might": -2},
+    },
+    "improved_attributes": {
+        "dexterity": {"dexterity": 2},
+    },
+    "therioforms": {
+        "tachytheria": {"dexterity": 2},
+    },
+}
+
+
+def _state(statuses=(), improved=(), therioforms=()):
+    return SimpleNamespace(
+        statuses=list(statuses),
+        improved_attributes=list(improved),
+        active_therioforms=[SimpleNamespace(name=name) for name in therioforms],
+    )
+
+
+def test_compile_vectors():
+    table = ModifierTable.compile(TABLE)
+    assert table.vectors["status.enraged"] == (-2, 0, -2, 0)
+    assert table.vectors["improved.dexterity"] == (2, 0, 0, 0)
+    assert table.vectors["therioform.tachytheria"] == (2, 0, 0, 0)
+    assert sorted(table.sources("dexterity")) == ["improved.dexterity", "status.enraged", "therioform.tachytheria"]
+    assert table.sources("willpower") == []
+
+
+def test_compile_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        ModifierTable.compile({"statuses": {"dazed": {"luck": -2}}})
+    with pytest.raises(ValueError):
+        ModifierTable.compile({"curses": {}})
+
+
+def test_apply_sums_and_clamps():
+    table = ModifierTable.compile(TABLE)
+    state = _state(statuses=["dazed", "enraged"], improved=["dexterity"], therioforms=["tachytheria", "amphibia"])
+    sources = active_sources(state)
+    assert table.modifier(sources) == (2, 0, -4, 0)
+    assert table.apply((12, 8, 8, 6), sources, 6, 12) == (12, 8, 6, 6)
+    assert table.apply((8, 8, 8, 8), [], 6, 12) == (8, 8, 8, 8)
+
+
+def test_apply_many():
+    table = ModifierTable.compile(TABLE)
+    rows = [
+        ((8, 8, 8, 8), active_sources(_state(statuses=["weak"]))),
+        ((10, 6, 10, 8), active_sources(_state(statuses=["weak"], improved=["dexterity"]))),
+    ]
+    assert table.apply_many(rows, 6, 12) == [(8, 6, 8, 8), (12, 6, 10, 8)]
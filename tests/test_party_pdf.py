@@ -0,0 +1,61 @@
+import importlib
+import io
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+
+def _create_custom_sheet(character, loc):
+    if character.name == "Broken":
+        raise ValueError("no sheet")
+    return io.BytesIO(f"{character.name} {loc}".encode())
+
+
+@pytest.fixture
+def party_pdf(monkeypatch):
+    # Rendering is stubbed: sheets are the character name, rendered on threads
+    renderer = SimpleNamespace(create_custom_sheet=_create_custom_sheet)
+    monkeypatch.setitem(sys.modules, 'custom_pdf', renderer)
+    module = importlib.import_module('party_pdf')
+    monkeypatch.setattr(module.sheet_worker, 'custom_pdf', renderer)
+    with ThreadPoolExecutor(2) as pool:
+        monkeypatch.setattr(module, '_shared_pool', lambda: pool)
+        yield module
+
+
+def test_export_party_writes_every_sheet(party_pdf):
+    characters = {
+        "c1": SimpleNamespace(name="Hero"),
+        "c2": SimpleNamespace(name="Hero"),
+        "c3": SimpleNamespace(name="Broken"),
+        "c5": SimpleNamespace(name="Mage"),
+    }
+    target = io.BytesIO()
+
+    steps = list(party_pdf.export_party(["c1", "c2", "c3", "c4", "c5"], characters.get, "en", target))
+
+    assert [step.done for step in steps] == [1, 2, 3, 4, 5]
+    assert {step.char_id: step.error for step in steps if step.error} == {"c3": "no sheet", "c4": "not found"}
+    with zipfile.ZipFile(target) as archive:
+        sheets = {name: archive.read(name) for name in archive.namelist()}
+    assert sheets == {
+        "Hero_CustomSheet.pdf": b"Hero en",
+        "Hero_CustomSheet_2.pdf": b"Hero en",
+        "Mage_CustomSheet.pdf": b"Mage en",
+    }
+    assert sorted(step.file_name for step in steps if step.file_name) == sorted(sheets)
+
+
+def test_export_party_reports_load_errors(party_pdf):
+    def load(char_id):
+        raise OSError("database is locked")
+
+    target = io.BytesIO()
+    steps = list(party_pdf.export_party(["c1"], load, "en", target))
+
+    assert [(step.done, step.total, step.error) for step in steps] == [(1, 1, "not found")]
+    with zipfile.ZipFile(target) as archive:
+        assert archive.namelist() == []
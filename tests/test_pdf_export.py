@@ -0,0 +1,56 @@
+import pytest
+
+pdf_export = pytest.importorskip("fabula_charsheet.pdf_export", exc_type=ImportError)
+
+
+class FakeObject(dict):
+    """A PDF dictionary as pypdf hands it out, for building fake pages."""
+    def get_object(self):
+        return self
+
+
+def _widget(name=None, parent=None, subtype="/Widget"):
+    widget = FakeObject({"/Subtype": subtype})
+    if name is not None:
+        widget["/T"] = name
+    if parent is not None:
+        widget["/Parent"] = parent
+    return widget
+
+
+class FakeReader:
+    def __init__(self, *pages):
+        self.pages = [FakeObject({"/Annots": annotations}) for annotations in pages]
+
+
+def test_fill_plan_groups_fields_by_page():
+    reader = FakeReader(
+        # Widget carrying the field name itself, a link and a field not in FIELD_VALUES
+        [_widget("Name"), _widget("Name", subtype="/Link"), _widget("Notes")],
+        # Widgets of one field with the name on their parent; a widget without any name
+        [_widget(parent=FakeObject({"/T": "HPmax"})), _widget(parent=FakeObject({"/T": "HPmax"})), _widget()],
+        # Nothing to fill here
+        [],
+    )
+    # "Nome" and "Livello" are aliases the template does not have; "Level" has no widget
+    fields = {"sheet.Name": {}, "HPmax": {}, "Notes": {}, "Level": {}}
+
+    plan = pdf_export.build_fill_plan(reader, fields)
+
+    assert pdf_export._widget_names(reader.pages[0]) == {"Name", "Notes"}
+    assert pdf_export._widget_names(reader.pages[1]) == {"HPmax"}
+    assert sorted(plan.pages) == [0, 1]
+    assert [name for name, _ in plan.pages[0]] == ["Name"]
+    assert [name for name, _ in plan.pages[1]] == ["HPmax"]
+    assert plan.values(0, {"name": "Hero"}) == {"Name": "Hero"}
+    assert plan.values(1, {"hp_max": 45}) == {"HPmax": "45"}
+
+
+def test_fill_plan_leaves_missing_entries_alone():
+    reader = FakeReader([_widget("Class1"), _widget("Class2"), _widget("MartialArmor")])
+    plan = pdf_export.build_fill_plan(reader, {"Class1": {}, "Class2": {}, "MartialArmor": {}})
+
+    values = plan.values(0, {"classes_info": [{"name": "Mage"}], "prof_armor": False})
+    # Past the end of the classes and unchecked boxes are not written
+    assert values == {"Class1": "Mage"}
+    assert plan.values(0, {"prof_armor": True})["MartialArmor"] == "/Yes"
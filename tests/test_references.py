@@ -0,0 +1,144 @@
+import copy
+import json
+from types import SimpleNamespace
+
+from fabula_charsheet.data import references
+
+
+class FakeModel:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def model_dump(self, mode=None):
+        return copy.deepcopy(self.__dict__)
+
+    def model_copy(self, deep=False):
+        return FakeModel(**copy.deepcopy(self.__dict__))
+
+
+def _compendium():
+    equipment = SimpleNamespace(
+        weapons=[FakeModel(name="sword", damage=10)],
+        armors=[FakeModel(name="plate", defense=11)],
+        shields=[FakeModel(name="buckler", defense=1)],
+        accessories=[],
+        items=[FakeModel(name="tent", cost=100)],
+    )
+    return SimpleNamespace(
+        equipment=equipment,
+        spells=SimpleNamespace(spells={"entropist": [FakeModel(name="drain_vigor", mp_cost=10)]}),
+        therioforms=[], dances=[FakeModel(name="waltz")], arcana=[], inventions=[],
+    )
+
+
+def test_references_roundtrip():
+    compendium = _compendium()
+    payload = {
+        "name": "Hero",
+        "inventory": {
+            "equipped": {"main_hand": {"name": "sword", "damage": 10}, "off_hand": {"name": "buckler", "defense": 1},
+                         "armor": None, "accessory": None},
+            "backpack": {"weapons": [{"name": "sword", "damage": 10}, {"name": "sword", "damage": 14}],
+                         "armors": [], "shields": [], "accessories": [], "other": [{"name": "tent", "cost": 100}]},
+        },
+        "spells": {"entropist": [{"name": "drain_vigor", "mp_cost": 10}], "fury": []},
+        "special": {"therioforms": [], "dances": [{"name": "waltz"}], "arcana": [], "inventions": []},
+    }
+    original = copy.deepcopy(payload)
+
+    compacted = references.compact(payload, compendium)
+    text = json.dumps(compacted)
+    assert text.count(references.REF_KEY) == 6
+    # The upgraded sword is kept in full
+    assert compacted["inventory"]["backpack"]["weapons"][1] == {"name": "sword", "damage": 14}
+    assert compacted["inventory"]["equipped"]["off_hand"] == {references.REF_KEY: ["shields", "buckler"]}
+
+    expanded = references.expand(json.loads(text), compendium)
+    main_hand = expanded["inventory"]["equipped"]["main_hand"]
+    assert isinstance(main_hand, FakeModel) and main_hand.damage == 10
+    # Resolved entries are private copies
+    assert main_hand is not compendium.equipment.weapons[0]
+    as_json = json.loads(json.dumps(expanded, default=lambda m: m.model_dump()))
+    assert as_json == original
+
+
+def test_references_park_unknown_entries():
+    compendium = _compendium()
+    armor = {references.REF_KEY: ["armors", "gone"], "uid": "a1"}
+    tent = {references.REF_KEY: ["items", "gone"]}
+    payload = {
+        "inventory": {"equipped": {"armor": copy.deepcopy(armor)},
+                      "backpack": {"other": [copy.deepcopy(tent), {"name": "custom"}]}},
+    }
+    expanded = references.expand(payload, compendium)
+    # Taken out of the character, not replaced with default entries
+    assert expanded["inventory"]["equipped"]["armor"] is None
+    assert expanded["inventory"]["backpack"]["other"] == [{"name": "custom"}]
+
+    # Written back untouched, also around entries added meanwhile
+    expanded["inventory"]["backpack"]["other"].append({"name": "rope"})
+    compacted = references.compact(expanded, compendium)
+    assert references.UNRESOLVED_KEY not in compacted
+    assert compacted["inventory"]["equipped"]["armor"] == armor
+    assert compacted["inventory"]["backpack"]["other"] == [tent, {"name": "custom"}, {"name": "rope"}]
+
+
+def _save_load_save(monkeypatch, tmp_path, payload):
+    """Stores payload, opens the character and saves it again; returns the stored payload."""
+    from fabula_charsheet.data import saved_characters
+    from fabula_charsheet.data.database import DatabaseManager
+
+    class FakeCharacter(FakeModel):
+        def model_dump(self, mode=None):
+            return json.loads(json.dumps(self.__dict__, default=lambda m: m.model_dump()))
+
+    db = DatabaseManager(str(tmp_path / 'society.db'))
+    db.save_character(1, 'c1', 'Hero', payload)
+    monkeypatch.setattr(saved_characters, 'DB', db)
+    monkeypatch.setattr(saved_characters, 'Character', FakeCharacter)
+    monkeypatch.setattr(saved_characters.c, 'COMPENDIUM', _compendium())
+    saved_characters.st.session_state['user_id'] = 1
+    registry = saved_characters.SavedCharactersRegistry()
+
+    character = registry.load_character('c1')
+    assert character is not None
+    character.level = 6
+    assert registry.update_character(character, immediate=True)
+    return json.loads(db.get_character_payload(1, 'c1')), character
+
+
+def test_unresolved_spell_survives_save(monkeypatch, tmp_path, streamlit_stub):
+    gone = {references.REF_KEY: ["spells:entropist", "renamed_spell"]}
+    payload = {"id": "c1", "name": "Hero", "level": 5,
+               "spells": {"entropist": [copy.deepcopy(gone), {references.REF_KEY: ["spells:entropist", "drain_vigor"]}]}}
+
+    stored, character = _save_load_save(monkeypatch, tmp_path, payload)
+    assert [spell.name for spell in character.spells["entropist"]] == ["drain_vigor"]
+    assert stored["level"] == 6
+    assert stored["spells"]["entropist"] == payload["spells"]["entropist"]
+
+
+def test_unresolved_weapon_survives_save(monkeypatch, tmp_path, streamlit_stub):
+    gone = {references.REF_KEY: ["weapons", "renamed_sword"], "uid": "w1"}
+    payload = {"id": "c1", "name": "Hero", "level": 5,
+               "inventory": {"equipped": {"main_hand": copy.deepcopy(gone), "off_hand": None, "armor": None,
+                                          "accessory": None},
+                             "backpack": {"weapons": [copy.deepcopy(gone)], "armors": [], "shields": [],
+                                          "accessories": [], "other": []}}}
+
+    stored, character = _save_load_save(monkeypatch, tmp_path, payload)
+    assert character.inventory["equipped"]["main_hand"] is None
+    assert stored["level"] == 6
+    assert stored["inventory"] == payload["inventory"]
+
+
+def test_references_keep_item_uids():
+    compendium = _compendium()
+    payload = {"inventory": {"backpack": {"weapons": [{"name": "sword", "damage": 10, "uid": "a1"}]}}}
+
+    compacted = references.compact(payload, compendium)
+    assert compacted["inventory"]["backpack"]["weapons"] == [{references.REF_KEY: ["weapons", "sword"], "uid": "a1"}]
+
+    expanded = references.expand(compacted, compendium)
+    sword = expanded["inventory"]["backpack"]["weapons"][0]
+    assert sword.uid == "a1" and sword.damage == 10
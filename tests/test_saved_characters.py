@@ -7,3 +7,305 @@ def test_saved_characters_init(tmp_path):
     saved_characters.init(tmp_path)
     assert saved_characters.SAVED_CHARS is not None
     assert saved_characters.SAVED_CHARS.char_list
+
+
+class _RecordingDB:
+    def __init__(self):
+        self.saved = []
+
+    def save_character(self, user_id, char_id, char_name, char_data):
+        self.saved.append((char_id, char_data))
+
+    def save_characters(self, user_id, characters, expected_versions=None, states=None):
+        self.saved.extend((row[0], row[2]) for row in characters)
+        return []
+
+    def list_character_summaries(self, user_id, after=None, **query):
+        from fabula_charsheet.data.database import CharacterSummary, SummaryPage
+        return SummaryPage([CharacterSummary('c1', 'Hero', 1, [], None)], None)
+
+
+def test_saved_characters_skips_unchanged(monkeypatch, streamlit_stub):
+    from types import SimpleNamespace
+    db = _RecordingDB()
+    monkeypatch.setattr(saved_characters, 'DB', db)
+    streamlit_stub.session_state['user_id'] = 1
+    registry = saved_characters.SavedCharactersRegistry()
+    char = SimpleNamespace(id='c1', name='Hero', level=5)
+
+    assert registry.update_character(char, immediate=True)
+    assert not registry.update_character(char)
+    char.level = 6
+    assert registry.update_character(char, immediate=True)
+    registry.save_to_disk()
+    assert [char_id for char_id, _ in db.saved] == ['c1', 'c1']
+    assert registry.char_list == [char]
+
+
+def test_saved_characters_debounced_autosave(monkeypatch, streamlit_stub):
+    import json
+    from types import SimpleNamespace
+    db = _RecordingDB()
+    monkeypatch.setattr(saved_characters, 'DB', db)
+    streamlit_stub.session_state['user_id'] = 1
+    registry = saved_characters.SavedCharactersRegistry(autosave_window=60)
+    char = SimpleNamespace(id='c1', name='Hero', level=5)
+
+    for level in range(5, 10):
+        char.level = level
+        assert registry.update_character(char)
+    # Nothing written yet, but the latest state can be read back
+    assert db.saved == []
+    assert [(c.id, c.level) for c in registry.list_summaries().items] == [('c1', 9)]
+    registry.flush(1)
+    assert len(db.saved) == 1 and json.loads(db.saved[0][1])["level"] == 9
+
+
+def test_saved_characters_background_flush(monkeypatch, streamlit_stub):
+    import time
+    from types import SimpleNamespace
+    db = _RecordingDB()
+    monkeypatch.setattr(saved_characters, 'DB', db)
+    streamlit_stub.session_state['user_id'] = 1
+    registry = saved_characters.SavedCharactersRegistry(autosave_window=0.01)
+    registry.update_character(SimpleNamespace(id='c1', name='Hero', level=5))
+    deadline = time.monotonic() + 2
+    while not db.saved and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [char_id for char_id, _ in db.saved] == ['c1']
+
+
+def test_saved_characters_lazy_hydration(monkeypatch, streamlit_stub):
+    import json
+    from fabula_charsheet.data.database import CharacterRecord
+    built = []
+
+    class FakeCharacter:
+        def __init__(self, **data):
+            built.append(data["id"])
+            self.__dict__.update(data)
+
+    class PayloadDB(_RecordingDB):
+        def get_character_record(self, user_id, char_id):
+            if char_id == 'missing':
+                return None
+            return CharacterRecord(json.dumps({"id": char_id, "name": char_id.title()}), 1)
+
+    monkeypatch.setattr(saved_characters, 'DB', PayloadDB())
+    monkeypatch.setattr(saved_characters, 'Character', FakeCharacter)
+    streamlit_stub.session_state['user_id'] = 1
+    registry = saved_characters.SavedCharactersRegistry()
+
+    registry.characters.set_raw('c1', json.dumps({"id": "c1"}))
+    registry.characters.set_raw('c2', json.dumps({"id": "c2"}))
+    assert len(registry.characters) == 2 and built == []
+    assert registry.characters['c1'].id == 'c1'
+    assert registry.characters['c1'] is registry.characters['c1']
+    assert built == ['c1'] and registry.char_list == [registry.characters['c1']]
+
+    assert registry.load_character('c3').name == 'C3'
+    assert registry.load_character('missing') is None
+    assert built == ['c1', 'c3']
+
+
+def test_saved_characters_conflicting_save(monkeypatch, streamlit_stub, tmp_path):
+    import json
+    from fabula_charsheet.data.database import DatabaseManager
+
+    class FakeCharacter:
+        def __init__(self, **data):
+            self.__dict__.update(data)
+
+    db = DatabaseManager(str(tmp_path / 'society.db'))
+    db.save_character(1, 'c1', 'Hero', {"id": "c1", "name": "Hero", "level": 5})
+    monkeypatch.setattr(saved_characters, 'DB', db)
+    monkeypatch.setattr(saved_characters, 'Character', FakeCharacter)
+    streamlit_stub.session_state['user_id'] = 1
+    registry = saved_characters.SavedCharactersRegistry()
+
+    char = registry.load_character('c1')
+    # Another process saves the character meanwhile
+    db.save_character(1, 'c1', 'Hero', {"id": "c1", "name": "Hero", "level": 9})
+    char.level = 6
+    assert not registry.update_character(char, immediate=True)
+    assert registry.has_conflict('c1')
+    assert json.loads(db.get_character_payload(1, 'c1'))["level"] == 9
+    # Autosave stays paused until the conflict is resolved
+    char.level = 7
+    assert not registry.update_character(char)
+
+    fresh = registry.reload_character('c1')
+    assert fresh.level == 9 and not registry.has_conflict('c1')
+    fresh.level = 10
+    assert registry.update_character(fresh, immediate=True)
+    assert json.loads(db.get_character_payload(1, 'c1'))["level"] == 10
+
+    db.save_character(1, 'c1', 'Hero', {"id": "c1", "name": "Hero", "level": 11})
+    fresh.level = 12
+    registry.update_character(fresh, immediate=True)
+    assert registry.overwrite_character(fresh)
+    assert json.loads(db.get_character_payload(1, 'c1'))["level"] == 12
+
+
+def test_saved_characters_state_fast_path(monkeypatch, streamlit_stub, tmp_path):
+    from types import SimpleNamespace
+    from fabula_charsheet.data.database import DatabaseManager
+
+    db = DatabaseManager(str(tmp_path / 'society.db'))
+    calls = []
+    for method in ('save_character_state', 'save_character_vitals'):
+        original = getattr(db, method)
+        monkeypatch.setattr(db, method, lambda *args, _m=method, _f=original, **kwargs: calls.append(_m) or _f(*args, **kwargs))
+    monkeypatch.setattr(saved_characters, 'DB', db)
+    streamlit_stub.session_state['user_id'] = 1
+    registry = saved_characters.SavedCharactersRegistry()
+    char = SimpleNamespace(id='c1', name='Hero', level=5)
+    state = {"minus_hp": 0, "minus_mp": 0, "minus_ip": 0, "statuses": []}
+
+    assert registry.update_character(char, immediate=True, state=state)
+    assert registry.load_state('c1') == state
+    assert not registry.save_state('c1', dict(state))
+    assert registry.save_state('c1', {**state, "minus_hp": 7})
+    assert registry.save_state('c1', {**state, "minus_hp": 7, "statuses": ["weak"]})
+    assert calls == ['save_character_vitals', 'save_character_state']
+    assert db.get_character_state(1, 'c1')["statuses"] == ["weak"]
+
+
+def test_saved_characters_two_sessions_of_one_user(monkeypatch, streamlit_stub, tmp_path):
+    import json
+    from fabula_charsheet.data.database import DatabaseManager
+
+    class FakeCharacter:
+        def __init__(self, **data):
+            self.__dict__.update(data)
+
+    db = DatabaseManager(str(tmp_path / 'society.db'))
+    db.save_character(1, 'c1', 'Hero', {"id": "c1", "name": "Hero", "level": 5})
+    monkeypatch.setattr(saved_characters, 'DB', db)
+    monkeypatch.setattr(saved_characters, 'Character', FakeCharacter)
+    registry = saved_characters.SavedCharactersRegistry(autosave_window=60)
+    # Two browser tabs of the same account
+    tabs = [type(streamlit_stub.session_state)(user_id=1) for _ in range(2)]
+
+    def open_tab(index):
+        monkeypatch.setattr(streamlit_stub, 'session_state', tabs[index])
+
+    open_tab(0)
+    char_a = registry.load_character('c1')
+    open_tab(1)
+    char_b = registry.load_character('c1')
+    assert char_a is not char_b
+
+    open_tab(0)
+    char_a.level = 6
+    assert registry.update_character(char_a, immediate=True)
+    open_tab(1)
+    char_b.level = 7
+    assert not registry.update_character(char_b, immediate=True)
+    assert registry.has_conflict('c1')
+    assert json.loads(db.get_character_payload(1, 'c1'))["level"] == 6
+    open_tab(0)
+    assert not registry.has_conflict('c1')
+
+    # Debounced saves of both tabs are not merged: the stale one is rejected
+    char_a.level = 8
+    assert registry.update_character(char_a)
+    open_tab(1)
+    char_b = registry.reload_character('c1')
+    assert char_b.level == 8
+    char_b.level = 9
+    assert registry.update_character(char_b)
+    open_tab(0)
+    char_a.level = 10
+    registry.update_character(char_a)
+    registry.flush(1)
+    assert json.loads(db.get_character_payload(1, 'c1'))["level"] == 9
+    assert registry.has_conflict('c1')
+
+
+def test_saved_characters_conflict_blocks_state(monkeypatch, streamlit_stub, tmp_path):
+    from fabula_charsheet.data.database import DatabaseManager
+
+    class FakeCharacter:
+        def __init__(self, **data):
+            self.__dict__.update(data)
+
+    db = DatabaseManager(str(tmp_path / 'society.db'))
+    db.save_character(1, 'c1', 'Hero', {"id": "c1", "name": "Hero", "level": 5})
+    state = {"minus_hp": 0, "minus_mp": 0, "minus_ip": 0, "statuses": []}
+    db.save_character_state(1, 'c1', state)
+    monkeypatch.setattr(saved_characters, 'DB', db)
+    monkeypatch.setattr(saved_characters, 'Character', FakeCharacter)
+    registry = saved_characters.SavedCharactersRegistry(autosave_window=60)
+    tabs = [type(streamlit_stub.session_state)(user_id=1) for _ in range(2)]
+
+    def open_tab(index):
+        monkeypatch.setattr(streamlit_stub, 'session_state', tabs[index])
+
+    for index in range(2):
+        open_tab(index)
+        registry.load_character('c1')
+        registry.load_state('c1')
+
+    open_tab(0)
+    char_a = registry.characters['c1']
+    char_a.level = 6
+    assert registry.update_character(char_a, immediate=True, state={**state, "minus_hp": 3})
+
+    # The other tab's vitals are not written over the newer character
+    open_tab(1)
+    assert not registry.save_state('c1', {**state, "minus_hp": 9})
+    assert registry.has_conflict('c1')
+    char_b = registry.characters['c1']
+    assert not registry.update_character(char_b, state={**state, "minus_hp": 9, "statuses": ["weak"]})
+    assert db.get_character_state(1, 'c1')["minus_hp"] == 3
+
+    # Once reloaded, its writes go through again
+    registry.reload_character('c1')
+    registry.load_state('c1')
+    assert registry.save_state('c1', {**state, "minus_hp": 4})
+    assert db.get_character_state(1, 'c1')["minus_hp"] == 4
+
+
+def test_saved_characters_roster_ids(monkeypatch, streamlit_stub, tmp_path):
+    from types import SimpleNamespace
+    from fabula_charsheet.data.database import DatabaseManager
+
+    db = DatabaseManager(str(tmp_path / 'society.db'))
+    db.save_character(1, 'c1', 'Hero', {"id": "c1", "name": "Hero"})
+    db.save_character(1, 'c2', 'Mage', {"id": "c2", "name": "Mage"})
+    monkeypatch.setattr(saved_characters, 'DB', db)
+    streamlit_stub.session_state['user_id'] = 1
+    registry = saved_characters.SavedCharactersRegistry(autosave_window=60)
+
+    # Nothing was opened in this session, and c3 is not written yet
+    registry.update_character(SimpleNamespace(id='c3', name='Rogue', level=5))
+    assert list(registry.characters) == ['c3']
+    assert sorted(registry.roster_ids()) == ['c1', 'c2', 'c3']
+    registry.flush(1)
+
+
+def test_saved_characters_revision_skips_serialization(monkeypatch, streamlit_stub):
+    from types import SimpleNamespace
+    db = _RecordingDB()
+    monkeypatch.setattr(saved_characters, 'DB', db)
+    streamlit_stub.session_state['user_id'] = 1
+    registry = saved_characters.SavedCharactersRegistry()
+    serialized = []
+    serialize = registry._serialize
+    monkeypatch.setattr(registry, '_serialize', lambda character: serialized.append(1) or serialize(character))
+    char = SimpleNamespace(id='c1', name='Hero', level=5)
+
+    assert registry.update_character(char, immediate=True, revision=1)
+    # Idle reruns: same object, same revision
+    assert not registry.update_character(char, revision=1)
+    assert not registry.update_character(char, revision=1)
+    assert len(serialized) == 1
+
+    # A new revision is checked by content: unchanged content is not written
+    assert not registry.update_character(char, revision=2)
+    char.level = 6
+    assert registry.update_character(char, immediate=True, revision=3)
+    # Without a revision the content is always checked
+    assert not registry.update_character(char)
+    assert len(serialized) == 4 and len(db.saved) == 2
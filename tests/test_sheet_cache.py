@@ -0,0 +1,49 @@
+from fabula_charsheet.data.sheet_cache import SheetCache, sheet_key
+
+
+def test_sheet_key_changes_with_inputs():
+    key = sheet_key('{"name": "Hero"}', "en", 1)
+    assert key == sheet_key(b'{"name": "Hero"}', "en", 1)
+    assert key != sheet_key('{"name": "Hero", "level": 2}', "en", 1)
+    assert key != sheet_key('{"name": "Hero"}', "ru", 1)
+    assert key != sheet_key('{"name": "Hero"}', "en", 2)
+
+
+def test_get_or_render_renders_once():
+    cache = SheetCache(max_bytes=1024)
+    renders = []
+
+    def render():
+        renders.append(1)
+        return b"%PDF-sheet"
+
+    assert cache.get_or_render("a", render) == b"%PDF-sheet"
+    assert cache.get_or_render("a", render) == b"%PDF-sheet"
+    assert len(renders) == 1
+
+
+def test_lru_eviction_by_size():
+    cache = SheetCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    # Touching a makes b the least recently used
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa" and cache.get("c") == b"cccc"
+    # Larger than the whole budget: not kept in memory
+    cache.put("d", b"d" * 11)
+    assert cache.get("d") is None
+
+
+def test_disk_cache(tmp_path):
+    cache = SheetCache(max_bytes=1024, directory=tmp_path, max_files=2)
+    cache.put("a", b"aaaa")
+
+    # A new process finds the sheet on disk
+    assert SheetCache(directory=tmp_path).get("a") == b"aaaa"
+
+    cache.put("b", b"bbbb")
+    cache.put("c", b"cccc")
+    assert len(list(tmp_path.glob("*.pdf"))) == 2
+    assert not list(tmp_path.glob("*.tmp"))
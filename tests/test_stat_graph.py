@@ -0,0 +1,99 @@
+from collections import Counter
+
+import pytest
+
+from fabula_charsheet.data.stat_graph import StatGraph
+
+
+def _graph(inputs: dict):
+    """A small version of the controller's graph: attributes feed defense and initiative."""
+    calls = Counter()
+
+    def node(name, compute):
+        def wrapped():
+            calls[name] += 1
+            return compute()
+        return wrapped
+
+    graph = StatGraph()
+    graph.add_node("dexterity.current", node("dexterity.current", lambda: inputs["dexterity.base"] - 2 * inputs.get("status.slow", 0)), ["dexterity.base", "status.slow"])
+    graph.add_node("insight.current", node("insight.current", lambda: inputs["insight.base"] - 2 * inputs.get("status.dazed", 0)), ["insight.base", "status.dazed"])
+    graph.add_node("defense", node("defense", lambda: graph.get("dexterity.current") + inputs["armor"]), ["dexterity.current", "armor"])
+    graph.add_node("initiative", node("initiative", lambda: graph.get("dexterity.current") + graph.get("insight.current")), ["dexterity.current", "insight.current"])
+    return graph, calls
+
+
+def test_values_are_cached():
+    graph, calls = _graph({"dexterity.base": 8, "insight.base": 10, "armor": 1})
+
+    assert graph.get("defense") == 9
+    assert graph.get("defense") == 9
+    assert graph.get("initiative") == 18
+    # dexterity.current was shared by both nodes
+    assert calls == {"defense": 1, "initiative": 1, "dexterity.current": 1, "insight.current": 1}
+
+
+def test_invalidate_drops_only_dependents():
+    inputs = {"dexterity.base": 8, "insight.base": 10, "armor": 1}
+    graph, calls = _graph(inputs)
+    for name in ("defense", "initiative"):
+        graph.get(name)
+
+    inputs["armor"] = 3
+    assert graph.invalidate("armor") == {"defense"}
+    assert graph.is_cached("initiative")
+    assert graph.get("defense") == 11
+    assert calls["dexterity.current"] == 1
+
+    inputs["insight.base"] = 12
+    assert graph.invalidate("insight.base") == {"insight.current", "initiative"}
+    assert graph.get("initiative") == 20
+    assert calls["defense"] == 2
+
+
+def test_invalidate_propagates_through_nodes():
+    graph, _ = _graph({"dexterity.base": 8, "insight.base": 10, "armor": 1})
+    graph.get("defense")
+    graph.get("initiative")
+
+    assert graph.invalidate("status.slow") == {"dexterity.current", "defense", "initiative"}
+    assert graph.dependents("dexterity.base") == {"dexterity.current", "defense", "initiative"}
+
+
+def test_sync_invalidates_changed_inputs():
+    inputs = {"dexterity.base": 8, "insight.base": 10, "armor": 1}
+    graph, calls = _graph(inputs)
+    graph.sync(inputs)
+    graph.get("defense")
+    graph.get("initiative")
+
+    assert graph.sync(dict(inputs)) == set()
+
+    # A status appearing and disappearing both count as changes
+    inputs["status.dazed"] = True
+    assert graph.sync(inputs) == {"insight.current", "initiative"}
+    assert graph.get("initiative") == 16
+    del inputs["status.dazed"]
+    assert graph.sync(inputs) == {"insight.current", "initiative"}
+    assert graph.get("initiative") == 18
+    assert calls["defense"] == 1
+
+
+def test_invalidate_all_resets_sync():
+    inputs = {"dexterity.base": 8, "insight.base": 10, "armor": 1}
+    graph, calls = _graph(inputs)
+    graph.sync(inputs)
+    graph.get("defense")
+
+    graph.invalidate_all()
+    assert not graph.is_cached("defense")
+    graph.sync(inputs)
+    graph.get("defense")
+    assert calls["defense"] == 2
+
+
+def test_duplicate_node():
+    graph = StatGraph()
+    graph.add_node("max_hp", lambda: 0)
+    with pytest.raises(ValueError):
+        graph.add_node("max_hp", lambda: 1)